@@ -0,0 +1,129 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:12
+
+import bots.models.copilot_stats
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("bots", "0131_alter_savedrun_surface"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CopilotStatsRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(help_text="The day (UTC)")),
+                (
+                    "messages",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        default=bots.models.copilot_stats._zeros,
+                        help_text="Number of assistant messages, per 15 minute bucket",
+                        size=96,
+                    ),
+                ),
+                (
+                    "positive_feedbacks",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        default=bots.models.copilot_stats._zeros,
+                        size=96,
+                    ),
+                ),
+                (
+                    "negative_feedbacks",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        default=bots.models.copilot_stats._zeros,
+                        size=96,
+                    ),
+                ),
+                (
+                    "successful_answers",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        default=bots.models.copilot_stats._zeros,
+                        size=96,
+                    ),
+                ),
+                (
+                    "runs",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        default=bots.models.copilot_stats._zeros,
+                        help_text="Number of assistant messages with a saved run, per 15 minute bucket",
+                        size=96,
+                    ),
+                ),
+                (
+                    "run_time",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.FloatField(),
+                        default=bots.models.copilot_stats._zeros,
+                        help_text="Total run time of the saved runs in seconds, per 15 minute bucket",
+                        size=96,
+                    ),
+                ),
+                (
+                    "price",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        default=bots.models.copilot_stats._zeros,
+                        help_text="Total credits used, per 15 minute bucket",
+                        size=96,
+                    ),
+                ),
+                (
+                    "user_hashes",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.BigIntegerField(),
+                        default=list,
+                        help_text="Hashes of the distinct users that got a reply, to count distinct users across days",
+                        size=None,
+                    ),
+                ),
+                (
+                    "user_first_buckets",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.SmallIntegerField(),
+                        default=list,
+                        help_text="The first bucket each of `user_hashes` got a reply in",
+                        size=None,
+                    ),
+                ),
+                (
+                    "user_last_buckets",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.SmallIntegerField(),
+                        default=list,
+                        help_text="The last bucket each of `user_hashes` got a reply in",
+                        size=None,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "bot_integration",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stats_rollups",
+                        to="bots.botintegration",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("bot_integration", "date")},
+            },
+        ),
+    ]
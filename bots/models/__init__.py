@@ -4,3 +4,4 @@ from .published_run import *
 from .saved_run import *
 from .workflow import *
 from .message_thread import *
+from .copilot_stats import *
@@ -2,14 +2,25 @@ from __future__ import annotations
 
 import datetime
 import typing
-from collections import defaultdict
 
 import phonenumber_field.modelfields
 import pytz
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
-from django.db.models import Count, Max, Min, OuterRef, Q, QuerySet, Subquery
+from django.db.models import (
+    Count,
+    F,
+    Max,
+    Min,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Window,
+)
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Coalesce, JSONObject
 from django.utils.text import Truncator
 
 from bots.custom_fields import CustomURLField
@@ -42,37 +53,61 @@ class ConversationQuerySet(models.QuerySet):
     ) -> pd.DataFrame:
         import pandas as pd
 
-        qs = self.all().select_related("bot_integration").with_stats()
+        # one aggregated query, streamed in chunks, instead of 2 extra count() queries per row
+        qs = (
+            self.all()
+            .with_stats()
+            .with_message_counts()
+            .values(
+                "id",
+                "created_at",
+                "bot_integration__name",
+                "first_msg_at",
+                "last_msg_at",
+                "thumbs_up",
+                "thumbs_down",
+                "num_messages",
+                "num_correct_answers",
+                "latest_msg_at",
+                *Conversation.display_name_fields,
+            )
+        )
         rows = []
-        for convo in qs[:row_limit]:
-            convo: Conversation
+        for values in qs[:row_limit].iterator(chunk_size=500):
+            # an unsaved instance, just to reuse the display name logic
+            convo = Conversation(
+                id=values["id"],
+                **{field: values[field] for field in Conversation.display_name_fields},
+            )
             row = {
                 "Name": convo.get_display_name(),
-                "Messages": convo.messages.count(),
-                "Correct Answers": convo.messages.filter(
-                    analysis_result__contains={"Answered": True}
-                ).count(),
-                "Thumbs up": convo.thumbs_up,
-                "Thumbs down": convo.thumbs_down,
+                "Messages": values["num_messages"],
+                "Correct Answers": values["num_correct_answers"],
+                "Thumbs up": values["thumbs_up"],
+                "Thumbs down": values["thumbs_down"],
             }
-            if convo.first_msg_at and convo.last_msg_at:
-                first_time = convo.first_msg_at.astimezone(tz).replace(tzinfo=None)
-                last_time = convo.last_msg_at.astimezone(tz).replace(tzinfo=None)
+            created_at = values["created_at"]
+            first_msg_at = values["first_msg_at"]
+            last_msg_at = values["last_msg_at"]
+            if first_msg_at and last_msg_at:
+                first_time = first_msg_at.astimezone(tz).replace(tzinfo=None)
+                last_time = last_msg_at.astimezone(tz).replace(tzinfo=None)
                 row |= {
                     "Last Sent": last_time.strftime(settings.SHORT_DATETIME_FORMAT),
                     "First Sent": first_time.strftime(settings.SHORT_DATETIME_FORMAT),
                     **activity_retention_stats(first_time, last_time),
+                    # same as Conversation.last_active_delta()
                     "Delta Hours": round(
-                        convo.last_active_delta().total_seconds() / 3600
+                        abs(values["latest_msg_at"] - created_at).total_seconds() / 3600
                     ),
                 }
             row |= {
                 "Created At": (
-                    convo.created_at.astimezone(tz)
+                    created_at.astimezone(tz)
                     .replace(tzinfo=None)
                     .strftime(settings.SHORT_DATETIME_FORMAT)
                 ),
-                "Integration Name": convo.bot_integration.name,
+                "Integration Name": values["bot_integration__name"],
             }
             rows.append(row)
         df = pd.DataFrame.from_records(
@@ -97,6 +132,36 @@ class ConversationQuerySet(models.QuerySet):
         )
         return df
 
+    def with_message_counts(self) -> "ConversationQuerySet":
+        """
+        Total & correctly answered messages per conversation, and the time of its latest message.
+
+        These are correlated subqueries rather than `Count("messages")`, so that they
+        count all messages of the conversation regardless of any filters on `messages`,
+        and aren't multiplied by the feedbacks join in `with_stats()`.
+        """
+        msgs = (
+            Message.objects.filter(conversation=OuterRef("pk"))
+            .order_by()
+            .values("conversation")
+        )
+        return self.annotate(
+            num_messages=Coalesce(
+                Subquery(msgs.annotate(count=Count("id")).values("count")), 0
+            ),
+            num_correct_answers=Coalesce(
+                Subquery(
+                    msgs.filter(analysis_result__contains={"Answered": True})
+                    .annotate(count=Count("id"))
+                    .values("count")
+                ),
+                0,
+            ),
+            latest_msg_at=Subquery(
+                msgs.annotate(latest=Max("created_at")).values("latest")
+            ),
+        )
+
     def with_stats(self) -> "ConversationQuerySet":
         return self.annotate(
             first_msg_at=Min("messages__created_at"),
@@ -246,6 +311,16 @@ class Conversation(models.Model):
         "twilio_phone_number",
         "telegram_user_id",
     ]
+    # everything get_display_name() needs, for exports that don't load full objects
+    display_name_fields = [
+        *user_id_fields,
+        "twilio_call_sid",
+        "ig_username",
+        "fb_page_name",
+        "slack_user_name",
+        "slack_channel_name",
+        "telegram_user_name",
+    ]
 
     class Meta:
         unique_together = [
@@ -364,8 +439,16 @@ class MessageQuerySet(models.QuerySet):
     ) -> pd.DataFrame:
         import pandas as pd
 
-        rows = [
-            {
+        return pd.DataFrame.from_records(
+            list(self.iter_export_rows(tz=tz, row_limit=row_limit))
+        )
+
+    def iter_export_rows(
+        self, tz=pytz.timezone(settings.TIME_ZONE), row_limit=10000
+    ) -> typing.Iterator[dict]:
+        """Same rows as `to_df()`, streamed for writing to a file."""
+        for row in self.iter_json(tz=tz, row_limit=row_limit):
+            yield {
                 "Sent": (
                     row["sent"]
                     .replace(tzinfo=None)
@@ -394,88 +477,79 @@ class MessageQuerySet(models.QuerySet):
                 "R7": row.get("R7"),
                 "R30": row.get("R30"),
             }
-            for row in self.to_json(tz=tz, row_limit=row_limit)
-            if row.get("sent")
-        ]
-        df = pd.DataFrame.from_records(rows)
-        return df
 
     def to_json(
         self, tz=pytz.timezone(settings.TIME_ZONE), row_limit=10000
     ) -> list[dict]:
-        from routers.bots_api import MSG_ID_PREFIX
-
-        conversations = defaultdict(list)
-
-        qs = self.order_by("-created_at").prefetch_related(
-            "feedbacks", "conversation", "saved_run", "conversation__bot_integration"
-        )
-        for message in qs[:row_limit]:
-            message: Message
-            rows = conversations[message.conversation_id]
-
-            # since we've sorted by -created_at, we'll get alternating assistant and user messages
-            if message.role == CHATML_ROLE_ASSISTANT:
-                row = {
-                    "assistant_message": message.content,
-                    "assistant_message_local": message.display_content,
-                    "analysis_result": message.analysis_result,
-                }
-                rows.append(row)
-                if message.feedbacks.first():
-                    row["feedback"] = message.feedbacks.first().get_display_text()
-                saved_run = message.saved_run
-                if saved_run:
-                    row["run_time_sec"] = int(saved_run.run_time.total_seconds())
-                    row["run_url"] = saved_run.get_app_url()
-                    row["credits_used"] = saved_run.price or 0
-                    input_images = saved_run.state.get("input_images")
-                    if input_images:
-                        row["input_images"] = input_images
-                    input_audio = saved_run.state.get("input_audio")
-                    if input_audio:
-                        row["input_audio"] = input_audio
-
-            elif message.role == CHATML_ROLE_USER and rows:
-                row = rows[-1]
-                row.update(
-                    {
-                        "sent": message.created_at.astimezone(tz),
-                        "name": message.conversation.get_display_name(),
-                        "user_message": message.content,
-                        "user_message_local": message.display_content,
-                        "user_message_id": (
-                            message.platform_msg_id
-                            and message.platform_msg_id.removeprefix(MSG_ID_PREFIX)
-                        ),
-                        "conversation_id": message.conversation.api_integration_id(),
-                        "integration_name": message.conversation.bot_integration.name,
-                    }
+        return list(self.iter_json(tz=tz, row_limit=row_limit))
+
+    def iter_json(
+        self,
+        tz=pytz.timezone(settings.TIME_ZONE),
+        row_limit=10000,
+        chunk_size=1000,
+    ) -> typing.Iterator[dict]:
+        """
+        Pairs of user & assistant messages from the latest `row_limit` messages,
+        grouped by conversation (most recently active first), and oldest first within each.
+
+        Only the columns needed for the export are selected (notably, not the full
+        `saved_run.state`), and rows are read from the db and yielded in chunks,
+        so memory use doesn't grow with the size of the export.
+        """
+        latest = self.order_by("-created_at")[:row_limit].values("pk")
+        qs = (
+            Message.objects.filter(pk__in=latest)
+            .alias(
+                conv_last_msg_at=Window(
+                    Max("created_at"), partition_by=[F("conversation_id")]
                 )
+            )
+            .order_by("-conv_last_msg_at", "conversation_id", "created_at")
+        ).values(
+            "role",
+            "content",
+            "display_content",
+            "analysis_result",
+            "platform_msg_id",
+            "created_at",
+            "conversation_id",
+            "conversation__bot_integration__name",
+            *(f"conversation__{field}" for field in Conversation.display_name_fields),
+            "saved_run__workflow",
+            "saved_run__run_id",
+            "saved_run__uid",
+            "saved_run__run_time",
+            "saved_run__price",
+            input_images=KeyTransform("input_images", "saved_run__state"),
+            input_audio=KeyTextTransform("input_audio", "saved_run__state"),
+            # the latest feedback
+            feedback=Subquery(
+                Feedback.objects.filter(message=OuterRef("pk")).values(
+                    json=JSONObject(
+                        rating="rating", text="text", text_english="text_english"
+                    )
+                )[:1]
+            ),
+        )
 
+        # user messages, waiting for the assistant message that replies to them
+        pending = {}
+        # conversation id -> stats, for conversations seen so far
         conv_stats = {}
-        for stat in Conversation.objects.filter(
-            id__in=list(conversations.keys())
-        ).with_stats():
-            entry: dict = {
-                "thumbs_up": stat.thumbs_up,
-                "thumbs_down": stat.thumbs_down,
-            }
-            if stat.first_msg_at and stat.last_msg_at:
-                entry |= activity_retention_stats(
-                    stat.first_msg_at.astimezone(tz).replace(tzinfo=None),
-                    stat.last_msg_at.astimezone(tz).replace(tzinfo=None),
-                )
-            conv_stats[stat.id] = entry
-
-        return [
-            row | conv_stats.get(conv_id, {})
-            for conv_id, rows in conversations.items()
-            # reversed so that user message is first and easier to read
-            for row in reversed(rows)
-            # drop rows that have only one of user/assistant message
-            if "user_message" in row and "assistant_message" in row
-        ]
+        chunk = []
+        for msg in qs.iterator(chunk_size=chunk_size):
+            conv_id = msg["conversation_id"]
+            # since we've sorted by created_at, we'll get alternating user and assistant messages
+            if msg["role"] == CHATML_ROLE_USER:
+                pending[conv_id] = _user_export_row(msg, tz)
+            elif msg["role"] == CHATML_ROLE_ASSISTANT and conv_id in pending:
+                row = _assistant_export_row(msg) | pending.pop(conv_id)
+                chunk.append((conv_id, row))
+                if len(chunk) >= chunk_size:
+                    yield from _with_conv_stats(chunk, conv_stats, tz)
+                    chunk = []
+        yield from _with_conv_stats(chunk, conv_stats, tz)
 
     def last_n_msgs_as_entries(
         self, n: int = 50, reset_at: datetime.datetime = None
@@ -491,6 +565,78 @@ class MessageQuerySet(models.QuerySet):
         return list(reversed(msgs))
 
 
+def _assistant_export_row(msg: dict) -> dict:
+    from .saved_run import SavedRun
+
+    row = {
+        "assistant_message": msg["content"],
+        "assistant_message_local": msg["display_content"],
+        "analysis_result": msg["analysis_result"],
+    }
+    if msg["feedback"]:
+        row["feedback"] = Feedback(**msg["feedback"]).get_display_text()
+    if msg["saved_run__run_id"]:
+        if msg["saved_run__run_time"]:
+            row["run_time_sec"] = int(msg["saved_run__run_time"].total_seconds())
+        # an unsaved instance, just to build the url
+        row["run_url"] = SavedRun(
+            workflow=msg["saved_run__workflow"],
+            run_id=msg["saved_run__run_id"],
+            uid=msg["saved_run__uid"],
+        ).get_app_url()
+        row["credits_used"] = msg["saved_run__price"] or 0
+        if msg["input_images"]:
+            row["input_images"] = msg["input_images"]
+        if msg["input_audio"]:
+            row["input_audio"] = msg["input_audio"]
+    return row
+
+
+def _user_export_row(msg: dict, tz) -> dict:
+    from routers.bots_api import MSG_ID_PREFIX
+
+    # an unsaved instance, just to reuse the display name logic
+    convo = Conversation(
+        id=msg["conversation_id"],
+        **{
+            field: msg[f"conversation__{field}"]
+            for field in Conversation.display_name_fields
+        },
+    )
+    return {
+        "sent": msg["created_at"].astimezone(tz),
+        "name": convo.get_display_name(),
+        "user_message": msg["content"],
+        "user_message_local": msg["display_content"],
+        "user_message_id": (
+            msg["platform_msg_id"]
+            and msg["platform_msg_id"].removeprefix(MSG_ID_PREFIX)
+        ),
+        "conversation_id": convo.api_integration_id(),
+        "integration_name": msg["conversation__bot_integration__name"],
+    }
+
+
+def _with_conv_stats(
+    chunk: list[tuple[int, dict]], conv_stats: dict[int, dict], tz
+) -> typing.Iterator[dict]:
+    new_ids = {conv_id for conv_id, _ in chunk} - conv_stats.keys()
+    for stat in (
+        Conversation.objects.filter(id__in=new_ids)
+        .with_stats()
+        .values("id", "first_msg_at", "last_msg_at", "thumbs_up", "thumbs_down")
+    ):
+        entry = {"thumbs_up": stat["thumbs_up"], "thumbs_down": stat["thumbs_down"]}
+        if stat["first_msg_at"] and stat["last_msg_at"]:
+            entry |= activity_retention_stats(
+                stat["first_msg_at"].astimezone(tz).replace(tzinfo=None),
+                stat["last_msg_at"].astimezone(tz).replace(tzinfo=None),
+            )
+        conv_stats[stat["id"]] = entry
+    for conv_id, row in chunk:
+        yield row | conv_stats.get(conv_id, {})
+
+
 def activity_retention_stats(first_msg_at, last_msg_at) -> dict:
     now = datetime.datetime.now()
     return {
@@ -0,0 +1,320 @@
+from __future__ import annotations
+
+import datetime
+import typing
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import models, transaction
+from django.db.models import (
+    BigIntegerField,
+    CharField,
+    Count,
+    DateTimeField,
+    Func,
+    Max,
+    Min,
+    Q,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Concat, TruncDate, TruncDay
+
+from .convo_msg import CHATML_ROLE_ASSISTANT, Feedback, Message
+
+ROLLUP_BUCKET = datetime.timedelta(minutes=15)
+BUCKETS_PER_DAY = datetime.timedelta(days=1) // ROLLUP_BUCKET
+ROLLUP_ORIGIN = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _zeros() -> list:
+    return [0] * BUCKETS_PER_DAY
+
+
+class CopilotStatsRollup(models.Model):
+    """
+    Pre-aggregated message stats for a BotIntegration, one row per day (in UTC).
+
+    The counters are kept per 15 minute bucket of the day, and each user is stored once
+    along with the first & last bucket they got a reply in. Every UTC offset in use is a
+    multiple of 15 minutes (e.g. IST +5:30, Nepal +5:45), so days in any timezone the stats
+    are viewed in can be put together exactly from two UTC days (see `sum_buckets()`),
+    and weeks / months are then put together from the days.
+    Kept up to date by `bots.tasks.rollup_copilot_stats`.
+    """
+
+    bot_integration = models.ForeignKey(
+        "BotIntegration",
+        on_delete=models.CASCADE,
+        related_name="stats_rollups",
+    )
+    date = models.DateField(help_text="The day (UTC)")
+
+    messages = ArrayField(
+        models.IntegerField(),
+        size=BUCKETS_PER_DAY,
+        default=_zeros,
+        help_text="Number of assistant messages, per 15 minute bucket",
+    )
+    positive_feedbacks = ArrayField(
+        models.IntegerField(), size=BUCKETS_PER_DAY, default=_zeros
+    )
+    negative_feedbacks = ArrayField(
+        models.IntegerField(), size=BUCKETS_PER_DAY, default=_zeros
+    )
+    successful_answers = ArrayField(
+        models.IntegerField(), size=BUCKETS_PER_DAY, default=_zeros
+    )
+    runs = ArrayField(
+        models.IntegerField(),
+        size=BUCKETS_PER_DAY,
+        default=_zeros,
+        help_text="Number of assistant messages with a saved run, per 15 minute bucket",
+    )
+    run_time = ArrayField(
+        models.FloatField(),
+        size=BUCKETS_PER_DAY,
+        default=_zeros,
+        help_text="Total run time of the saved runs in seconds, per 15 minute bucket",
+    )
+    price = ArrayField(
+        models.IntegerField(),
+        size=BUCKETS_PER_DAY,
+        default=_zeros,
+        help_text="Total credits used, per 15 minute bucket",
+    )
+
+    user_hashes = ArrayField(
+        models.BigIntegerField(),
+        default=list,
+        help_text="Hashes of the distinct users that got a reply, to count distinct users across days",
+    )
+    user_first_buckets = ArrayField(
+        models.SmallIntegerField(),
+        default=list,
+        help_text="The first bucket each of `user_hashes` got a reply in",
+    )
+    user_last_buckets = ArrayField(
+        models.SmallIntegerField(),
+        default=list,
+        help_text="The last bucket each of `user_hashes` got a reply in",
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("bot_integration", "date")]
+
+    def __str__(self):
+        return f"{self.bot_integration_id} @ {self.date}"
+
+
+COUNTER_FIELDS = [
+    "messages",
+    "positive_feedbacks",
+    "negative_feedbacks",
+    "successful_answers",
+    "runs",
+    "run_time",
+    "price",
+]
+
+
+class TruncBucket(Func):
+    """
+    Truncate a datetime to the start of its `ROLLUP_BUCKET` (in UTC).
+    Uses `date_bin()`, which needs Postgres 14+.
+    """
+
+    function = "date_bin"
+    output_field = DateTimeField()
+
+    def __init__(self, expression, **kwargs):
+        super().__init__(
+            Value(ROLLUP_BUCKET), expression, Value(ROLLUP_ORIGIN), **kwargs
+        )
+
+
+def utc_day_start(dt: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime.combine(
+        dt.astimezone(datetime.timezone.utc).date(),
+        datetime.time(),
+        tzinfo=datetime.timezone.utc,
+    )
+
+
+def bucket_index(dt: datetime.datetime) -> int:
+    """The 15 minute bucket of its UTC day that `dt` falls in."""
+    return (dt - utc_day_start(dt)) // ROLLUP_BUCKET
+
+
+def update_copilot_stats_rollups(
+    since: datetime.datetime,
+    until: datetime.datetime,
+    *,
+    bot_integration_ids: typing.Iterable[int] | None = None,
+):
+    """
+    Recompute the rollups for every UTC day that overlaps [since, until),
+    optionally only for the given bot integrations.
+    """
+    since = utc_day_start(since)
+    # up to the end of the day that `until` falls in
+    last_day = utc_day_start(until - datetime.timedelta.resolution)
+    until = last_day + datetime.timedelta(days=1)
+    msgs = Message.objects.filter(
+        role=CHATML_ROLE_ASSISTANT, created_at__gte=since, created_at__lt=until
+    )
+    if bot_integration_ids is not None:
+        bot_integration_ids = list(bot_integration_ids)
+        msgs = msgs.filter(conversation__bot_integration_id__in=bot_integration_ids)
+    rollups = {}
+
+    def get_rollup(bi_id: int, dt: datetime.datetime) -> CopilotStatsRollup:
+        key = (bi_id, dt.astimezone(datetime.timezone.utc).date())
+        try:
+            return rollups[key]
+        except KeyError:
+            ret = rollups[key] = CopilotStatsRollup(
+                bot_integration_id=key[0], date=key[1]
+            )
+            return ret
+
+    for row in (
+        msgs.annotate(bucket=TruncBucket("created_at"))
+        .values("conversation__bot_integration_id", "bucket")
+        .annotate(
+            messages=Count("id"),
+            successful_answers=Count(
+                "id",
+                filter=Q(analysis_result__contains={"Answered": True})
+                | Q(analysis_result__contains={"assistant": {"answer": "Found"}}),
+            ),
+            runs=Count("saved_run"),
+            run_time=Sum("saved_run__run_time"),
+            price=Sum("saved_run__price"),
+        )
+        .order_by()
+    ):
+        rollup = get_rollup(row["conversation__bot_integration_id"], row["bucket"])
+        i = bucket_index(row["bucket"])
+        rollup.messages[i] = row["messages"]
+        rollup.successful_answers[i] = row["successful_answers"]
+        rollup.runs[i] = row["runs"]
+        if row["run_time"]:
+            rollup.run_time[i] = row["run_time"].total_seconds()
+        rollup.price[i] = row["price"] or 0
+
+    for row in (
+        msgs.annotate(
+            user_hash=Func(
+                Concat(*Message.convo_user_id_fields, output_field=CharField()),
+                Value(0),
+                function="hashtextextended",
+                output_field=BigIntegerField(),
+            ),
+            date=TruncDate("created_at", tzinfo=datetime.timezone.utc),
+        )
+        .values("conversation__bot_integration_id", "date", "user_hash")
+        .annotate(first_at=Min("created_at"), last_at=Max("created_at"))
+        .order_by()
+    ):
+        rollup = get_rollup(row["conversation__bot_integration_id"], row["first_at"])
+        rollup.user_hashes.append(row["user_hash"])
+        rollup.user_first_buckets.append(bucket_index(row["first_at"]))
+        rollup.user_last_buckets.append(bucket_index(row["last_at"]))
+
+    # counted separately, so that the feedbacks join doesn't multiply the sums above
+    for row in (
+        Feedback.objects.filter(message__in=msgs)
+        .annotate(bucket=TruncBucket("message__created_at"))
+        .values("message__conversation__bot_integration_id", "bucket")
+        .annotate(
+            positive_feedbacks=Count(
+                "message", filter=Q(rating=Feedback.Rating.POSITIVE), distinct=True
+            ),
+            negative_feedbacks=Count(
+                "message", filter=Q(rating=Feedback.Rating.NEGATIVE), distinct=True
+            ),
+        )
+        .order_by()
+    ):
+        rollup = get_rollup(
+            row["message__conversation__bot_integration_id"], row["bucket"]
+        )
+        i = bucket_index(row["bucket"])
+        rollup.positive_feedbacks[i] = row["positive_feedbacks"]
+        rollup.negative_feedbacks[i] = row["negative_feedbacks"]
+
+    stale = CopilotStatsRollup.objects.filter(
+        date__gte=since.date(), date__lt=until.date()
+    )
+    if bot_integration_ids is not None:
+        stale = stale.filter(bot_integration_id__in=bot_integration_ids)
+    with transaction.atomic():
+        # also takes care of days whose messages have all been deleted
+        stale.delete()
+        CopilotStatsRollup.objects.bulk_create(
+            rollups.values(),
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["bot_integration", "date"],
+            update_fields=[
+                *COUNTER_FIELDS,
+                "user_hashes",
+                "user_first_buckets",
+                "user_last_buckets",
+                "updated_at",
+            ],
+        )
+
+
+def get_late_feedback_days(
+    since: datetime.datetime, before: datetime.datetime
+) -> dict[datetime.datetime, set[int]]:
+    """
+    Start of the UTC days before `before` that have received new feedback since `since`,
+    mapped to the bot integrations that need their rollups recomputed.
+    """
+    ret = {}
+    for bi_id, day in (
+        Feedback.objects.filter(created_at__gte=since, message__created_at__lt=before)
+        .annotate(day=TruncDay("message__created_at", tzinfo=datetime.timezone.utc))
+        .values_list("message__conversation__bot_integration_id", "day")
+        .distinct()
+        .order_by()
+    ):
+        ret.setdefault(day, set()).add(bi_id)
+    return ret
+
+
+def sum_buckets(
+    rollups: dict[datetime.date, dict],
+    start: datetime.datetime,
+    end: datetime.datetime,
+) -> dict[str, typing.Any]:
+    """
+    Put together the rollup rows (as dicts, keyed by their `date`) for the time range
+    [start, end), which can span several UTC days, as long as both ends fall on bucket boundaries.
+
+    Returns the sum of each counter, and the set of `users` that got a reply in the range.
+    Users are exact unless the range both starts & ends in the middle of the same UTC day,
+    which never happens for a local day (every UTC offset in use is between -12:00 and +14:00).
+    """
+    import numpy as np
+
+    ret = {field: 0 for field in COUNTER_FIELDS} | dict(users=set())
+    day = utc_day_start(start)
+    while day < end:
+        next_day = day + datetime.timedelta(days=1)
+        row = rollups.get(day.date())
+        if row:
+            lo = bucket_index(start) if start > day else 0
+            hi = bucket_index(end) if end < next_day else BUCKETS_PER_DAY
+            for field in COUNTER_FIELDS:
+                ret[field] += sum(row[field][lo:hi])
+            hashes = np.asarray(row["user_hashes"], dtype=np.int64)
+            first = np.asarray(row["user_first_buckets"])
+            last = np.asarray(row["user_last_buckets"])
+            ret["users"].update(hashes[(last >= lo) & (first < hi)].tolist())
+        day = next_day
+    return ret
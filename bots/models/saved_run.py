@@ -14,6 +14,7 @@ from app_users.models import AppUser
 from bots.admin_links import open_in_new_tab
 from bots.custom_fields import PostgresJSONEncoder
 from daras_ai_v2.crypto import get_random_doc_id
+from daras_ai_v2.redis_cache import get_redis_cache
 from functions.models import CalledFunctionResponse
 from gooeysite.bg_db_conn import get_celery_result_db_safe
 from . import Platform
@@ -259,6 +260,16 @@ class SavedRun(models.Model):
         ).title_with_prefix()
         return title or self.get_app_url()
 
+    def _cancelled_flag_key(self) -> str:
+        return f"gooey/saved-run-cancelled/v1/{self.id}"
+
+    def set_cancelled_flag(self):
+        """Mirror `is_cancelled` in redis, so that the running task can poll it cheaply."""
+        get_redis_cache().set(self._cancelled_flag_key(), 1, ex=60 * 60 * 24)
+
+    def get_cancelled_flag(self) -> bool:
+        return bool(get_redis_cache().exists(self._cancelled_flag_key()))
+
     def get_workflow_metadata(self) -> WorkflowMetadata:
         try:
             metadata = self.workflow_metadata
@@ -8,6 +8,7 @@ from bots.models import Message, SavedRun
 from bots.tasks import msg_analysis
 from daras_ai_v2.base import STARTING_STATE
 from daras_ai_v2.language_model import CHATML_ROLE_ASSISTANT
+from daras_ai_v2.ratelimits import record_run_finished
 
 
 @receiver(pre_save, sender=SavedRun)
@@ -32,6 +33,10 @@ def revoke_saved_run_task_on_cancel(instance: SavedRun, **kwargs):
         # just in case the celery task never started
         instance.run_status = ""
         instance.save(update_fields=["run_status"])
+        record_run_finished(instance)
+
+    # let the running task know without it having to poll the db
+    transaction.on_commit(instance.set_cancelled_flag)
 
     task_id = instance.celery_task_id
     if not task_id:
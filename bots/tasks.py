@@ -18,6 +18,11 @@ from bots.models import (
     Platform,
     SavedRun,
 )
+from bots.models.copilot_stats import (
+    get_late_feedback_days,
+    update_copilot_stats_rollups,
+    utc_day_start,
+)
 from daras_ai_v2.bots import save_msg_pair_to_db
 from daras_ai_v2.facebook_bots import WhatsappBot
 from daras_ai_v2.functional import flatten, map_parallel
@@ -255,3 +260,20 @@ def exec_scheduled_runs():
         sched.save(update_fields=["last_run_at"])
 
         logger.info(f"ran scheduled function {fn_sr.get_app_url()}")
+
+
+@shared_task
+def rollup_copilot_stats(hours: float = 2):
+    """
+    Recompute the copilot stats rollups for the days in the last `hours`,
+    and for any older days that have received feedback since then.
+    """
+    now = timezone.now()
+    since = now - timedelta(hours=hours)
+    update_copilot_stats_rollups(since, now)
+    for day, bi_ids in get_late_feedback_days(
+        since, before=utc_day_start(since)
+    ).items():
+        update_copilot_stats_rollups(
+            day, day + timedelta(days=1), bot_integration_ids=bi_ids
+        )
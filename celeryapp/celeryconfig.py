@@ -25,6 +25,20 @@ app.conf.update(
             "task": "bots.tasks.exec_scheduled_runs",
             "schedule": crontab(hour="0", minute="5"),  # every day at 00:05
         },
+        "rollup_copilot_stats": {
+            "task": "bots.tasks.rollup_copilot_stats",
+            "schedule": crontab(minute="*/10"),  # every 10 minutes
+        },
+        "backfill_copilot_stats": {
+            "task": "bots.tasks.rollup_copilot_stats",
+            "schedule": crontab(hour="0", minute="15"),  # every day at 00:15
+            # picks up analysis results & run times that were filled in late
+            "kwargs": {"hours": 48},
+        },
+        "evict_extraction_cache": {
+            "task": "embeddings.tasks.evict_extraction_cache",
+            "schedule": crontab(minute="30"),  # every hour at :30
+        },
     },
 )
 
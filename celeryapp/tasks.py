@@ -22,6 +22,7 @@ from daras_ai.image_input import truncate_text_words
 from daras_ai_v2 import gcs_v2, settings
 from daras_ai_v2.base import BasePage, StateKeys
 from daras_ai_v2.exceptions import UserError
+from daras_ai_v2.ratelimits import record_run_finished
 from daras_ai_v2.send_email import send_email_via_postmark, send_low_balance_email
 from daras_ai_v2.settings import templates
 from gooeysite.bg_db_conn import db_middleware
@@ -30,6 +31,7 @@ from payments.auto_recharge import (
     should_attempt_auto_recharge,
 )
 from payments.plans import PricingPlan
+from usage_costs.cost_utils import flush_usage_costs
 from workspaces.widgets import set_current_workspace
 
 if typing.TYPE_CHECKING:
@@ -63,9 +65,18 @@ def runner_task(
     error_msg = None
     error_params = None
 
+    realtime_pusher = gui.RealtimeDictPusher(channel)
+    last_saved_at = 0.0
+
     @db_middleware
     def save_on_step(yield_val: str | tuple[str, dict] = None, *, done: bool = False):
-        sr.refresh_from_db(fields=["is_cancelled"])
+        nonlocal last_saved_at
+
+        if done:
+            sr.refresh_from_db(fields=["is_cancelled"])
+        elif not sr.is_cancelled:
+            # cheaper than a db read on every step
+            sr.is_cancelled = sr.get_cancelled_flag()
 
         if isinstance(yield_val, tuple):
             run_status, extra_output = yield_val
@@ -95,15 +106,22 @@ def runner_task(
             | extra_output
         )
 
-        # send outputs to ui
-        gui.realtime_push(channel, output)
-        # dont save unsaved_state
-        saved_state = gui.session_state | output
-        if unsaved_state:
-            for k in unsaved_state:
-                saved_state.pop(k, None)
-        # save to db
-        page.dump_state_to_sr(saved_state, sr)
+        # write the usage costs recorded during this step
+        flush_usage_costs(sr)
+
+        # coalesce db writes, but always save the final state
+        if done or time() - last_saved_at >= 1 / settings.RUNNER_MAX_DB_WRITES_PER_SEC:
+            # dont save unsaved_state
+            saved_state = gui.session_state | output
+            if unsaved_state:
+                for k in unsaved_state:
+                    saved_state.pop(k, None)
+            # save to db
+            page.dump_state_to_sr(saved_state, sr)
+            last_saved_at = time()
+
+        # send outputs to ui (only the keys that changed are re-encoded)
+        realtime_pusher.push(output)
 
         if not done and sr.is_cancelled:
             raise SoftTimeLimitExceeded
@@ -159,13 +177,19 @@ def runner_task(
     # run completed successfully, deduct credits
     else:
         if deduct_credits:
+            # make sure all usage costs are visible to the price calculation
+            flush_usage_costs(sr)
             sr.transaction, sr.price = page.deduct_credits(gui.session_state)
             sr.save(update_fields=["updated_at", "transaction", "price"])
 
     # save everything, mark run as completed
     finally:
-        save_on_step(done=True)
-        threadlocal.saved_run = None
+        try:
+            flush_usage_costs(sr)
+        finally:
+            save_on_step(done=True)
+            threadlocal.saved_run = None
+            record_run_finished(sr)
 
     post_runner_tasks.delay(sr.id)
 
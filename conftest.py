@@ -1,7 +1,8 @@
+import asyncio
 import queue
 import typing
 from collections import defaultdict
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
 from functools import wraps
 from threading import Thread
 from unittest.mock import patch
@@ -57,6 +58,7 @@ def mock_celery_tasks():
         patch("celeryapp.tasks.runner_task", _mock_runner_task),
         patch("celeryapp.tasks.post_runner_tasks", _mock_post_runner_tasks),
         patch("gooey_gui.realtime_subscribe", _mock_realtime_subscribe),
+        patch("gooey_gui.realtime_subscribe_async", _mock_realtime_subscribe_async),
     ):
         yield
 
@@ -90,6 +92,15 @@ def _mock_realtime_subscribe(channel: str):
     yield iterq()
 
 
+@asynccontextmanager
+async def _mock_realtime_subscribe_async(channel: str):
+    async def iterq():
+        while True:
+            yield await asyncio.to_thread(redis_qs[channel].get)
+
+    yield iterq()
+
+
 @pytest.fixture
 def threadpool_subtest(subtests, max_workers: int = 128):
     ts = []
@@ -3,6 +3,7 @@ import math
 import mimetypes
 import os
 import re
+import shutil
 import typing
 import uuid
 from contextlib import contextmanager
@@ -137,6 +138,39 @@ def upload_file_from_bytes(
         return save_local_file_from_bytes(filename, data)[1]
 
 
+def upload_file_from_path(
+    filename: str,
+    path: str | os.PathLike,
+    content_type: str | None = None,
+    content_disposition: str | None = None,
+) -> str:
+    """Like `upload_file_from_bytes()`, but streams the file from disk instead of holding it in memory."""
+    if settings.GS_BUCKET_NAME:
+        blob = gcs_blob_for(filename)
+        # sent along with the upload
+        blob.content_disposition = content_disposition
+        if not content_type:
+            content_type = mimetypes.guess_type(blob.path)[0]
+        content_type = content_type or "application/octet-stream"
+        with register_blob(
+            blob,
+            filename=filename,
+            content_type=content_type,
+            total_bytes=os.path.getsize(path),
+        ):
+            blob.upload_from_filename(path, content_type=content_type)
+        return blob.public_url
+    else:
+        dest = settings.MEDIA_ROOT / str(uuid.uuid1()) / safe_filename(filename)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, dest)
+        return str(
+            furl(settings.APP_BASE_URL)
+            / settings.MEDIA_URL
+            / str(dest.relative_to(settings.MEDIA_ROOT))
+        )
+
+
 @contextmanager
 def generate_signed_url(filename: str, content_type: str | None = None):
     blob = gcs_blob_for(filename)
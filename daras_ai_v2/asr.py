@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import mmap
 import multiprocessing
 import os.path
 import tempfile
@@ -19,6 +22,7 @@ from furl import furl
 from daras_ai.image_input import upload_file_from_bytes, gs_url_to_uri
 from daras_ai_v2 import settings
 from daras_ai_v2.azure_asr import azure_asr
+from daras_ai_v2.disk_cache import DiskCache
 from daras_ai_v2.enum_selector_widget import enum_selector
 from daras_ai_v2.exceptions import (
     raise_for_status,
@@ -43,16 +47,21 @@ from daras_ai_v2.language_filters import (
     normalised_lang_in_collection,
     sort_language_options,
 )
-from daras_ai_v2.redis_cache import redis_cache_decorator
+from daras_ai_v2.local_cache import LocalCache
+from daras_ai_v2.redis_cache import get_redis_cache, redis_cache_decorator
 from daras_ai_v2.sarvam_asr import sarvam_saaras_v3_asr
 from daras_ai_v2.scraping_proxy import SCRAPING_PROXIES, get_scraping_proxy_cert_path
 from daras_ai_v2.text_splitter import text_splitter
 
 if typing.TYPE_CHECKING:
     import google.cloud.speech_v2
+    from glossary_resources.models import GlossaryResource
     from google.auth.transport.requests import AuthorizedSession
 
 TRANSLATE_BATCH_SIZE = 8
+# https://cloud.google.com/translate/docs/reference/rest/v3/projects/translateText
+TRANSLATE_V3_MAX_CONTENTS = 1024
+TRANSLATE_V3_MAX_CODEPOINTS = 30_000
 MAYURA_MAX_LEN = 1_000
 
 SHORT_FILE_CUTOFF = 5 * 1024 * 1024  # 1 MB
@@ -1004,51 +1013,139 @@ def run_google_translate(
             for code in detected_source_languges
         ]
 
-    return map_parallel(
-        lambda text, src_lang: _translate_text(
-            text, target_language, src_lang, glossary_url
-        ),
-        texts,
-        detected_source_languges,
-        max_workers=TRANSLATE_BATCH_SIZE,
+    return _translate_texts(
+        texts, target_language, detected_source_languges, glossary_url
     )
 
 
-def _translate_text(
-    text: str,
+def _translate_texts(
+    texts: list[str],
     target_language: str,
-    source_language: str,
+    source_languages: list[str],
     glossary_url: str | None,
-) -> str:
-    is_romanized = source_language.endswith("-Latn")
-    source_language = source_language.split("-")[0]
-    enable_transliteration = (
-        is_romanized and source_language in TRANSLITERATION_SUPPORTED
+) -> list[str]:
+    """
+    Translate the texts with as few Google Translate v3 requests as possible.
+
+    Texts are first looked up in the translation memory. The rest are deduped and grouped by
+    source language & transliteration into requests of up to `TRANSLATE_V3_MAX_CODEPOINTS`.
+    """
+    ret = list(texts)
+    # (source_language, enable_transliteration) -> text -> indexes of the text
+    idxs_by_config: dict[tuple[str, bool], dict[str, list[int]]] = {}
+    for i, (text, source_language) in enumerate(zip(texts, source_languages)):
+        is_romanized = source_language.endswith("-Latn")
+        source_language = source_language.split("-")[0]
+        enable_transliteration = (
+            is_romanized and source_language in TRANSLITERATION_SUPPORTED
+        )
+        # prevent incorrect API calls
+        if not text or source_language == target_language or source_language == "und":
+            continue
+        config = (source_language, enable_transliteration)
+        idxs_by_config.setdefault(config, {}).setdefault(text, []).append(i)
+
+    glossary = None
+    glossary_path = None
+    glossary_uses = sum(
+        len(idxs)
+        for (_, enable_transliteration), idxs_by_text in idxs_by_config.items()
+        if not enable_transliteration
+        for idxs in idxs_by_text.values()
     )
+    if glossary_url and glossary_uses:
+        from glossary_resources.models import GlossaryResource
 
-    # prevent incorrect API calls
-    if not text or source_language == target_language or source_language == "und":
-        return text
+        glossary = GlossaryResource.objects.get_or_create_from_url(glossary_url)[0]
+        GlossaryResource.objects.filter(pk=glossary.pk).update(
+            usage_count=F("usage_count") + glossary_uses
+        )
+        glossary_path = glossary.get_glossary_path()
 
+    # serve what we can from the translation memory
+    memory_keys = {
+        (config, text): _translation_memory_key(
+            text,
+            source_language=config[0],
+            target_language=target_language,
+            enable_transliteration=config[1],
+            glossary=None if config[1] else glossary,
+        )
+        for config, idxs_by_text in idxs_by_config.items()
+        for text in idxs_by_text
+    }
+    misses = {}
+    for (config, text), result in zip(
+        memory_keys, _translation_memory_get(list(memory_keys.values()))
+    ):
+        if result is None:
+            misses.setdefault(config, []).append(text)
+            continue
+        for i in idxs_by_config[config][text]:
+            ret[i] = result
+
+    # batch the rest by the request size limits
+    batches = []
+    for config, config_texts in misses.items():
+        batch = []
+        batch_len = 0
+        for text in config_texts:
+            if batch and (
+                len(batch) >= TRANSLATE_V3_MAX_CONTENTS
+                or batch_len + len(text) > TRANSLATE_V3_MAX_CODEPOINTS
+            ):
+                batches.append((config, batch))
+                batch = []
+                batch_len = 0
+            batch.append(text)
+            batch_len += len(text)
+        batches.append((config, batch))
+
+    results = map_parallel(
+        lambda config, batch: _translate_batch(
+            batch,
+            target_language=target_language,
+            source_language=config[0],
+            enable_transliteration=config[1],
+            glossary_location=None if config[1] else glossary and glossary.location,
+            glossary_path=None if config[1] else glossary_path,
+        ),
+        [config for config, _ in batches],
+        [batch for _, batch in batches],
+        max_workers=TRANSLATE_BATCH_SIZE,
+    )
+    new_memory = {}
+    for (config, batch), batch_results in zip(batches, results):
+        for text, result in zip(batch, batch_results):
+            for i in idxs_by_config[config][text]:
+                ret[i] = result
+            new_memory[memory_keys[config, text]] = result
+    _translation_memory_set(new_memory)
+    return ret
+
+
+def _translate_batch(
+    texts: list[str],
+    *,
+    target_language: str,
+    source_language: str,
+    enable_transliteration: bool,
+    glossary_location: str | None,
+    glossary_path: str | None,
+) -> list[str]:
     config = {
         "target_language_code": target_language,
-        "contents": text,
+        "contents": texts,
         "mime_type": "text/plain",
         "transliteration_config": {"enable_transliteration": enable_transliteration},
     }
     if source_language != "auto":
         config["source_language_code"] = source_language
 
-    if glossary_url and not enable_transliteration:
-        from glossary_resources.models import GlossaryResource
-
-        gr = GlossaryResource.objects.get_or_create_from_url(glossary_url)[0]
-        GlossaryResource.objects.filter(pk=gr.pk).update(
-            usage_count=F("usage_count") + 1
-        )
-        location = gr.location
+    if glossary_path:
+        location = glossary_location
         config["glossary_config"] = {
-            "glossary": gr.get_glossary_path(),
+            "glossary": glossary_path,
             "ignoreCase": True,
         }
     else:
@@ -1061,11 +1158,57 @@ def _translate_text(
     )
     raise_for_status(res)
     data = res.json()
-    try:
-        result = data["glossaryTranslations"][0]["translatedText"]
-    except (KeyError, IndexError):
-        result = data["translations"][0]["translatedText"]
-    return result.strip()
+    translations = data.get("glossaryTranslations") or data["translations"]
+    if len(translations) != len(texts):
+        raise RuntimeError(
+            f"Expected {len(texts)} translations, got {len(translations)}"
+        )
+    return [translation["translatedText"].strip() for translation in translations]
+
+
+_local_translation_memory: LocalCache[str, str] = LocalCache(
+    maxsize=settings.TRANSLATION_MEMORY_LOCAL_CACHE_SIZE
+)
+
+
+def _translation_memory_key(
+    text: str,
+    *,
+    source_language: str,
+    target_language: str,
+    enable_transliteration: bool,
+    glossary: GlossaryResource | None,
+) -> str:
+    # a new glossary_id is assigned whenever the glossary document changes
+    glossary_id = glossary and glossary.glossary_id or ""
+    text_hash = hashlib.sha256(text.encode()).hexdigest()
+    return (
+        f"gooey/translation-memory/v1/google-v3/{source_language}/{target_language}"
+        f"/{int(enable_transliteration)}/{glossary_id}/{text_hash}"
+    )
+
+
+def _translation_memory_get(keys: list[str]) -> list[str | None]:
+    ret = [_local_translation_memory.get(key) for key in keys]
+    redis_misses = [i for i, result in enumerate(ret) if result is None]
+    if redis_misses:
+        values = get_redis_cache().mget([keys[i] for i in redis_misses])
+        for i, data in zip(redis_misses, values):
+            if data is None:
+                continue
+            ret[i] = data.decode()
+            _local_translation_memory.set(keys[i], ret[i])
+    return ret
+
+
+def _translation_memory_set(results: dict[str, str]):
+    if not results:
+        return
+    with get_redis_cache().pipeline(transaction=False) as pipe:
+        for key, result in results.items():
+            pipe.set(key, result.encode(), ex=settings.TRANSLATION_MEMORY_EXPIRY)
+            _local_translation_memory.set(key, result)
+        pipe.execute()
 
 
 def _MinT_translate_one_text(
@@ -1636,23 +1779,86 @@ def download_youtube_to_wav(youtube_url: str) -> bytes:
     return wavdata
 
 
-def audio_url_to_wav(audio_url: str) -> tuple[bytes, int]:
+_audio_wav_cache = DiskCache(
+    settings.AUDIO_CACHE_DIR, max_bytes=settings.AUDIO_CACHE_MAX_BYTES, suffix=".wav"
+)
+AUDIO_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def audio_url_to_wav(audio_url: str) -> tuple[bytes | mmap.mmap, int]:
+    """
+    Download the audio and convert it to a single channel wav.
+
+    Results are cached on local disk, keyed by the url + etag (or by the content hash),
+    and returned mmap'ed so that long recordings don't have to be held in memory.
+    """
     from daras_ai_v2.vector_search import is_yt_dlp_able_url
 
-    if is_yt_dlp_able_url(audio_url):
-        wavdata = download_youtube_to_wav(audio_url)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        in_path = os.path.join(tmpdir, "infile")
+        if is_yt_dlp_able_url(audio_url):
+            cache_key = _audio_cache_key(audio_url)
+            wavdata = _audio_wav_cache.get(cache_key)
+            if wavdata is not None:
+                return wavdata, len(wavdata)
+            with open(in_path, "wb") as f:
+                f.write(download_youtube_to_wav(audio_url))
+
+        elif is_gdrive_url(furl(audio_url)):
+            meta: dict[str, str] = gdrive_metadata(
+                url_to_gdrive_file_id(furl(audio_url))
+            )
+            cache_key = _audio_cache_key(
+                audio_url, meta.get("md5Checksum") or meta.get("modifiedTime")
+            )
+            wavdata = _audio_wav_cache.get(cache_key)
+            if wavdata is not None:
+                return wavdata, len(wavdata)
+            anybytes, _ = gdrive_download(
+                furl(audio_url), meta.get("mimeType", "audio/wav")
+            )
+            with open(in_path, "wb") as f:
+                f.write(anybytes)
+
+        else:
+            with requests.get(audio_url, stream=True) as r:
+                raise_for_status(r, is_user_url=True)
+                etag = r.headers.get("etag")
+                if etag:
+                    cache_key = _audio_cache_key(audio_url, etag)
+                    wavdata = _audio_wav_cache.get(cache_key)
+                    if wavdata is not None:
+                        # skip downloading the body
+                        return wavdata, len(wavdata)
+                content_hash = _download_to_file(r, in_path)
+            if not etag:
+                cache_key = _audio_cache_key("sha256:" + content_hash)
+                wavdata = _audio_wav_cache.get(cache_key)
+                if wavdata is not None:
+                    return wavdata, len(wavdata)
+
+        wav_path = audio_file_to_wav(in_path, os.path.join(tmpdir, "outfile.wav"))
+        _audio_wav_cache.put_file(cache_key, wav_path)
+        wavdata = _audio_wav_cache.get(cache_key)
+        if wavdata is None:
+            # the cache is disabled, or the file doesn't fit in it
+            with open(wav_path, "rb") as f:
+                wavdata = f.read()
         return wavdata, len(wavdata)
 
-    if is_gdrive_url(furl(audio_url)):
-        meta: dict[str, str] = gdrive_metadata(url_to_gdrive_file_id(furl(audio_url)))
-        anybytes, _ = gdrive_download(
-            furl(audio_url), meta.get("mimeType", "audio/wav")
-        )
-        return audio_bytes_to_wav(anybytes)
 
-    r = requests.get(audio_url)
-    raise_for_status(r, is_user_url=True)
-    return audio_bytes_to_wav(r.content)
+def _audio_cache_key(*parts: str | None) -> str:
+    return hashlib.sha256(json.dumps([FFMPEG_WAV_ARGS, *parts]).encode()).hexdigest()
+
+
+def _download_to_file(r: requests.Response, path: str) -> str:
+    """Stream the response body to `path`, and return its sha256."""
+    hasher = hashlib.sha256()
+    with open(path, "wb") as f:
+        for chunk in r.iter_content(chunk_size=AUDIO_DOWNLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            f.write(chunk)
+    return hasher.hexdigest()
 
 
 def audio_url_to_wav_url(audio_url: str) -> tuple[str, int]:
@@ -1674,30 +1880,43 @@ def audio_url_to_wav_url(audio_url: str) -> tuple[str, int]:
     if is_yt_dlp_able_url(audio_url):
         return download_youtube_to_wav_url(audio_url)
 
-    r = requests.get(audio_url)
-    raise_for_status(r, is_user_url=True)
-    audio_bytes = r.content
-    wavdata, size = audio_bytes_to_wav(audio_bytes)
-    if wavdata is audio_bytes:  # no change, don't re-upload
-        return audio_url, size
-    else:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        in_path = os.path.join(tmpdir, "infile")
+        with requests.get(audio_url, stream=True) as r:
+            raise_for_status(r, is_user_url=True)
+            _download_to_file(r, in_path)
+        wav_path = audio_file_to_wav(in_path, os.path.join(tmpdir, "outfile.wav"))
+        if wav_path == in_path:  # no change, don't re-upload
+            return audio_url, os.path.getsize(in_path)
         filename = furl(audio_url.strip("/")).path.segments[-1] + ".wav"
+        with open(wav_path, "rb") as f:
+            wavdata = f.read()
         return upload_file_from_bytes(filename, wavdata, "audio/wav"), len(wavdata)
 
 
 def audio_bytes_to_wav(audio_bytes: bytes) -> tuple[bytes, int]:
-    with tempfile.NamedTemporaryFile() as infile:
-        infile.write(audio_bytes)
-        infile.flush()
-
-        if check_wav_audio_format(infile.name):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        in_path = os.path.join(tmpdir, "infile")
+        with open(in_path, "wb") as f:
+            f.write(audio_bytes)
+        wav_path = audio_file_to_wav(in_path, os.path.join(tmpdir, "outfile.wav"))
+        if wav_path == in_path:
             # already a wav file
-            return audio_bytes, os.path.getsize(infile.name)
+            return audio_bytes, len(audio_bytes)
+        with open(wav_path, "rb") as f:
+            wavdata = f.read()
+        return wavdata, len(wavdata)
+
 
-        with tempfile.NamedTemporaryFile(suffix=".wav") as outfile:
-            # convert audio to single channel wav
-            ffmpeg("-i", infile.name, *FFMPEG_WAV_ARGS, outfile.name)
-            return outfile.read(), os.path.getsize(outfile.name)
+def audio_file_to_wav(in_path: str, out_path: str) -> str:
+    """
+    Convert the audio file to single channel wav at `out_path`.
+    Returns the path of the wav file, which is `in_path` if it's already in the right format.
+    """
+    if check_wav_audio_format(in_path):
+        return in_path
+    ffmpeg("-i", in_path, *FFMPEG_WAV_ARGS, out_path)
+    return out_path
 
 
 def check_wav_audio_format(filename: str) -> bool:
@@ -54,7 +54,12 @@ from daras_ai_v2.openapi_tricks import (
 )
 from daras_ai_v2.preview_img import media_preview_img
 from daras_ai_v2.query_params_util import extract_query_params
-from daras_ai_v2.ratelimits import RateLimitExceeded, ensure_rate_limits
+from daras_ai_v2.ratelimits import (
+    RateLimitExceeded,
+    ensure_rate_limits,
+    record_request,
+    record_run_started,
+)
 from daras_ai_v2.send_email import send_reported_run_email
 from daras_ai_v2.urls import paginate_button, paginate_queryset
 from daras_ai_v2.user_date_widgets import render_local_dt_attrs
@@ -2222,6 +2227,11 @@ class BasePage:
         )
 
         self.dump_state_to_sr(self._get_validated_state(), sr)
+        if not enable_rate_limits:
+            # rate limited runs were already counted by ensure_rate_limits()
+            record_request(sr)
+        if run_status:
+            record_run_started(sr)
 
         return sr
 
@@ -80,6 +80,29 @@ def _get_workspace_seat_options(plan: PricingPlan) -> dict[int, SeatType]:
     return {seat_type.id: seat_type for seat_type in qs}
 
 
+def get_next_invoice_timestamp(
+    subscription: Subscription, placeholder: str = "..."
+) -> float | None:
+    """Fetch the next invoice time from the payment provider, in the background."""
+    return gui.run_in_thread(
+        _get_next_invoice_timestamp,
+        args=[subscription.payment_provider, subscription.external_id],
+        cache=True,
+        placeholder=placeholder,
+        key=f"run_in_thread/next_invoice_ts/{subscription.id}",
+        # a pure read, so it's shared with other sessions (e.g. other members of the workspace)
+        shared=True,
+    )
+
+
+def _get_next_invoice_timestamp(
+    payment_provider: int, external_id: str
+) -> float | None:
+    return Subscription(
+        payment_provider=payment_provider, external_id=external_id
+    ).get_next_invoice_timestamp()
+
+
 def _get_scheduled_downgrade_info(subscription_model) -> dict[str, typing.Any]:
     if (
         not subscription_model
@@ -325,9 +348,7 @@ def render_current_plan(workspace: Workspace):
 
         with right, gui.div(className="d-flex align-items-center gap-1"):
             if provider and (
-                next_invoice_ts := gui.run_in_thread(
-                    workspace.subscription.get_next_invoice_timestamp, cache=True
-                )
+                next_invoice_ts := get_next_invoice_timestamp(workspace.subscription)
             ):
                 gui.html("Next invoice on ")
                 with gui.tag("span", className="badge rounded-pill text-bg-dark"):
@@ -963,11 +984,7 @@ def _render_downgrade_subscription_button(
     next_invoice_ts = (
         workspace.subscription
         and workspace.subscription.is_paid()
-        and gui.run_in_thread(
-            workspace.subscription.get_next_invoice_timestamp,
-            cache=True,
-            placeholder="",
-        )
+        and get_next_invoice_timestamp(workspace.subscription, placeholder="")
     )
     if next_invoice_ts:
         effective_date = datetime.fromtimestamp(next_invoice_ts).strftime("%d %b %Y")
@@ -1030,9 +1047,7 @@ def _render_upgrade_subscription_button(
                 workspace, plan, seat_selection
             )
 
-        next_invoice_ts = gui.run_in_thread(
-            workspace.subscription.get_next_invoice_timestamp, cache=True
-        )
+        next_invoice_ts = get_next_invoice_timestamp(workspace.subscription)
         modal_content = get_order_summary_content(
             plan,
             seat_selection,
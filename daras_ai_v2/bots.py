@@ -545,6 +545,8 @@ def _process_and_send_msg(
     sent_msg_id = None  # this is the message id to record in the db
     last_idx = 0  # this is the last index of the text sent to the user
     prev_final_prompt = []  # this is the last final_prompt sent to the user
+    final_state = None  # the terminal state pushed by the runner, if received
+    streaming_done = False
     if bot.streaming_enabled:
         # subscribe to the realtime channel for updates
         channel = bot.page_cls.realtime_channel_name(sr.run_id, sr.uid)
@@ -558,7 +560,12 @@ def _process_and_send_msg(
                     bot.send_msg(text=ERROR_MSG.format(err_msg))
                     return  # abort
                 if bot.recipe_run_state != RecipeRunState.running:
+                    if not state.get(StateKeys.run_status):
+                        # the last push from the runner has the full output
+                        final_state = state
                     break  # we're done running, stop streaming
+                if streaming_done:
+                    continue  # all text was sent, wait for the run to finish
 
                 final_prompt = state.get("final_prompt") or []
                 # send prompt chunks that are new (only tool calls for now, as content is sent via text field)
@@ -599,13 +606,15 @@ def _process_and_send_msg(
                     sent_msg_id = update_msg_id
                     # don't show buttons again
                     send_feedback_buttons = False
-                if streaming_done:
-                    break  # we're done streaming, stop the loop
 
-    # wait for the celery task to finish
-    sr.wait_for_celery_result(result)
-    # get the final state from db
-    state = sr.to_dict()
+    if final_state is not None:
+        # the runner only pushes the outputs, the inputs are the same as the request
+        state = dict(input_prompt=body.get("input_prompt")) | final_state
+    else:
+        # wait for the celery task to finish
+        sr.wait_for_celery_result(result)
+        # get the final state from db
+        state = sr.to_dict()
     bot.recipe_run_state = bot.page_cls.get_run_state(state)
     bot.run_status = state.get(StateKeys.run_status) or ""
     # check for errors
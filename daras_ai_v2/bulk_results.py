@@ -0,0 +1,128 @@
+import json
+import tempfile
+import typing
+from time import time
+
+from loguru import logger
+
+from daras_ai.image_input import upload_file_from_bytes
+from daras_ai_v2 import settings
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+OutputFormat = typing.Literal["csv", "parquet"]
+
+OUTPUT_CONTENT_TYPES: dict[OutputFormat, str] = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class CheckpointTimer:
+    """
+    Decides when partial results are worth uploading:
+    every `interval_sec` seconds, or every `interval_rows` rows, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        interval_sec: float | None = None,
+        interval_rows: int | None = None,
+    ):
+        self.interval_sec = interval_sec or settings.BULK_CHECKPOINT_INTERVAL_SEC
+        self.interval_rows = interval_rows or settings.BULK_CHECKPOINT_INTERVAL_ROWS
+        self.last_checkpoint_at = time()
+        self.rows_since_checkpoint = 0
+
+    def tick(self, rows: int = 1) -> bool:
+        self.rows_since_checkpoint += rows
+        if (
+            self.rows_since_checkpoint < self.interval_rows
+            and time() - self.last_checkpoint_at < self.interval_sec
+        ):
+            return False
+        self.last_checkpoint_at = time()
+        self.rows_since_checkpoint = 0
+        return True
+
+
+class SpooledResults:
+    """
+    Append-only spool of result records on local disk, keyed by their position in the input,
+    so results can be appended in any order and materialized in input order.
+
+    The spool itself is uploaded as the checkpoint, which lets a restarted run
+    skip everything that was already done (see `from_url()`).
+    """
+
+    def __init__(self):
+        self._file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.keys: set[int] = set()
+        self.num_rows = 0
+
+    @classmethod
+    def from_url(cls, url: str) -> "SpooledResults":
+        from daras_ai_v2.vector_search import download_content_bytes
+
+        spool = cls()
+        data, _ = download_content_bytes(
+            f_url=url, mime_type="application/jsonl", is_user_url=False
+        )
+        for line in data.decode().splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # a partial write at the end of the spool
+                logger.warning(f"ignoring bad line in bulk results checkpoint {url}")
+                continue
+            spool.append(entry["key"], entry["recs"])
+        return spool
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.keys
+
+    def append(self, key: int, recs: list[dict]):
+        self._file.write(json.dumps(dict(key=key, recs=recs), default=str) + "\n")
+        self.keys.add(key)
+        self.num_rows += len(recs)
+
+    def iter_records(self) -> typing.Iterator[dict]:
+        self._file.flush()
+        self._file.seek(0)
+        entries = [json.loads(line) for line in self._file]
+        self._file.seek(0, 2)
+        entries.sort(key=lambda entry: entry["key"])
+        for entry in entries:
+            yield from entry["recs"]
+
+    def to_df(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.DataFrame.from_records(list(self.iter_records()))
+
+    def upload_checkpoint(self, filename: str) -> str:
+        self._file.flush()
+        self._file.seek(0)
+        data = self._file.read().encode()
+        self._file.seek(0, 2)
+        return upload_file_from_bytes(filename, data, "application/jsonl")
+
+    def close(self):
+        self._file.close()
+
+
+def upload_df(
+    df: "pd.DataFrame", filename: str, output_format: OutputFormat = "csv"
+) -> str:
+    match output_format:
+        case "parquet":
+            # mixed-type columns can't be written to parquet
+            data = df.astype(str).to_parquet(index=False)
+        case _:
+            data = df.to_csv(index=False).encode()
+    return upload_file_from_bytes(
+        filename=f"{filename}.{output_format}",
+        data=data,
+        content_type=OUTPUT_CONTENT_TYPES[output_format],
+    )
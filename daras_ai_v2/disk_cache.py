@@ -0,0 +1,91 @@
+import mmap
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+from loguru import logger
+
+
+class DiskCache:
+    """
+    A cache of files in a local directory, bounded by their total size.
+
+    Reads are mmap'ed, so cached values live in the page cache instead of the process heap.
+    The least recently used files (by mtime, which is bumped on every read) are evicted first.
+    Since the state is all on disk, the directory can be shared between worker processes.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int, suffix: str = ""):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> mmap.mmap | bytes | None:
+        if self.max_bytes <= 0:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                os.utime(f.fileno())
+                if os.fstat(f.fileno()).st_size:
+                    ret = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    ret = b""  # empty files can't be mmap'ed
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ret
+
+    def put_file(self, key: str, src: str | os.PathLike):
+        """Copy the file at `src` into the cache."""
+        if self.max_bytes <= 0 or os.path.getsize(src) > self.max_bytes:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # write to a temp file first, so that readers never see a partial file
+        tmp_path = self.directory / f".{uuid.uuid4()}.tmp"
+        try:
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self.evict()
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith(self.suffix) or entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.evictions += 1
+            logger.debug(f"evicted from {self.directory}: {self.stats()}")
+
+    def stats(self) -> dict[str, int]:
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key + self.suffix)
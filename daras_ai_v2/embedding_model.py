@@ -1,6 +1,6 @@
 import hashlib
-import io
 import typing
+from collections import Counter
 from enum import Enum
 from functools import partial
 
@@ -13,8 +13,14 @@ from jinja2.lexer import whitespace_re
 from loguru import logger
 
 from daras_ai_v2 import settings
+from daras_ai_v2.functional import AdaptiveConcurrency, map_parallel_adaptive
 from daras_ai_v2.gpu_server import call_celery_task
-from daras_ai_v2.language_model import get_openai_client, openai_should_retry
+from daras_ai_v2.language_model import (
+    AZURE_OPENAI_MODEL_PREFIX,
+    get_openai_client,
+    openai_should_retry,
+)
+from daras_ai_v2.local_cache import LocalCache
 from daras_ai_v2.redis_cache import (
     get_redis_cache,
 )
@@ -90,31 +96,156 @@ def create_embeddings_cached(
 ) -> list[np.ndarray | None]:
     # replace newlines, which can negatively affect performance.
     texts = [whitespace_re.sub(" ", text) for text in texts]
-    # get the redis cache
-    redis_cache = get_redis_cache()
-    # load the embeddings from the cache
-    ret = [
-        (
-            np_loads(data)
-            if (data := redis_cache.get(_embed_cache_key(text, model.name)))
-            else None
-        )
-        for text in texts
-    ]
+    cache_keys = [_embed_cache_key(text, model.name) for text in texts]
+    ret = _load_cached_embeddings(cache_keys)
     # list of embeddings that need to be created
     misses = [i for i, c in enumerate(ret) if c is None]
+    embed_cache_stats["misses"] += len(misses)
     if misses:
         # create the embeddings in bulk
         embeddings = create_embeddings(texts=[texts[i] for i in misses], model=model)
+        _save_cached_embeddings([cache_keys[i] for i in misses], embeddings)
+        # fill in missing values
         for i, embedding in zip(misses, embeddings):
-            # save the embedding to the cache
-            text = texts[i]
-            redis_cache.set(_embed_cache_key(text, model.name), np_dumps(embedding))
-            # fill in missing values
             ret[i] = embedding
     return ret
 
 
+def create_embeddings_batched(
+    texts: list[str], model: EmbeddingModels
+) -> typing.Iterator[tuple[int, np.ndarray]]:
+    """
+    Embed all the texts of a document, yielding `(index, embedding)` pairs as batches are done.
+
+    Identical texts (e.g. repeated headers) are only embedded once, and fanned back out to every index.
+    Cache misses are sent to the provider in batches sized by its token budget,
+    with a concurrency that backs off on rate limits.
+    """
+    # replace newlines, which can negatively affect performance.
+    indices_by_text = {}
+    for i, text in enumerate(texts):
+        indices_by_text.setdefault(whitespace_re.sub(" ", text), []).append(i)
+    unique_texts = list(indices_by_text)
+    cache_keys = [_embed_cache_key(text, model.name) for text in unique_texts]
+
+    misses = []
+    for text, cache_key, embedding in zip(
+        unique_texts, cache_keys, _load_cached_embeddings(cache_keys)
+    ):
+        if embedding is None:
+            misses.append((text, cache_key))
+            continue
+        for i in indices_by_text[text]:
+            yield i, embedding
+    embed_cache_stats["misses"] += len(misses)
+
+    def create_batch(batch: list[tuple[str, str]]) -> np.ndarray:
+        embeddings = create_embeddings(texts=[text for text, _ in batch], model=model)
+        _save_cached_embeddings([cache_key for _, cache_key in batch], embeddings)
+        return embeddings
+
+    batches = _batch_by_token_budget(misses, get_embedding_batch_limits(model))
+    for batch, embeddings in zip(
+        batches,
+        map_parallel_adaptive(
+            create_batch,
+            batches,
+            concurrency=AdaptiveConcurrency(
+                2, max_limit=settings.EMBEDDING_MAX_CONCURRENCY
+            ),
+            is_throttled=is_rate_limit_error,
+        ),
+    ):
+        for (text, _), embedding in zip(batch, embeddings):
+            for i in indices_by_text[text]:
+                yield i, embedding
+
+
+class EmbeddingBatchLimits(typing.NamedTuple):
+    max_inputs: int
+    max_tokens: int
+
+
+def get_embedding_batch_limits(model: EmbeddingModels) -> EmbeddingBatchLimits:
+    if "openai" in model.name:
+        # openai allows 2048 inputs & 300k tokens per request
+        max_inputs = 2048
+        model_ids = (
+            [model.model_id] if isinstance(model.model_id, str) else model.model_id
+        )
+        if any(m.startswith(AZURE_OPENAI_MODEL_PREFIX) for m in model_ids):
+            # every batch goes to the azure deployment first, so stay within its cap
+            # (otherwise azure rejects it and `try_all()` silently falls back to openai)
+            max_inputs = min(max_inputs, settings.AZURE_OPENAI_EMBEDDING_MAX_INPUTS)
+        return EmbeddingBatchLimits(
+            max_inputs=max_inputs, max_tokens=settings.EMBEDDING_BATCH_MAX_TOKENS
+        )
+    elif "mistral" in model.name:
+        return EmbeddingBatchLimits(max_inputs=128, max_tokens=16_000)
+    else:
+        # self-hosted models, keep the gpu batches small
+        return EmbeddingBatchLimits(max_inputs=32, max_tokens=16_000)
+
+
+def _batch_by_token_budget(
+    items: list[tuple[str, str]], limits: EmbeddingBatchLimits
+) -> list[list[tuple[str, str]]]:
+    from daras_ai_v2.text_splitter import default_length_function
+
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for item in items:
+        tokens = default_length_function(item[0])
+        if batch and (
+            len(batch) >= limits.max_inputs or batch_tokens + tokens > limits.max_tokens
+        ):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    # works for both openai's APIStatusError and requests' HTTPError
+    status_code = getattr(e, "status_code", None) or getattr(
+        getattr(e, "response", None), "status_code", None
+    )
+    return status_code == 429
+
+
+def _load_cached_embeddings(cache_keys: list[str]) -> list[np.ndarray | None]:
+    # load the embeddings from the in-process cache
+    ret = [_local_embed_cache.get(key) for key in cache_keys]
+    # load the rest from redis in a single round trip
+    redis_misses = [i for i, c in enumerate(ret) if c is None]
+    if redis_misses:
+        redis_cache = get_redis_cache()
+        values = redis_cache.mget([cache_keys[i] for i in redis_misses])
+        for i, data in zip(redis_misses, values):
+            if not data:
+                continue
+            ret[i] = embedding_loads(data)
+            _local_embed_cache.set(cache_keys[i], ret[i])
+            embed_cache_stats["redis_hits"] += 1
+    return ret
+
+
+def _save_cached_embeddings(cache_keys: list[str], embeddings: np.ndarray):
+    # save the embeddings to the cache in a single round trip
+    with get_redis_cache().pipeline(transaction=False) as pipe:
+        for cache_key, embedding in zip(cache_keys, embeddings):
+            pipe.set(cache_key, embedding_dumps(embedding))
+            # a float32 copy, so that local hits match redis hits,
+            # and the rows don't keep the whole batch array alive
+            _local_embed_cache.set(cache_key, embedding.astype(np.float32))
+        pipe.execute()
+
+
 def create_embeddings(texts: list[str], model: EmbeddingModels) -> np.ndarray:
     if "openai" in model.name:
         ret = _run_openai_embedding(texts=texts, model_id=model.model_id)
@@ -139,22 +270,35 @@ def create_embeddings(texts: list[str], model: EmbeddingModels) -> np.ndarray:
     return arr
 
 
+_local_embed_cache: LocalCache[str, np.ndarray] = LocalCache(
+    maxsize=settings.EMBEDDING_LOCAL_CACHE_SIZE
+)
+# number of embeddings served from redis / computed from scratch
+# (hits from the in-process cache are tracked by `_local_embed_cache.stats()`)
+embed_cache_stats = Counter()
+
+
 def _embed_cache_key(text: str, model_name: str) -> str:
-    return f"gooey/{model_name}/v1/{sha256(text)}"
+    return f"gooey/{model_name}/v2/{_embed_cache_dtype().str}/{sha256(text)}"
 
 
 def sha256(text):
     return hashlib.sha256(text.encode()).hexdigest()
 
 
-def np_loads(data: bytes) -> np.ndarray:
-    return np.load(io.BytesIO(data))
+def _embed_cache_dtype() -> np.dtype:
+    if settings.EMBEDDING_CACHE_FLOAT16:
+        return np.dtype(np.float16)
+    else:
+        return np.dtype(np.float32)
+
+
+def embedding_loads(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=_embed_cache_dtype()).astype(np.float32)
 
 
-def np_dumps(a: np.ndarray) -> bytes:
-    f = io.BytesIO()
-    np.save(f, a)
-    return f.getvalue()
+def embedding_dumps(a: np.ndarray) -> bytes:
+    return a.astype(_embed_cache_dtype()).tobytes()
 
 
 def _run_gpu_embedding(texts: list[str], model_id: str) -> list[list[float]]:
@@ -0,0 +1,47 @@
+import csv
+import itertools
+import json
+import tempfile
+import typing
+from urllib.parse import quote
+
+from fastapi.encoders import jsonable_encoder
+
+from daras_ai.image_input import upload_file_from_path
+
+
+def upload_csv_rows(filename: str, rows: typing.Iterable[dict]) -> str:
+    """
+    Write rows to a csv file on local disk as they are produced, and upload it from disk.
+    The columns are taken from the first row.
+    The file is served as a download named `filename`, since browsers ignore
+    the `download` attribute of links to other origins.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="") as f:
+        if first is not None:
+            writer = csv.DictWriter(f, fieldnames=list(first), extrasaction="ignore")
+            writer.writeheader()
+            for row in itertools.chain([first], rows):
+                writer.writerow(row)
+        f.flush()
+        return upload_file_from_path(
+            filename,
+            f.name,
+            "text/csv",
+            content_disposition=f"attachment; filename*=UTF-8''{quote(filename)}",
+        )
+
+
+def upload_json_rows(filename: str, rows: typing.Iterable[dict]) -> str:
+    """Write rows to a json array on local disk as they are produced, and upload it from disk."""
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8") as f:
+        f.write("[")
+        for i, row in enumerate(rows):
+            if i:
+                f.write(",")
+            json.dump(jsonable_encoder(row), f)
+        f.write("]")
+        f.flush()
+        return upload_file_from_path(filename, f.name, "application/json")
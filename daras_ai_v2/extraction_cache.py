@@ -0,0 +1,194 @@
+"""
+A cache for the extracted text of documents (pdftotext / OCR / ASR / pandoc),
+so that re-chunking or re-embedding a document doesn't pay for the extraction again.
+
+Results are keyed on the document url, its content (hash or etag) and the extractor settings,
+stored as parquet files in GCS (or in local media, if GCS is not configured),
+and evicted least-recently-used first by `embeddings.tasks.evict_extraction_cache`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import os
+import typing
+
+from django.db.models import Sum
+from django.utils import timezone
+from loguru import logger
+
+from daras_ai.image_input import gcs_bucket
+from daras_ai_v2 import settings
+from daras_ai_v2.asr import AsrModels
+from embeddings.models import ExtractedDocument
+
+if typing.TYPE_CHECKING:
+    import pandas as pd
+
+# bump when the extractors change their output
+EXTRACTION_CACHE_VERSION = 1
+
+PAGE_COLUMN = "page"
+
+
+def get_extractor_name(
+    mime_type: str | None,
+    *,
+    selected_asr_model: str | None,
+    document_model: str | None,
+) -> str:
+    """
+    The extractor (and its settings) that will be used for a document of the given `mime_type`.
+    Pass `mime_type=None` if the type is not known yet (i.e. before downloading).
+    """
+    if mime_type is None:
+        return f"any/{document_model or ''}/{selected_asr_model or ''}"
+    if mime_type.startswith("audio/") or mime_type.startswith("video/"):
+        return "asr/" + (selected_asr_model or AsrModels.whisper_large_v2.name)
+    if mime_type == "application/pdf":
+        return "pdf/" + (document_model or "pdftotext")
+    return "default"
+
+
+def extraction_cache_key(
+    *, f_url: str, f_name: str, content_id: str, extractor: str
+) -> str:
+    """
+    `content_id` identifies the document content -- its etag or a hash of its bytes.
+    The url and name are part of the key, since they end up in the extracted DataFrames.
+    """
+    return hashlib.sha256(
+        json.dumps(
+            [EXTRACTION_CACHE_VERSION, f_url, f_name, content_id, extractor]
+        ).encode()
+    ).hexdigest()
+
+
+def get_cached_extraction(cache_key: str) -> list[str] | pd.DataFrame | None:
+    import pandas as pd
+
+    if not settings.EXTRACTION_CACHE_MAX_BYTES:
+        return None
+    try:
+        entry = ExtractedDocument.objects.get(cache_key=cache_key)
+    except ExtractedDocument.DoesNotExist:
+        return None
+    try:
+        df = pd.read_parquet(io.BytesIO(_read_file(cache_key)))
+    except Exception as e:
+        logger.warning(f"ignore error while reading extraction cache {entry}: {e!r}")
+        entry.delete()
+        return None
+    ExtractedDocument.objects.filter(pk=entry.pk).update(
+        last_accessed_at=timezone.now()
+    )
+    logger.debug(f"extraction cache hit: {entry}")
+    if entry.is_pages:
+        return df[PAGE_COLUMN].tolist()
+    return df
+
+
+def save_extraction(
+    cache_key: str,
+    *,
+    f_url: str,
+    extractor: str,
+    pages: list[str] | pd.DataFrame,
+):
+    import pandas as pd
+
+    if not settings.EXTRACTION_CACHE_MAX_BYTES:
+        return
+    is_pages = isinstance(pages, list)
+    if is_pages:
+        df = pd.DataFrame({PAGE_COLUMN: pages})
+    else:
+        df = pages
+    try:
+        data = df.to_parquet(index=False, compression="zstd")
+        _write_file(cache_key, data)
+    except Exception as e:
+        # caching is best-effort, e.g. parquet can't store some column types
+        logger.warning(f"ignore error while saving extraction cache {f_url}: {e!r}")
+        return
+    ExtractedDocument.objects.update_or_create(
+        cache_key=cache_key,
+        defaults=dict(
+            url=f_url,
+            extractor=extractor,
+            is_pages=is_pages,
+            total_bytes=len(data),
+            last_accessed_at=timezone.now(),
+        ),
+    )
+
+
+def evict_extractions(max_bytes: int):
+    """Delete the least recently used entries until the cache fits in `max_bytes`."""
+    total = ExtractedDocument.objects.aggregate(total=Sum("total_bytes"))["total"] or 0
+    if total <= max_bytes:
+        return
+    kept = 0
+    to_delete = []
+    for pk, cache_key, total_bytes in (
+        ExtractedDocument.objects.order_by("-last_accessed_at")
+        .values_list("pk", "cache_key", "total_bytes")
+        .iterator(chunk_size=1000)
+    ):
+        kept += total_bytes
+        if kept > max_bytes:
+            to_delete.append((pk, cache_key))
+    logger.info(
+        f"evicting {len(to_delete)} extraction cache entries ({total=} {max_bytes=})"
+    )
+    for i in range(0, len(to_delete), 1000):
+        batch = to_delete[i : i + 1000]
+        # delete the rows first, so that a failed file deletion can at worst leave an orphan file
+        ExtractedDocument.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+        for _, cache_key in batch:
+            try:
+                _delete_file(cache_key)
+            except Exception as e:
+                logger.warning(f"ignore error while evicting {cache_key}: {e!r}")
+
+
+def _file_path(cache_key: str) -> str:
+    return os.path.join("extraction-cache", cache_key + ".parquet")
+
+
+def _read_file(cache_key: str) -> bytes:
+    if settings.GS_BUCKET_NAME:
+        return _gcs_blob(cache_key).download_as_bytes()
+    else:
+        return (settings.MEDIA_ROOT / _file_path(cache_key)).read_bytes()
+
+
+def _write_file(cache_key: str, data: bytes):
+    if settings.GS_BUCKET_NAME:
+        _gcs_blob(cache_key).upload_from_string(
+            data, content_type="application/vnd.apache.parquet"
+        )
+    else:
+        path = settings.MEDIA_ROOT / _file_path(cache_key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+def _delete_file(cache_key: str):
+    if settings.GS_BUCKET_NAME:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            _gcs_blob(cache_key).delete()
+        except NotFound:
+            pass
+    else:
+        (settings.MEDIA_ROOT / _file_path(cache_key)).unlink(missing_ok=True)
+
+
+def _gcs_blob(cache_key: str):
+    return gcs_bucket().blob(
+        os.path.join(settings.GS_MEDIA_PATH, _file_path(cache_key))
+    )
@@ -1,6 +1,10 @@
 import json
+import queue
+import threading
 import typing
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from time import time
 
 import numpy as np
 
@@ -45,6 +49,48 @@ def apply_parallel(
         return ret
 
 
+def apply_parallel_gen(
+    fn: typing.Callable[..., typing.Generator[str, None, R]],
+    *iterables,
+    max_workers: int = None,
+    message: str = "",
+) -> typing.Generator[str, None, list[R]]:
+    """
+    Like `apply_parallel()`, but for generator functions -
+    the status messages yielded by each generator are forwarded as they arrive.
+    """
+    assert iterables, "apply_parallel_gen() requires at least one iterable"
+    max_workers = max_workers or max(map(len, iterables))
+    if not max_workers:
+        yield
+        return []
+    statuses = queue.SimpleQueue()
+
+    def drain(*args):
+        gen = fn(*args)
+        while True:
+            try:
+                status = next(gen)
+            except StopIteration as e:
+                return e.value
+            if status:
+                statuses.put(status)
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, initializer=get_initializer()
+    ) as pool:
+        fs = [pool.submit(drain, *args) for args in zip(*iterables)]
+        length = len(fs)
+        pending = set(fs)
+        while pending:
+            done, pending = wait(pending, timeout=0.5)
+            while not statuses.empty():
+                yield f"[{length - len(pending)}/{length}] {statuses.get()}"
+            if done:
+                yield f"[{length - len(pending)}/{length}] {message}"
+        return [fut.result() for fut in fs]
+
+
 def fetch_parallel(
     fn: typing.Callable[..., R],
     *iterables,
@@ -121,6 +167,99 @@ def map_parallel_ascompleted(
             yield fs.pop(fut), fut.result()
 
 
+class AdaptiveConcurrency:
+    """
+    An additive-increase / multiplicative-decrease limit on the number of concurrent calls.
+
+    The limit grows by 1 after `limit` calls in a row succeed, shrinks by 1 when a call is
+    `slow_factor` times slower than the running average, and halves when a call is throttled.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        *,
+        max_limit: int,
+        min_limit: int = 1,
+        slow_factor: float = 3,
+    ):
+        self.limit = initial
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.slow_factor = slow_factor
+        self._avg_latency = None
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def on_success(self, latency: float):
+        with self._lock:
+            avg = self._avg_latency
+            self._avg_latency = latency if avg is None else 0.8 * avg + 0.2 * latency
+            if avg is not None and latency > avg * self.slow_factor:
+                self._successes = 0
+                self.limit = max(self.limit - 1, self.min_limit)
+                return
+            self._successes += 1
+            if self._successes >= self.limit:
+                self._successes = 0
+                self.limit = min(self.limit + 1, self.max_limit)
+
+    def on_throttle(self):
+        with self._lock:
+            self._successes = 0
+            self.limit = max(self.limit // 2, self.min_limit)
+
+
+def map_parallel_adaptive(
+    fn: typing.Callable[[T], R],
+    items: typing.Iterable[T],
+    *,
+    concurrency: AdaptiveConcurrency,
+    is_throttled: typing.Callable[[Exception], bool],
+    max_throttled_retries: int = 3,
+) -> typing.Iterator[R]:
+    """
+    Like `map_parallel()`, but the number of concurrent calls follows `concurrency`,
+    and results are yielded in order, as soon as they and all the ones before them are done.
+    Calls that fail with a throttling error are retried after the concurrency is reduced.
+    """
+    items = list(items)
+    results = {}
+    retries = [0] * len(items)
+    todo = deque(range(len(items)))
+    next_idx = 0
+    with ThreadPoolExecutor(
+        max_workers=concurrency.max_limit, initializer=get_initializer()
+    ) as executor:
+        running = {}
+        while next_idx < len(items):
+            while todo and len(running) < concurrency.limit:
+                idx = todo.popleft()
+                running[executor.submit(_timed_call, fn, items[idx])] = idx
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                idx = running.pop(fut)
+                try:
+                    latency, results[idx] = fut.result()
+                except Exception as e:
+                    if not is_throttled(e) or retries[idx] >= max_throttled_retries:
+                        raise
+                    retries[idx] += 1
+                    concurrency.on_throttle()
+                    todo.appendleft(idx)
+                else:
+                    concurrency.on_success(latency)
+            while next_idx in results:
+                yield results.pop(next_idx)
+                next_idx += 1
+
+
+def _timed_call(fn: typing.Callable[[T], R], item: T) -> tuple[float, R]:
+    start = time()
+    ret = fn(item)
+    return time() - start, ret
+
+
 def flatten(l1: typing.Iterable[typing.Iterable[T]]) -> list[T]:
     return [it for l2 in l1 for it in l2]
 
@@ -4,9 +4,10 @@ import base64
 import json
 import mimetypes
 import re
+import threading
 import typing
 from copy import deepcopy
-from functools import wraps
+from functools import lru_cache, wraps
 from time import time
 
 import aifail
@@ -35,10 +36,14 @@ from daras_ai_v2.functional import flatten
 from daras_ai_v2.gpu_server import call_celery_task
 from daras_ai_v2.language_model_body import LLMMessageExtraContent, to_llm_body
 from daras_ai_v2.language_model_openai_audio import run_openai_audio
-from daras_ai_v2.redis_cache import redis_cache_decorator
 from daras_ai_v2.text_splitter import default_length_function, default_separators
 from functions.base_llm_tool import BaseLLMTool
 
+if typing.TYPE_CHECKING:
+    import openai
+
+    OpenAIClientT = typing.TypeVar("OpenAIClientT", bound=openai.OpenAI)
+
 
 def openai_should_retry(e: Exception) -> bool:
     from celeryapp.tasks import is_task_cancelled
@@ -1330,80 +1335,128 @@ def get_openai_client(
     import openai
 
     if base_url:
-        client = openai.OpenAI(
+        client = get_pooled_openai_client(
+            openai.OpenAI,
             api_key=api_key or settings.OPENAI_API_KEY,
-            max_retries=0,
             base_url=base_url,
         )
     elif model.startswith(AZURE_OPENAI_MODEL_PREFIX) and "-ca-" in model:
-        client = openai.AzureOpenAI(
+        client = get_pooled_openai_client(
+            openai.AzureOpenAI,
             api_key=settings.AZURE_OPENAI_KEY_CA,
             azure_endpoint=settings.AZURE_OPENAI_ENDPOINT_CA,
             api_version="2024-12-01-preview",
-            max_retries=0,
         )
     elif model.startswith(AZURE_OPENAI_MODEL_PREFIX) and "-eastus2-" in model:
-        client = openai.AzureOpenAI(
+        client = get_pooled_openai_client(
+            openai.AzureOpenAI,
             api_key=settings.AZURE_OPENAI_KEY_EASTUS2,
             azure_endpoint=settings.AZURE_OPENAI_ENDPOINT_EASTUS2,
             api_version="2024-12-01-preview",
-            max_retries=0,
         )
     elif model.startswith("sarvam-"):
-        client = openai.OpenAI(
+        client = get_pooled_openai_client(
+            openai.OpenAI,
             api_key=settings.SARVAM_API_KEY,
-            max_retries=0,
             base_url="https://api.sarvam.ai/v1",
         )
     elif model.startswith("claude-"):
-        client = openai.OpenAI(
+        client = get_pooled_openai_client(
+            openai.OpenAI,
             api_key=settings.ANTHROPIC_API_KEY,
-            max_retries=0,
             base_url="https://api.anthropic.com/v1",
         )
     elif model.startswith("google/"):
-        client = openai.OpenAI(
-            api_key=get_google_auth_token(),
-            max_retries=0,
+        # the auth token is short-lived, so swap it in without creating a new connection pool
+        client = get_pooled_openai_client(
+            openai.OpenAI,
+            api_key="google-auth-token",
             base_url=f"https://aiplatform.googleapis.com/v1/projects/{settings.GCP_PROJECT}/locations/{settings.GCP_REGION}/endpoints/openapi",
-        )
+        ).with_options(api_key=get_google_auth_token())
     elif model.startswith("aisingapore/"):
-        client = openai.OpenAI(
+        client = get_pooled_openai_client(
+            openai.OpenAI,
             api_key=settings.SEA_LION_API_KEY,
-            max_retries=0,
             base_url="https://api.sea-lion.ai/v1",
         )
     elif model.startswith("swiss-ai/"):
-        client = openai.OpenAI(
+        client = get_pooled_openai_client(
+            openai.OpenAI,
             api_key=settings.PUBLICAI_API_KEY,
-            max_retries=0,
             base_url="https://api.publicai.co/v1",
             default_headers={"User-Agent": "gooey/openai-sdk"},
         )
     elif model.startswith("AI71ai/"):
-        import modal
-        from modal_functions.agri_llm import app
-
-        modal_fn = modal.Function.from_name(app.name, "serve")
-        client = openai.OpenAI(
+        client = get_pooled_openai_client(
+            openai.OpenAI,
             api_key=settings.MODAL_VLLM_API_KEY,
-            max_retries=0,
-            base_url=str(furl(modal_fn.get_web_url()) / "v1"),
+            base_url=_get_modal_vllm_base_url(),
         )
     elif model.startswith("mistral-"):
-        client = openai.OpenAI(
+        client = get_pooled_openai_client(
+            openai.OpenAI,
             api_key=settings.MISTRAL_API_KEY,
-            max_retries=0,
             base_url="https://api.mistral.ai/v1",
         )
     else:
-        client = openai.OpenAI(
+        client = get_pooled_openai_client(
+            openai.OpenAI,
             api_key=settings.OPENAI_API_KEY,
-            max_retries=0,
         )
     return client
 
 
+_openai_clients: dict[tuple, typing.Any] = {}
+_openai_clients_lock = threading.Lock()
+
+
+def get_pooled_openai_client(
+    client_cls: type[OpenAIClientT], **kwargs
+) -> OpenAIClientT:
+    """
+    Return a process-wide client for the given provider config.
+
+    Clients (and their httpx connection pools) are reused across calls and threads,
+    so that every request doesn't pay for a fresh TCP + TLS handshake.
+    """
+    key = (client_cls, json.dumps(kwargs, sort_keys=True))
+    try:
+        return _openai_clients[key]
+    except KeyError:
+        pass
+    with _openai_clients_lock:
+        try:
+            return _openai_clients[key]
+        except KeyError:
+            pass
+        import httpx
+        import openai
+
+        client = client_cls(
+            **kwargs,
+            max_retries=0,
+            http_client=openai.DefaultHttpxClient(
+                http2=settings.LLM_HTTP2,
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY_SEC,
+                ),
+            ),
+        )
+        _openai_clients[key] = client
+        return client
+
+
+@lru_cache
+def _get_modal_vllm_base_url() -> str:
+    import modal
+    from modal_functions.agri_llm import app
+
+    modal_fn = modal.Function.from_name(app.name, "serve")
+    return str(furl(modal_fn.get_web_url()) / "v1")
+
+
 @aifail.retry_if(aifail.http_should_retry)
 def _run_groq_chat(
     *,
@@ -1775,11 +1828,24 @@ def format_chat_entry(
     return {"role": role, "content": content}
 
 
-@redis_cache_decorator(ex=3600)  # Cache for 1 hour
-def get_google_auth_token():
-    from google.auth import default
+_google_auth_lock = threading.Lock()
+
+
+def get_google_auth_token() -> str:
     import google.auth.transport.requests
 
-    credentials, _ = default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
-    credentials.refresh(google.auth.transport.requests.Request())
+    credentials = _get_google_auth_credentials()
+    # refresh only when the token is about to expire
+    if not credentials.valid:
+        with _google_auth_lock:
+            if not credentials.valid:
+                credentials.refresh(google.auth.transport.requests.Request())
     return credentials.token
+
+
+@lru_cache
+def _get_google_auth_credentials():
+    from google.auth import default
+
+    credentials, _ = default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+    return credentials
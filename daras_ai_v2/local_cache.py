@@ -0,0 +1,68 @@
+import threading
+import typing
+from collections import OrderedDict
+from time import monotonic
+
+K = typing.TypeVar("K")
+V = typing.TypeVar("V")
+
+_missing = object()
+
+
+class LocalCache(typing.Generic[K, V]):
+    """
+    A thread-safe, bounded, in-process LRU cache with an optional TTL.
+
+    Meant to sit in front of redis / the database for small, hot values
+    that are read far more often than they are written.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        with self._lock:
+            try:
+                expires_at, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if self.ttl is not None and expires_at < monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: K, value: V):
+        if self.maxsize <= 0:
+            return
+        expires_at = monotonic() + self.ttl if self.ttl is not None else 0
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: K, default: V | None = None) -> V | None:
+        with self._lock:
+            item = self._data.pop(key, _missing)
+        if item is _missing:
+            return default
+        return item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return dict(hits=self.hits, misses=self.misses, size=len(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
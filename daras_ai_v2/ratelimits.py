@@ -1,4 +1,8 @@
-from datetime import timedelta
+import hashlib
+import typing
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from time import time
 
 from django.contrib.humanize.templatetags.humanize import naturaltime
 from django.utils import timezone
@@ -13,6 +17,7 @@ from bots.models.convo_msg import (
     Message,
 )
 from daras_ai_v2 import settings
+from daras_ai_v2.redis_cache import get_redis_cache
 from workspaces.models import Workspace
 
 
@@ -20,16 +25,31 @@ def ensure_bot_rate_limits(convo: Conversation):
     if convo.bot_integration.disable_rate_limits:
         return
 
-    msgs_today = Message.objects.filter(
-        role=CHATML_ROLE_USER,
-        created_at__gte=timezone.now() - timedelta(days=1),
-        conversation__bot_integration=convo.bot_integration,
-        **{
-            f"conversation__{field}": getattr(convo, field)
-            for field in Conversation.user_id_fields
-        },
+    user_key = hashlib.sha256(
+        repr([getattr(convo, field) for field in Conversation.user_id_fields]).encode()
+    ).hexdigest()
+    window = SlidingWindow(
+        f"bot-msgs/{convo.bot_integration_id}/{user_key}",
+        window_sec=timedelta(days=1).total_seconds(),
+        seed_fn=lambda since: (
+            Message.objects.filter(
+                role=CHATML_ROLE_USER,
+                created_at__gte=since,
+                conversation__bot_integration=convo.bot_integration,
+                **{
+                    f"conversation__{field}": getattr(convo, field)
+                    for field in Conversation.user_id_fields
+                },
+            ).values_list("id", "created_at")
+        ),
+    )
+    # rejected messages are never saved, so they don't count towards the limit either
+    num_msgs, latest_at = window.hit(
+        limit=min(
+            settings.MAX_MESSAGES_PER_DAY_WARNING, settings.MAX_MESSAGES_PER_DAY_BLOCK
+        )
+        + 1
     )
-    num_msgs = msgs_today.count()
 
     if num_msgs > settings.MAX_MESSAGES_PER_DAY_BLOCK:
         # block the conversation
@@ -47,9 +67,7 @@ def ensure_bot_rate_limits(convo: Conversation):
             convo.blocked_status = ConvoBlockedStatus.WARNING
             convo.blocked_at = timezone.now()
             convo.save(update_fields=["blocked_status", "blocked_at"])
-        retry_after = timedelta(hours=25) - (
-            timezone.now() - msgs_today.latest("created_at").created_at
-        )
+        retry_after = timedelta(hours=25) - (timezone.now() - latest_at)
         raise RateLimitExceeded(
             retry_after=retry_after.total_seconds(),
             msg=(
@@ -96,15 +114,13 @@ def ensure_rate_limits(
             max_concurrency = settings.MAX_CONCURRENCY_FREE
         max_concurrency_reset_min = 30
 
-    qs = SavedRun.objects.filter(workflow=workflow, uid=user.uid)
-    requests = qs.filter(
-        created_at__gte=timezone.now() - timedelta(minutes=max_requests_reset_min)
-    ).count()
+    requests, latest_at = requests_window(
+        workflow, user.uid, reset_min=max_requests_reset_min
+    ).hit(limit=max_requests)
     if requests >= max_requests:
         short_title = workflow.get_or_create_metadata().short_title
         retry_after = (
-            timedelta(minutes=max_requests_reset_min)
-            - (timezone.now() - qs.latest("created_at").created_at)
+            timedelta(minutes=max_requests_reset_min) - (timezone.now() - latest_at)
         ).total_seconds()
         raise RateLimitExceeded(
             retry_after,
@@ -114,14 +130,9 @@ def ensure_rate_limits(
             f"Retry after: {retry_after:.1f}s.",
         )
 
-    running = (
-        qs.filter(
-            created_at__gte=timezone.now()
-            - timedelta(minutes=max_concurrency_reset_min)
-        )
-        .exclude(run_status="")
-        .count()
-    )
+    running = running_runs_window(
+        workflow, user.uid, reset_min=max_concurrency_reset_min
+    ).count()
     if running >= max_concurrency:
         short_title = workflow.get_or_create_metadata().short_title
         retry_after = (running - max_concurrency + 1) * estimated_run_time_sec
@@ -134,6 +145,176 @@ def ensure_rate_limits(
         )
 
 
+def requests_window(
+    workflow: Workflow, uid: str, reset_min: float = 1
+) -> "SlidingWindow":
+    return SlidingWindow(
+        f"requests/{workflow.value}/{uid}",
+        window_sec=timedelta(minutes=reset_min).total_seconds(),
+        seed_fn=lambda since: (
+            SavedRun.objects.filter(
+                workflow=workflow, uid=uid, created_at__gte=since
+            ).values_list("run_id", "created_at")
+        ),
+    )
+
+
+def record_request(sr: SavedRun):
+    """
+    Count runs that skipped `ensure_rate_limits()` towards the requests limit,
+    like the db count used to.
+    """
+    requests_window(Workflow(sr.workflow), sr.uid).add(sr.run_id, sr.created_at)
+
+
+def running_runs_window(
+    workflow: Workflow, uid: str, reset_min: float = 30
+) -> "SlidingWindow":
+    return SlidingWindow(
+        f"running/{workflow.value}/{uid}",
+        window_sec=timedelta(minutes=reset_min).total_seconds(),
+        seed_fn=lambda since: (
+            SavedRun.objects.filter(workflow=workflow, uid=uid, created_at__gte=since)
+            .exclude(run_status="")
+            .values_list("run_id", "created_at")
+        ),
+    )
+
+
+def record_run_started(sr: SavedRun):
+    """Keep the concurrency window in sync without re-counting runs in the db."""
+    running_runs_window(Workflow(sr.workflow), sr.uid).add(sr.run_id, sr.created_at)
+
+
+def record_run_finished(sr: SavedRun):
+    running_runs_window(Workflow(sr.workflow), sr.uid).remove(sr.run_id)
+
+
+def bulk_runs_window(workspace: Workspace) -> "SlidingWindow":
+    """Sub-runs of bulk jobs that are in flight for the workspace."""
+    return SlidingWindow(
+        f"bulk-runs/{workspace.id}",
+        window_sec=timedelta(hours=1).total_seconds(),
+        seed_fn=lambda since: (
+            SavedRun.objects.filter(
+                workspace=workspace,
+                surface=SavedRun.Surface.bulk,
+                created_at__gte=since,
+            )
+            .exclude(run_status="")
+            .values_list("run_id", "created_at")
+        ),
+    )
+
+
+class SlidingWindow:
+    """
+    A sliding window log of events, stored as a redis sorted set of member -> unix timestamp.
+    Counting, trimming and recording an event happens atomically in a single round-trip.
+
+    If the key is missing (first use, or evicted from the cache), the window is seeded
+    from `seed_fn(since)`, which must return (member, created_at) pairs from the db.
+    A marker member with score 0 tells an empty window apart from a missing one.
+    """
+
+    # KEYS = [key]; ARGV = [now, window_sec, limit, member]
+    # Returns {count, latest timestamp} or {-1} if the window needs to be seeded.
+    # The member is only recorded if count < limit.
+    _hit_script = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1}
+end
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '(0', '(' .. (now - window))
+local count = redis.call('ZCOUNT', KEYS[1], '(0', '+inf')
+local latest = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')[2]
+if count < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    latest = ARGV[1]
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(window))
+return {count, latest}
+"""
+
+    # KEYS = [key]; ARGV = [window_sec, score, member, score, member, ...]
+    _seed_script = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], 0, '')
+for i = 2, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[1])))
+return 1
+"""
+
+    # KEYS = [key]; ARGV = [score, member]
+    # A missing window is left alone, the next seed will pick up the event from the db.
+    _add_script = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+end
+"""
+
+    def __init__(
+        self,
+        key: str,
+        *,
+        window_sec: float,
+        seed_fn: typing.Callable[
+            [datetime], typing.Iterable[tuple[typing.Any, datetime]]
+        ],
+    ):
+        self.key = f"gooey/ratelimits/v1/{key}"
+        self.window_sec = window_sec
+        self.seed_fn = seed_fn
+
+    def hit(self, limit: int, member: str | None = None) -> tuple[int, datetime | None]:
+        """
+        Record a new event, unless there are already `limit` events in the window.
+        Pass a `member` to be able to `remove()` the event later.
+
+        Returns the number of events in the window before this one,
+        and the time of the latest event (None if the window is empty).
+        """
+        return self._hit(limit, member or uuid.uuid4().hex)
+
+    def count(self) -> int:
+        count, _ = self._hit(0, "")
+        return count
+
+    def add(self, member: str, created_at: datetime):
+        r = get_redis_cache()
+        r.register_script(self._add_script)(
+            keys=[self.key], args=[created_at.timestamp(), member]
+        )
+
+    def remove(self, member: str):
+        get_redis_cache().zrem(self.key, member)
+
+    def _hit(self, limit: int, member: str) -> tuple[int, datetime | None]:
+        script = get_redis_cache().register_script(self._hit_script)
+        args = [time(), self.window_sec, limit, member]
+        ret = script(keys=[self.key], args=args)
+        if ret[0] < 0:
+            self._seed()
+            ret = script(keys=[self.key], args=args)
+        count, latest = ret
+        if not float(latest):
+            # only the seed marker is left
+            return count, None
+        return count, datetime.fromtimestamp(float(latest), tz=dt_timezone.utc)
+
+    def _seed(self):
+        since = timezone.now() - timedelta(seconds=self.window_sec)
+        args = [self.window_sec]
+        for member, created_at in self.seed_fn(since):
+            args += [created_at.timestamp(), str(member)]
+        get_redis_cache().register_script(self._seed_script)(keys=[self.key], args=args)
+
+
 class RateLimitExceeded(HTTPException):
     def __init__(self, retry_after: float, msg: str):
         self.status_code = 429
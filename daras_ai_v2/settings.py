@@ -301,6 +301,12 @@ CLOUDFLARE_PAGES_URL = config(
     "CLOUDFLARE_PAGES_URL", default="https://gooey-static-pages.pages.dev"
 )
 MAX_UPLOAD_SIZE = config("MAX_UPLOAD_SIZE", default=1024 * 1024 * 250, cast=int)
+# documents are streamed to disk when downloaded, and refused beyond this size
+MAX_DOCUMENT_DOWNLOAD_BYTES = config(
+    "MAX_DOCUMENT_DOWNLOAD_BYTES", default=1024 * 1024 * 1024, cast=int
+)
+# sync API calls give up waiting for the run after this long (the run itself keeps going)
+SYNC_API_TIMEOUT_SEC = config("SYNC_API_TIMEOUT_SEC", default=60 * 60, cast=int)
 
 GOOGLE_CLIENT_ID = config("GOOGLE_CLIENT_ID", default="")
 FIREBASE_CONFIG = config("FIREBASE_CONFIG", default="")
@@ -366,6 +372,8 @@ SUPPORT_EMAIL = "Gooey.AI Support <support@gooey.ai>"
 SALES_EMAIL = "Gooey.AI Sales <sales@gooey.ai>"
 PAYMENT_EMAIL = "Gooey.AI Payments <payment-support@gooey.ai>"
 SEND_RUN_EMAIL_AFTER_SEC = config("SEND_RUN_EMAIL_AFTER_SEC", 5)
+# max number of times per second a running task saves its intermediate state to the db
+RUNNER_MAX_DB_WRITES_PER_SEC = config("RUNNER_MAX_DB_WRITES_PER_SEC", 2, cast=float)
 
 DISALLOWED_TITLE_SLUGS = config("DISALLOWED_TITLE_SLUGS", cast=Csv(), default="") + [
     # tab names
@@ -413,6 +421,9 @@ ADDON_AMOUNT_CHOICES = [5, 10, 30, 50, 100, 300, 500, 1000]  # USD
 AUTO_RECHARGE_BALANCE_THRESHOLD_CHOICES = [300, 1000, 3000, 10000]  # Credit balance
 AUTO_RECHARGE_COOLDOWN_SECONDS = config("AUTO_RECHARGE_COOLDOWN_SECONDS", 60, cast=int)
 
+# how long each process may serve a cached ModelPricing row
+MODEL_PRICING_CACHE_TTL_SEC = config("MODEL_PRICING_CACHE_TTL_SEC", 5 * 60, cast=int)
+
 LOW_BALANCE_EMAIL_CREDITS = config("LOW_BALANCE_EMAIL_CREDITS", 200, cast=int)
 LOW_BALANCE_EMAIL_DAYS = config("LOW_BALANCE_EMAIL_DAYS", 7, cast=int)
 LOW_BALANCE_EMAIL_ENABLED = config("LOW_BALANCE_EMAIL_ENABLED", True, cast=bool)
@@ -464,6 +475,35 @@ TWITTER_BEARER_TOKEN = config("TWITTER_BEARER_TOKEN", None)
 
 REDIS_MODELS_CACHE_EXPIRY = 60 * 60 * 24 * 7
 
+# translations of repeated texts (e.g. bot responses, doc snippets) are reused from redis & memory
+TRANSLATION_MEMORY_EXPIRY = config(
+    "TRANSLATION_MEMORY_EXPIRY", 60 * 60 * 24 * 30, cast=int
+)
+TRANSLATION_MEMORY_LOCAL_CACHE_SIZE = config(
+    "TRANSLATION_MEMORY_LOCAL_CACHE_SIZE", 4096, cast=int
+)
+# local disk cache of audio files transcoded to wav, shared by the worker processes on a machine
+AUDIO_CACHE_DIR = config("AUDIO_CACHE_DIR", "/tmp/gooey-audio-cache")
+AUDIO_CACHE_MAX_BYTES = config("AUDIO_CACHE_MAX_BYTES", 2 * 1024**3, cast=int)
+
+# number of embeddings to keep in each process, in front of redis
+EMBEDDING_LOCAL_CACHE_SIZE = config("EMBEDDING_LOCAL_CACHE_SIZE", 2048, cast=int)
+# store cached embeddings as float16 instead of float32 (halves redis memory)
+EMBEDDING_CACHE_FLOAT16 = config("EMBEDDING_CACHE_FLOAT16", False, cast=bool)
+# token budget of each embedding request to openai, and the max concurrent requests per document
+EMBEDDING_BATCH_MAX_TOKENS = config("EMBEDDING_BATCH_MAX_TOKENS", 100_000, cast=int)
+EMBEDDING_MAX_CONCURRENCY = config("EMBEDDING_MAX_CONCURRENCY", 8, cast=int)
+# inputs per embedding request to the azure openai deployments (16 for older deployments, up to 2048 for newer ones)
+AZURE_OPENAI_EMBEDDING_MAX_INPUTS = config(
+    "AZURE_OPENAI_EMBEDDING_MAX_INPUTS", 16, cast=int
+)
+# max total size of the cached document extractions, least recently used are evicted first (0 to disable)
+EXTRACTION_CACHE_MAX_BYTES = config(
+    "EXTRACTION_CACHE_MAX_BYTES", 50 * 1024**3, cast=int
+)
+# upper bound for the per-document concurrency of OCR calls, which adapts to throttling
+DOC_EXTRACT_MAX_CONCURRENCY = config("DOC_EXTRACT_MAX_CONCURRENCY", 16, cast=int)
+
 GPU_CELERY_BROKER_URL = config("GPU_CELERY_BROKER_URL", "amqp://localhost:5674")
 GPU_CELERY_RESULT_BACKEND = config(
     "GPU_CELERY_RESULT_BACKEND", "redis://localhost:6374"
@@ -503,10 +543,22 @@ INTRON_API_KEY = config("INTRON_API_KEY", "")
 VESPA_URL = config("VESPA_URL", "http://localhost:8085")
 VESPA_CONFIG_SERVER_URL = config("VESPA_CONFIG_SERVER_URL", "http://localhost:19071")
 VESPA_SCHEMA = config("VESPA_SCHEMA", "gooey")
+# bulk feeding - concurrent requests, pooled connections and max buffered documents
+VESPA_FEED_MAX_WORKERS = config("VESPA_FEED_MAX_WORKERS", 8, cast=int)
+VESPA_FEED_MAX_CONNECTIONS = config("VESPA_FEED_MAX_CONNECTIONS", 8, cast=int)
+VESPA_FEED_MAX_QUEUE_SIZE = config("VESPA_FEED_MAX_QUEUE_SIZE", 64, cast=int)
 
 ANTHROPIC_API_KEY = config("ANTHROPIC_API_KEY", "")
 os.environ["ANTHROPIC_API_KEY"] = ANTHROPIC_API_KEY
 
+# connection pool limits for the (process-wide, reused) LLM api clients
+LLM_HTTP2 = config("LLM_HTTP2", True, cast=bool)
+LLM_HTTP_MAX_CONNECTIONS = config("LLM_HTTP_MAX_CONNECTIONS", 100, cast=int)
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = config(
+    "LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20, cast=int
+)
+LLM_HTTP_KEEPALIVE_EXPIRY_SEC = config("LLM_HTTP_KEEPALIVE_EXPIRY_SEC", 60, cast=float)
+
 WEB_WIDGET_LIB = config(
     "WEB_WIDGET_LIB",
     "https://cdn.jsdelivr.net/gh/GooeyAI/gooey-web-widget@2/dist/lib.js",
@@ -520,6 +572,15 @@ MAX_RPM_ANON = config("MAX_RPM_ANON", 3, cast=int)
 MAX_RPM_FREE = config("MAX_RPM_FREE", 6, cast=int)
 MAX_RPM_PAID = config("MAX_RPM_PAID", 10, cast=int)
 
+# number of sub-runs a bulk runner keeps in flight
+BULK_RUNNER_CONCURRENCY = config("BULK_RUNNER_CONCURRENCY", 4, cast=int)
+BULK_RUNNER_MAX_CONCURRENCY_PER_WORKSPACE = config(
+    "BULK_RUNNER_MAX_CONCURRENCY_PER_WORKSPACE", 8, cast=int
+)
+# how often partial bulk results are uploaded
+BULK_CHECKPOINT_INTERVAL_SEC = config("BULK_CHECKPOINT_INTERVAL_SEC", 30, cast=float)
+BULK_CHECKPOINT_INTERVAL_ROWS = config("BULK_CHECKPOINT_INTERVAL_ROWS", 500, cast=int)
+
 MAX_MESSAGES_PER_DAY_WARNING = config("MAX_MESSAGES_PER_DAY_WARN", 50, cast=int)
 MAX_MESSAGES_PER_DAY_BLOCK = config("MAX_MESSAGES_PER_DAY_BLOCK", 100, cast=int)
 
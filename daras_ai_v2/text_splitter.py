@@ -1,10 +1,10 @@
 import functools
-import operator
 import re
 import threading
 import typing
 from enum import Enum
 
+import numpy as np
 import tiktoken
 from collections import deque
 
@@ -39,8 +39,14 @@ default_separators = (
 
 threadlocal = threading.local()
 
+BATCH_ENCODE_MIN_CHARS = 100_000
+
 
 def default_length_function(text: str, model: str = "gpt-4") -> int:
+    return len(get_encoding(model).encode(text))
+
+
+def get_encoding(model: str = "gpt-4") -> tiktoken.Encoding:
     try:
         enc = threadlocal.enc
     except AttributeError:
@@ -49,7 +55,90 @@ def default_length_function(text: str, model: str = "gpt-4") -> int:
         except KeyError:
             enc = tiktoken.get_encoding("o200k_base")
         threadlocal.enc = enc
-    return len(enc.encode(text))
+    return enc
+
+
+def count_tokens_batch(docs: typing.Iterable["Document"], chunk_size: int):
+    """
+    Fast path for the default length function:
+    tokenize all the docs that haven't been counted yet in a single batch.
+
+    Docs that are too large for `chunk_size` also keep the offsets of their tokens,
+    so that their fragments can be counted without tokenizing them again.
+    """
+    docs = [
+        doc
+        for doc in docs
+        if doc._length is None and doc.length_function is default_length_function
+    ]
+    if not docs:
+        return
+    enc = get_encoding()
+    texts = [doc.text for doc in docs]
+    # spinning up the thread pool is only worth it for large inputs
+    if sum(map(len, texts)) >= BATCH_ENCODE_MIN_CHARS:
+        tokens_batch = enc.encode_batch(texts)
+    else:
+        tokens_batch = [enc.encode(text) for text in texts]
+    for doc, tokens in zip(docs, tokens_batch):
+        doc._length = len(tokens)
+        if doc._length > chunk_size:
+            doc.token_offsets = TokenOffsets.from_tokens(enc, doc.text, tokens)
+
+
+class TokenOffsets:
+    """
+    Character offsets at which each token of a text starts.
+
+    The number of tokens in a fragment of the text is the number of tokens that start inside it.
+    This is off by at most a token at each end when the fragment is tokenized by itself,
+    and the counts of adjacent fragments always add up to the count of the whole text.
+    """
+
+    def __init__(self, starts: np.ndarray, base: int = 0):
+        self.starts = starts
+        # offset of the fragment in the original text
+        self.base = base
+
+    @classmethod
+    def from_tokens(
+        cls, enc: tiktoken.Encoding, text: str, tokens: list[int]
+    ) -> typing.Optional["TokenOffsets"]:
+        byte_lens = _token_byte_lens(enc)[np.asarray(tokens, dtype=np.int64)]
+        byte_starts = np.cumsum(byte_lens) - byte_lens
+        if text.isascii():
+            return cls(byte_starts)
+        try:
+            codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        except UnicodeEncodeError:
+            # lone surrogates, let the fragments be tokenized instead
+            return None
+        utf8_lens = (
+            1 + (codepoints >= 0x80) + (codepoints >= 0x800) + (codepoints >= 0x10000)
+        )
+        # the character that each byte of the utf-8 encoded text belongs to
+        byte_to_char = np.repeat(np.arange(len(codepoints)), utf8_lens)
+        return cls(byte_to_char[np.minimum(byte_starts, len(byte_to_char) - 1)])
+
+    def count(self, start: int, end: int) -> int:
+        return int(
+            np.searchsorted(self.starts, self.base + end)
+            - np.searchsorted(self.starts, self.base + start)
+        )
+
+    def shift(self, start: int) -> "TokenOffsets":
+        return TokenOffsets(self.starts, self.base + start)
+
+
+@functools.lru_cache
+def _token_byte_lens(enc: tiktoken.Encoding) -> np.ndarray:
+    ret = np.zeros(enc.n_vocab, dtype=np.int64)
+    for token in range(enc.n_vocab):
+        try:
+            ret[token] = len(enc.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return ret
 
 
 L = typing.Callable[[str], int]
@@ -57,6 +146,7 @@ L = typing.Callable[[str], int]
 
 class Document:
     _length: int | None = None
+    token_offsets: TokenOffsets | None = None
 
     def __init__(
         self,
@@ -106,6 +196,7 @@ def text_splitter(
         docs = [docs]
     if isinstance(docs[0], str):
         docs = [Document(d, (idx, idx), length_function) for idx, d in enumerate(docs)]
+    count_tokens_batch(docs, chunk_size)
     splits = _split(docs, chunk_size, separators, fallback)
     docs = list(_join(splits, chunk_size, chunk_overlap))
     return docs
@@ -131,11 +222,18 @@ def _split(
         if len(doc) <= chunk_size:
             yield doc
             continue
-        for text in re_split(separators[0], doc.text):
+        frags = []
+        for text, start, end in re_split_spans(separators[0], doc.text):
             # skip empty fragments
             if not text.strip():
                 continue
             frag = Document(text, doc.span, doc.length_function)
+            if doc.token_offsets is not None:
+                frag._length = doc.token_offsets.count(start, end)
+                frag.token_offsets = doc.token_offsets.shift(start)
+            frags.append(frag)
+        count_tokens_batch(frags, chunk_size)
+        for frag in frags:
             # if the fragment is small enough, no need for further splitting
             if len(frag) <= chunk_size:
                 yield frag
@@ -145,14 +243,20 @@ def _split(
 
 def re_split(pat: re.Pattern, text: str):
     """Similar to re.split, but preserves the matched groups after splitting"""
+    for frag, _, _ in re_split_spans(pat, text):
+        yield frag
+
+
+def re_split_spans(pat: re.Pattern, text: str) -> typing.Iterator[tuple[str, int, int]]:
+    """Same as `re_split()`, along with the (start, end) of the text that each fragment was taken from"""
     last_match_end = 0
     for match in pat.finditer(text):
         end_char = "".join(match.groups())
         frag = text[last_match_end : match.start()] + end_char
         if frag:
-            yield frag
+            yield frag, last_match_end, match.end()
         last_match_end = match.end()
-    yield text[last_match_end:]
+    yield text[last_match_end:], last_match_end, len(text)
 
 
 def _join(
@@ -193,10 +297,14 @@ def _join(
         yield _merge(window)
 
 
-def _merge(docs: typing.Iterable[Document]) -> Document:
-    ret = functools.reduce(operator.add, docs)
-    return Document(
-        text=ret.text.strip(),  # remove whitespace after merge
-        span=ret.span,
-        length_function=ret.length_function,
+def _merge(docs: typing.Sequence[Document]) -> Document:
+    ret = Document(
+        text="".join(doc.text for doc in docs).strip(),  # remove whitespace after merge
+        span=(docs[0].start, docs[-1].end),
+        length_function=docs[0].length_function,
     )
+    if ret.length_function is default_length_function:
+        # token counts add up (give or take a merge at the boundaries),
+        # so there's no need to tokenize the merged text again
+        ret._length = sum(len(doc) for doc in docs)
+    return ret
@@ -6,11 +6,12 @@ import io
 import json
 import mimetypes
 import multiprocessing
+import os
 import re
 import tempfile
 import typing
 import unicodedata
-from functools import partial
+from contextlib import contextmanager
 from time import time
 
 import gooey_gui as gui
@@ -18,6 +19,7 @@ import numpy as np
 import requests
 from django.db import transaction
 from django.db.models import F, Q
+from django.template.defaultfilters import filesizeformat
 from django.utils import timezone
 from furl import furl
 from loguru import logger
@@ -45,12 +47,25 @@ from daras_ai_v2.azure_doc_extract import (
 from daras_ai_v2.doc_search_settings_widgets import (
     is_user_uploaded_url,
 )
-from daras_ai_v2.embedding_model import EmbeddingModels, create_embeddings_cached
+from daras_ai_v2.embedding_model import (
+    EmbeddingModels,
+    create_embeddings_batched,
+    create_embeddings_cached,
+)
 from daras_ai_v2.exceptions import UserError, call_cmd, raise_for_status
 from daras_ai_v2.functional import (
     apply_parallel,
-    flatmap_parallel_ascompleted,
+    apply_parallel_gen,
+    AdaptiveConcurrency,
+    flatten,
     map_parallel,
+    map_parallel_adaptive,
+)
+from daras_ai_v2.extraction_cache import (
+    extraction_cache_key,
+    get_cached_extraction,
+    get_extractor_name,
+    save_extraction,
 )
 from daras_ai_v2.gdrive_downloader import (
     gdrive_download,
@@ -78,6 +93,7 @@ from daras_ai_v2.search_ref import (
     remove_quotes,
 )
 from daras_ai_v2.text_splitter import Document, text_splitter
+from daras_ai_v2.vespa_feed import feed_vespa_docs
 from embeddings.models import EmbeddedFile, EmbeddingsReference
 from files.models import FileMetadata
 
@@ -186,7 +202,7 @@ def get_top_k_references(
     )
 
     if args_to_create:
-        embedded_files += yield from apply_parallel(
+        embedded_files += yield from apply_parallel_gen(
             lambda args: create_embedded_file(
                 *args,
                 max_context_words=request.max_context_words,
@@ -246,20 +262,25 @@ def get_top_k_references(
 
 def vespa_search_results_to_refs(
     search_result: dict,
-) -> typing.Iterable[SearchReference]:
-    for hit in search_result["root"].get("children", []):
-        try:
-            ref = EmbeddingsReference.objects.get(vespa_doc_id=hit["fields"]["id"])
-            ref_key = ref.url
-        except EmbeddingsReference.DoesNotExist:
+) -> typing.Iterable[tuple[str, SearchReference]]:
+    hits = search_result["root"].get("children", [])
+    # hydrate all hits in a single query, instead of one query per hit
+    refs_by_doc_id = EmbeddingsReference.objects.select_related(
+        "embedded_file__metadata"
+    ).in_bulk([hit["fields"]["id"] for hit in hits], field_name="vespa_doc_id")
+    # preserve vespa's relevance order
+    for hit in hits:
+        ref = refs_by_doc_id.get(hit["fields"]["id"])
+        if not ref:
             continue
+        url = ref.url
         if "text/html" in ref.embedded_file.metadata.mime_type:
             # logger.debug(f"Generating fragments {ref['url']} as it is a HTML file")
-            ref.url = generate_text_fragment_url(url=ref.url, text=ref.snippet)
+            url = generate_text_fragment_url(url=ref.url, text=ref.snippet)
         yield (
-            ref_key,
+            ref.url,
             SearchReference(
-                url=ref.url,
+                url=url,
                 title=ref.title,
                 snippet=ref.snippet,
                 score=hit["relevance"],
@@ -647,7 +668,7 @@ def create_embedded_file(
     is_user_url: bool,
     document_model: str | None,
     current_user: AppUser,
-) -> EmbeddedFile:
+) -> typing.Generator[str, None, EmbeddedFile]:
     """
     Return Vespa document ids and document tags
     for a given document url + metadata.
@@ -668,7 +689,7 @@ def create_embedded_file(
         file_id = _sha256(lookup | dict(metadata=file_meta.astuple()))
         refs = []
         for leaf_url, leaf_meta in leaf_url_metas:
-            refs += create_embeddings_in_search_db(
+            refs += yield from create_embeddings_in_search_db(
                 f_url=leaf_url,
                 file_meta=leaf_meta,
                 file_id=file_id,
@@ -713,40 +734,41 @@ def create_embeddings_in_search_db(
     embedding_model: EmbeddingModels,
     is_user_url: bool,
     document_model: str | None,
-) -> list[EmbeddingsReference]:
+) -> typing.Generator[str, None, list[EmbeddingsReference]]:
     refs = {}
-    vespa = get_vespa_app()
-    for ref, embedding in get_embeds_for_doc(
-        f_url=f_url,
-        file_meta=file_meta,
-        max_context_words=max_context_words,
-        scroll_jump=scroll_jump,
-        google_translate_target=google_translate_target,
-        selected_asr_model=selected_asr_model,
-        embedding_model=embedding_model,
-        is_user_url=is_user_url,
-        document_model=document_model,
-    ):
-        doc_id = file_id + "/" + _sha256(ref)
-        db_ref = EmbeddingsReference(
-            vespa_doc_id=doc_id,
-            url=ref["url"],
-            title=ref["title"],
-            snippet=ref["snippet"],
-        )
-        refs[db_ref.vespa_doc_id] = db_ref
-        vespa.feed_data_point(
-            schema=settings.VESPA_SCHEMA,
-            data_id=doc_id,
-            fields=format_embedding_row(
-                doc_id=doc_id,
-                created_at=db_ref.created_at,
-                file_id=file_id,
-                ref=ref,
-                embedding=embedding,
-            ),
-            operation_type="feed",
-        )
+
+    def docs_to_feed():
+        for ref, embedding in get_embeds_for_doc(
+            f_url=f_url,
+            file_meta=file_meta,
+            max_context_words=max_context_words,
+            scroll_jump=scroll_jump,
+            google_translate_target=google_translate_target,
+            selected_asr_model=selected_asr_model,
+            embedding_model=embedding_model,
+            is_user_url=is_user_url,
+            document_model=document_model,
+        ):
+            doc_id = file_id + "/" + _sha256(ref)
+            db_ref = EmbeddingsReference(
+                vespa_doc_id=doc_id,
+                url=ref["url"],
+                title=ref["title"],
+                snippet=ref["snippet"],
+            )
+            refs[db_ref.vespa_doc_id] = db_ref
+            yield dict(
+                id=doc_id,
+                fields=format_embedding_row(
+                    doc_id=doc_id,
+                    created_at=db_ref.created_at,
+                    file_id=file_id,
+                    ref=ref,
+                    embedding=embedding,
+                ),
+            )
+
+    yield from feed_vespa_docs(get_vespa_app(), docs_to_feed())
     return list(refs.values())
 
 
@@ -815,13 +837,9 @@ def get_embeds_for_doc(
     )
     translate_split_refs(refs, google_translate_target)
     texts = [m["title"] + " | " + m["snippet"] for m in refs]
-    # get doc embeds in batches
-    batch_size = 16  # azure openai limits
-    return flatmap_parallel_ascompleted(
-        partial(create_embeddings_cached, model=embedding_model),
-        [refs[i : i + batch_size] for i in range(0, len(refs), batch_size)],
-        [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)],
-        max_workers=2,
+    return (
+        (refs[i], embedding)
+        for i, embedding in create_embeddings_batched(texts, model=embedding_model)
     )
 
 
@@ -936,23 +954,72 @@ def doc_url_to_text_pages(
 ) -> typing.Union[list[str], "pd.DataFrame"]:
     """
     Download document from url and convert to text pages.
+    Extractions are cached, so that the document is not downloaded (if it has an etag)
+    or extracted again when only the chunking / embedding settings change.
     """
-    f_bytes, mime_type = download_content_bytes(
+    cache_key = None
+    if file_meta.etag:
+        # the exact mime type is only known after downloading
+        cache_key = extraction_cache_key(
+            f_url=f_url,
+            f_name=file_meta.name,
+            content_id="etag:" + file_meta.etag,
+            extractor=get_extractor_name(
+                None,
+                selected_asr_model=selected_asr_model,
+                document_model=document_model,
+            ),
+        )
+        cached = get_cached_extraction(cache_key)
+        if cached is not None:
+            return cached
+
+    with download_content_to_file(
         f_url=f_url,
         mime_type=file_meta.mime_type,
         is_user_url=is_user_url,
         export_links=file_meta.export_links,
-    )
-    if not f_bytes:
-        return []
-    return any_bytes_to_text_pages_or_df(
-        f_url=f_url,
-        f_name=file_meta.name,
-        f_bytes=f_bytes,
-        mime_type=mime_type,
-        selected_asr_model=selected_asr_model,
-        document_model=document_model,
-    )
+    ) as download:
+        if not download:
+            return []
+
+        extractor = get_extractor_name(
+            download.mime_type,
+            selected_asr_model=selected_asr_model,
+            document_model=document_model,
+        )
+        if not cache_key:
+            cache_key = extraction_cache_key(
+                f_url=f_url,
+                f_name=file_meta.name,
+                content_id="sha256:" + download.sha256,
+                extractor=extractor,
+            )
+            cached = get_cached_extraction(cache_key)
+            if cached is not None:
+                return cached
+
+        pages = any_file_to_text_pages_or_df(
+            f_url=f_url,
+            f_name=file_meta.name,
+            f_path=download.path,
+            mime_type=download.mime_type,
+            selected_asr_model=selected_asr_model,
+            document_model=document_model,
+        )
+    save_extraction(cache_key, f_url=f_url, extractor=extractor, pages=pages)
+    return pages
+
+
+class DownloadedFile(typing.NamedTuple):
+    path: str
+    mime_type: str
+    sha256: str
+    total_bytes: int
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
 
 
 def download_content_bytes(
@@ -962,58 +1029,155 @@ def download_content_bytes(
     is_user_url: bool = True,
     export_links: dict[str, str] | None = None,
 ) -> tuple[bytes, str]:
+    with download_content_to_file(
+        f_url=f_url,
+        mime_type=mime_type,
+        is_user_url=is_user_url,
+        export_links=export_links,
+    ) as download:
+        if not download:
+            return b"", ""
+        return download.read_bytes(), download.mime_type
+
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@contextmanager
+def download_content_to_file(
+    *,
+    f_url: str,
+    mime_type: str,
+    is_user_url: bool = True,
+    export_links: dict[str, str] | None = None,
+    max_bytes: int | None = None,
+) -> typing.Iterator[DownloadedFile | None]:
+    """
+    Download the document to a temporary file, that is deleted on exit.
+
+    Regular urls are streamed to disk in chunks and hashed on the fly,
+    so that large documents are never held in memory as a whole.
+    Yields None if the download failed.
+    """
     if export_links is None:
         export_links = {}
-    if is_yt_dlp_able_url(f_url):
-        return download_youtube_to_wav(f_url), "audio/wav"
-    f = furl(f_url)
-    if is_gdrive_url(f):
-        return gdrive_download(f, mime_type, export_links)
-    elif is_onedrive_url(f):
-        return onedrive_download(mime_type, export_links)
-    try:
-        # download from url
-        if is_user_uploaded_url(f_url):
-            kwargs = {}
-        elif f_url.startswith(gcs_v2.GCS_BUCKET_URL):
-            f_url = gcs_v2.private_to_signed_url(f_url)
-            kwargs = {}
+    if max_bytes is None:
+        max_bytes = settings.MAX_DOCUMENT_DOWNLOAD_BYTES
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "download")
+        f = furl(f_url)
+        if is_yt_dlp_able_url(f_url):
+            f_bytes, mime_type = download_youtube_to_wav(f_url), "audio/wav"
+        elif is_gdrive_url(f):
+            f_bytes, mime_type = gdrive_download(f, mime_type, export_links)
+        elif is_onedrive_url(f):
+            f_bytes, mime_type = onedrive_download(mime_type, export_links)
         else:
-            kwargs = requests_scraping_kwargs()
-        r = requests.get(f_url, **kwargs)
-        raise_for_status(r, is_user_url=is_user_url)
-    except requests.RequestException as e:
-        logger.warning(f"ignore error while downloading {f_url}: {e}")
-        return b"", ""
-    f_bytes = r.content
-    # if it's a known encoding, standardize to utf-8
-    encoding = r.headers.get("content-type", "").split("charset=")[-1].strip('"')
-    if encoding:
+            f_bytes = None
+
+        if f_bytes is not None:
+            # these apis only return the whole file
+            if len(f_bytes) > max_bytes:
+                raise _document_too_large(f_url, max_bytes)
+            with open(path, "wb") as out:
+                out.write(f_bytes)
+            yield DownloadedFile(
+                path=path,
+                mime_type=mime_type,
+                sha256=hashlib.sha256(f_bytes).hexdigest(),
+                total_bytes=len(f_bytes),
+            )
+            return
+
         try:
-            codec = codecs.lookup(encoding)
-        except LookupError:
-            pass
-        else:
+            # download from url
+            if is_user_uploaded_url(f_url):
+                kwargs = {}
+            elif f_url.startswith(gcs_v2.GCS_BUCKET_URL):
+                f_url = gcs_v2.private_to_signed_url(f_url)
+                kwargs = {}
+            else:
+                kwargs = requests_scraping_kwargs()
+            with requests.get(f_url, stream=True, **kwargs) as r:
+                raise_for_status(r, is_user_url=is_user_url)
+                content_length = r.headers.get("content-length")
+                if content_length and int(content_length) > max_bytes:
+                    raise _document_too_large(f_url, max_bytes)
+                hasher = hashlib.sha256()
+                total_bytes = 0
+                with open(path, "wb") as out:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        total_bytes += len(chunk)
+                        if total_bytes > max_bytes:
+                            raise _document_too_large(f_url, max_bytes)
+                        hasher.update(chunk)
+                        out.write(chunk)
+        except requests.RequestException as e:
+            logger.warning(f"ignore error while downloading {f_url}: {e}")
+            yield None
+            return
+        if not total_bytes:
+            yield None
+            return
+
+        # if it's a known encoding, standardize to utf-8
+        encoding = r.headers.get("content-type", "").split("charset=")[-1].strip('"')
+        if encoding:
             try:
-                f_bytes = codec.decode(f_bytes)[0].encode()
-            except UnicodeDecodeError:
+                codec = codecs.lookup(encoding)
+            except LookupError:
                 pass
-    mime_type = get_mimetype_from_response(r)
-    return f_bytes, mime_type
+            else:
+                _transcode_file_to_utf8(path, codec)
+
+        yield DownloadedFile(
+            path=path,
+            mime_type=get_mimetype_from_response(r),
+            sha256=hasher.hexdigest(),
+            total_bytes=total_bytes,
+        )
+
+
+def _transcode_file_to_utf8(path: str, codec: codecs.CodecInfo):
+    """Re-encode the file to utf-8 in place, or leave it untouched if it can't be decoded."""
+    if codec.name == "utf-8":
+        return
+    tmp_path = path + ".utf8"
+    decoder = codec.incrementaldecoder()
+    try:
+        with (
+            open(path, "rb") as src,
+            open(tmp_path, "w", encoding="utf-8", newline="") as dst,
+        ):
+            while chunk := src.read(DOWNLOAD_CHUNK_SIZE):
+                dst.write(decoder.decode(chunk))
+            dst.write(decoder.decode(b"", final=True))
+    except UnicodeDecodeError:
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, path)
+
+
+def _document_too_large(f_url: str, max_bytes: int) -> UserError:
+    return UserError(
+        f"Document is too large to download (max {filesizeformat(max_bytes)}): {f_url}"
+    )
 
 
-def any_bytes_to_text_pages_or_df(
+def any_file_to_text_pages_or_df(
     *,
     f_url: str,
     f_name: str,
-    f_bytes: bytes,
+    f_path: str,
     mime_type: str,
     selected_asr_model: str | None,
     document_model: str | None = None,
 ) -> typing.Union[list[str], "pd.DataFrame"]:
     if mime_type.startswith("audio/") or mime_type.startswith("video/"):
         if is_gdrive_url(furl(f_url)) or is_yt_dlp_able_url(f_url):
-            f_url = upload_file_from_bytes(f_name, f_bytes, content_type=mime_type)
+            with open(f_path, "rb") as f:
+                f_url = upload_file_from_bytes(f_name, f.read(), content_type=mime_type)
         transcript = run_asr(
             f_url,
             selected_model=(selected_asr_model or AsrModels.whisper_large_v2.name),
@@ -1021,10 +1185,10 @@ def any_bytes_to_text_pages_or_df(
         return [transcript]
 
     try:
-        return pdf_or_tabular_bytes_to_text_pages_or_df(
+        return pdf_or_tabular_file_to_text_pages_or_df(
             f_url=f_url,
             f_name=f_name,
-            f_bytes=f_bytes,
+            f_path=f_path,
             mime_type=mime_type,
             document_model=document_model,
         )
@@ -1033,15 +1197,17 @@ def any_bytes_to_text_pages_or_df(
 
     match mime_type:
         case "text/plain" | "text/markdown":
-            text = f_bytes.decode()
+            with open(f_path, encoding="utf-8", newline="") as f:
+                text = f.read()
         case "application/json":
             try:
-                text = json.dumps(json.loads(f_bytes.decode()), indent=2)
+                with open(f_path, "rb") as f:
+                    text = json.dumps(json.load(f), indent=2)
             except json.JSONDecodeError as e:
                 raise UserError(f"Invalid JSON file: {e}") from e
         case _:
             ext = mimetypes.guess_extension(mime_type) or ""
-            text = pandoc_to_text(f_name + ext, f_bytes)
+            text = pandoc_to_text(f_name + ext, f_path)
 
     return [text]
 
@@ -1063,11 +1229,11 @@ def is_yt_dlp_able_url(url: str) -> bool:
     )
 
 
-def pdf_or_tabular_bytes_to_text_pages_or_df(
+def pdf_or_tabular_file_to_text_pages_or_df(
     *,
     f_url: str,
     f_name: str,
-    f_bytes: bytes,
+    f_path: str,
     mime_type: str,
     document_model: str | None = None,
 ) -> typing.Union[list[str], "pd.DataFrame"]:
@@ -1075,22 +1241,19 @@ def pdf_or_tabular_bytes_to_text_pages_or_df(
 
     if mime_type == "application/pdf":
         if document_model:
-            df = pdf_to_doc_extract_df(
-                f_url, f_name, f_bytes, mime_type, document_model
-            )
+            df = pdf_to_doc_extract_df(f_url, f_name, f_path, mime_type, document_model)
         else:
-            return pdf_to_text_pages(f=io.BytesIO(f_bytes))
+            return pdf_file_to_text_pages(f_path)
 
     elif (
         mime_type
         == "application/vnd.openxmlformats-officedocument.presentationml.presentation"
     ):
-        return pptx_to_text_pages(f=io.BytesIO(f_bytes))
+        with open(f_path, "rb") as f:
+            return pptx_to_text_pages(f)
 
     else:
-        df = tabular_bytes_to_str_df(
-            f_name=f_name, f_bytes=f_bytes, mime_type=mime_type
-        )
+        df = tabular_file_to_str_df(f_name=f_name, f=f_path, mime_type=mime_type)
 
     if "sections" in df.columns or "snippet" in df.columns:
         return df
@@ -1105,9 +1268,18 @@ def tabular_bytes_to_str_df(
     f_bytes: bytes,
     mime_type: str,
 ) -> "pd.DataFrame":
-    df = tabular_bytes_to_any_df(
-        f_name=f_name, f_bytes=f_bytes, mime_type=mime_type, dtype=str
+    return tabular_file_to_str_df(
+        f_name=f_name, f=io.BytesIO(f_bytes), mime_type=mime_type
     )
+
+
+def tabular_file_to_str_df(
+    *,
+    f_name: str,
+    f: str | typing.BinaryIO,
+    mime_type: str,
+) -> "pd.DataFrame":
+    df = tabular_file_to_any_df(f_name=f_name, f=f, mime_type=mime_type, dtype=str)
     return df.fillna("")
 
 
@@ -1118,9 +1290,21 @@ def tabular_bytes_to_any_df(
     mime_type: str,
     dtype=None,
 ):
+    return tabular_file_to_any_df(
+        f_name=f_name, f=io.BytesIO(f_bytes), mime_type=mime_type, dtype=dtype
+    )
+
+
+def tabular_file_to_any_df(
+    *,
+    f_name: str,
+    f: str | typing.BinaryIO,
+    mime_type: str,
+    dtype=None,
+):
+    """`f` is a file path or a binary file object."""
     import pandas as pd
 
-    f = io.BytesIO(f_bytes)
     match mime_type:
         case "text/csv":
             df = pd.read_csv(f, dtype=dtype)
@@ -1130,6 +1314,10 @@ def tabular_bytes_to_any_df(
         #     df = pd.read_json(f, dtype=dtype)
         case "application/xml":
             df = pd.read_xml(f, dtype=dtype)
+        case "application/vnd.apache.parquet":
+            df = pd.read_parquet(f)
+            if dtype:
+                df = df.astype(dtype)
         case _ if "excel" in mime_type or "sheet" in mime_type:
             df = pd.read_excel(f, dtype=dtype)
         case _:
@@ -1149,17 +1337,62 @@ def pdf_to_text_pages(f: typing.BinaryIO) -> list[str]:
     return list(pdftotext.PDF(f))
 
 
+PDF_PAGES_PER_SHARD = 50
+
+
+def pdf_file_to_text_pages(f_path: str) -> list[str]:
+    """
+    Large pdfs are split into page ranges, which are extracted in parallel by pdftotext processes
+    (extraction is cpu-bound, so threads alone wouldn't help).
+    """
+    try:
+        num_pages = get_pdf_file_num_pages(f_path) or 0
+    except UserError:
+        num_pages = 0
+    if num_pages <= PDF_PAGES_PER_SHARD:
+        with open(f_path, "rb") as f:
+            return pdf_to_text_pages(f)
+    page_ranges = [
+        (first, min(first + PDF_PAGES_PER_SHARD - 1, num_pages))
+        for first in range(1, num_pages + 1, PDF_PAGES_PER_SHARD)
+    ]
+    return flatten(
+        map_parallel(
+            lambda page_range: pdftotext_page_range(f_path, *page_range),
+            page_ranges,
+            max_workers=min(len(page_ranges), os.cpu_count() or 1),
+        )
+    )
+
+
+def pdftotext_page_range(f_path: str, first: int, last: int) -> list[str]:
+    with tempfile.NamedTemporaryFile("r", encoding="utf-8", suffix=".txt") as outfile:
+        call_cmd(
+            "pdftotext",
+            "-f", str(first), "-l", str(last),
+            "-enc", "UTF-8",
+            f_path,
+            outfile.name,
+        )  # fmt: skip
+        text = outfile.read()
+    # pdftotext ends every page with a form feed
+    num_pages = last - first + 1
+    pages = text.split("\f")[:num_pages]
+    return pages + [""] * (num_pages - len(pages))
+
+
 def pdf_to_doc_extract_df(
     f_url: str,
     f_name: str,
-    f_bytes: bytes,
+    f_path: str,
     mime_type: str,
     model_id: str,
 ) -> "pd.DataFrame":
     import pandas as pd
 
     if is_gdrive_url(furl(f_url)):
-        f_url = upload_file_from_bytes(f_name, f_bytes, content_type=mime_type)
+        with open(f_path, "rb") as f:
+            f_url = upload_file_from_bytes(f_name, f.read(), content_type=mime_type)
 
     if model_id.startswith("mistral-"):
         model_id = "mistral-ocr-latest"
@@ -1169,32 +1402,50 @@ def pdf_to_doc_extract_df(
             model_id = model_id.removeprefix("azure-")
         extract_fn = run_azure_doc_extract_on_page
 
-    num_pages = get_pdf_num_pages(f_bytes)
+    num_pages = get_pdf_file_num_pages(f_path)
     return pd.DataFrame(
-        map_parallel(
-            lambda page_num: (
-                add_page_number_to_pdf(f_url, page_num).url,
-                f"{f_name}, page {page_num}",
-                extract_fn(f_url, page_num, model_id),
-            ),
-            range(1, num_pages + 1),
-            max_workers=4,
+        list(
+            map_parallel_adaptive(
+                lambda page_num: (
+                    add_page_number_to_pdf(f_url, page_num).url,
+                    f"{f_name}, page {page_num}",
+                    extract_fn(f_url, page_num, model_id),
+                ),
+                range(1, num_pages + 1),
+                concurrency=AdaptiveConcurrency(
+                    4, max_limit=settings.DOC_EXTRACT_MAX_CONCURRENCY
+                ),
+                is_throttled=is_throttled_http_error,
+            )
         ),
         columns=["url", "title", "sections"],
     )
 
 
+def is_throttled_http_error(e: Exception) -> bool:
+    return (
+        isinstance(e, requests.HTTPError)
+        and e.response is not None
+        and e.response.status_code in (429, 503)
+    )
+
+
 def get_pdf_num_pages(f_bytes: bytes) -> int:
     with tempfile.NamedTemporaryFile() as infile:
         infile.write(f_bytes)
-        output = call_cmd("pdfinfo", infile.name).lower()
-        for line in output.splitlines():
-            if not line.startswith("pages:"):
-                continue
-            try:
-                return int(line.split("pages:")[-1])
-            except ValueError:
-                raise ValueError(f"Unexpected PDF Info: {line}")
+        infile.flush()
+        return get_pdf_file_num_pages(infile.name)
+
+
+def get_pdf_file_num_pages(f_path: str) -> int:
+    output = call_cmd("pdfinfo", f_path).lower()
+    for line in output.splitlines():
+        if not line.startswith("pages:"):
+            continue
+        try:
+            return int(line.split("pages:")[-1])
+        except ValueError:
+            raise ValueError(f"Unexpected PDF Info: {line}")
 
 
 def add_page_number_to_pdf(url: str | furl, page_num: int) -> furl:
@@ -1211,13 +1462,13 @@ MAX_PANDOC_TIMEOUT_S = 120
 _pandoc_lock = multiprocessing.Semaphore(4)  # semaphore ensures max pandoc processes
 
 
-def pandoc_to_text(f_name: str, f_bytes: bytes, to="plain") -> str:
+def pandoc_to_text(f_name: str, f_path: str, to="plain") -> str:
     """
     Convert document to text using pandoc.
 
     Args:
-        f_name: filename of document
-        f_bytes: document bytes
+        f_name: filename of document (pandoc guesses the input format from its extension)
+        f_path: path to the document on disk
         to: pandoc output format (default: plain)
 
     Returns:
@@ -1225,16 +1476,17 @@ def pandoc_to_text(f_name: str, f_bytes: bytes, to="plain") -> str:
     """
     with (
         _pandoc_lock,
-        tempfile.NamedTemporaryFile("wb", suffix="." + safe_filename(f_name)) as infile,
+        tempfile.TemporaryDirectory() as tmpdir,
         tempfile.NamedTemporaryFile("r") as outfile,
     ):
-        infile.write(f_bytes)
+        infile = os.path.join(tmpdir, "infile." + safe_filename(f_name))
+        os.symlink(os.path.abspath(f_path), infile)
         call_cmd(
             "pandoc",
             # https://pandoc.org/MANUAL.html#a-note-on-security
             "+RTS", f"-M{MAX_PANDOC_MEM_MB}M", "-RTS", "--sandbox",
             "--standalone",
-            infile.name,
+            infile,
             "--wrap", "none",
             "--to", to,
             "--output",
@@ -0,0 +1,126 @@
+import queue
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep, time
+
+from loguru import logger
+
+from daras_ai_v2 import settings
+
+if typing.TYPE_CHECKING:
+    from vespa.application import Vespa
+    from vespa.io import VespaResponse
+
+
+def feed_vespa_docs(
+    vespa: "Vespa",
+    docs: typing.Iterable[dict],
+    *,
+    schema: str | None = None,
+    message: str = "Indexing",
+    max_retries: int = 3,
+    status_interval_sec: float = 2,
+) -> typing.Generator[str, None, int]:
+    """
+    Stream documents into vespa over a pool of keep-alive connections.
+
+    `docs` is consumed lazily (e.g. while embeddings are still being generated),
+    and at most `VESPA_FEED_MAX_QUEUE_SIZE` documents are buffered in memory,
+    so a slow vespa applies back-pressure to the producer.
+    Documents that fail are retried individually at the end.
+
+    Args:
+        vespa: the vespa application
+        docs: iterable of dicts with keys `id` and `fields`
+        schema: vespa schema to feed into
+        message: status message prefix
+        max_retries: number of times to retry each failed document
+        status_interval_sec: min interval between status messages
+
+    Returns:
+        number of documents fed
+    """
+    from daras_ai_v2.functional import get_initializer
+
+    schema = schema or settings.VESPA_SCHEMA
+    # docs that have been sent, but not yet acknowledged by vespa
+    pending = {}
+    # (doc_id, response) pairs, in the order vespa responds
+    results = queue.SimpleQueue()
+    # errors from `docs`, re-raised once feed_iterable() has returned
+    producer_errors = []
+    cancelled = threading.Event()
+
+    def track_pending():
+        # pyvespa only sends the end-of-stream sentinel to its consumer thread
+        # if the iterable ends normally, so never let an exception escape from here
+        try:
+            for doc in docs:
+                pending[doc["id"]] = doc
+                yield doc
+                if cancelled.is_set():
+                    return
+        except Exception as e:
+            producer_errors.append(e)
+
+    def callback(response: "VespaResponse", doc_id: str):
+        results.put((doc_id, response))
+
+    num_fed = 0
+    last_status_at = time()
+    with ThreadPoolExecutor(max_workers=1, initializer=get_initializer()) as pool:
+        fut = pool.submit(
+            vespa.feed_iterable,
+            track_pending(),
+            schema=schema,
+            callback=callback,
+            max_queue_size=settings.VESPA_FEED_MAX_QUEUE_SIZE,
+            max_workers=settings.VESPA_FEED_MAX_WORKERS,
+            max_connections=settings.VESPA_FEED_MAX_CONNECTIONS,
+        )
+        try:
+            while not (fut.done() and results.empty()):
+                try:
+                    doc_id, response = results.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if response.is_successful():
+                    pending.pop(doc_id, None)
+                    num_fed += 1
+                if time() - last_status_at > status_interval_sec:
+                    last_status_at = time()
+                    yield f"{message} ({num_fed} chunks)..."
+        finally:
+            # e.g. the caller closed this generator
+            cancelled.set()
+        fut.result()
+    if producer_errors:
+        raise producer_errors[0]
+
+    if pending:
+        yield f"{message}: Retrying {len(pending)} chunks..."
+    for doc_id, doc in pending.items():
+        _feed_doc_with_retries(vespa, doc, schema=schema, max_retries=max_retries)
+        num_fed += 1
+
+    return num_fed
+
+
+def _feed_doc_with_retries(vespa: "Vespa", doc: dict, *, schema: str, max_retries: int):
+    for i in range(max_retries + 1):
+        response = vespa.feed_data_point(
+            schema=schema, data_id=doc["id"], fields=doc["fields"]
+        )
+        if response.is_successful():
+            return
+        logger.warning(
+            f"vespa feed failed for {doc['id']!r} ({i + 1}/{max_retries + 1}): "
+            f"{response.status_code} {response.get_json()}"
+        )
+        if i < max_retries:
+            sleep(2**i)
+    raise RuntimeError(
+        f"Failed to index document {doc['id']!r} in vespa: "
+        f"{response.status_code} {response.get_json()}"
+    )
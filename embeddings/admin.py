@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from bots.admin_links import list_related_html_url
-from embeddings.models import EmbeddingsReference, EmbeddedFile
+from embeddings.models import EmbeddedFile, EmbeddingsReference, ExtractedDocument
 from gooeysite.admin import GooeyModelAdmin
 
 
@@ -62,3 +62,19 @@ class EmbeddingsReferenceAdmin(GooeyModelAdmin):
     readonly_fields = ["vespa_doc_id", "created_at", "updated_at"]
     autocomplete_fields = ["embedded_file"]
     ordering = ["-created_at"]
+
+
+@admin.register(ExtractedDocument)
+class ExtractedDocumentAdmin(GooeyModelAdmin):
+    list_display = [
+        "url",
+        "extractor",
+        "is_pages",
+        "total_bytes",
+        "created_at",
+        "last_accessed_at",
+    ]
+    search_fields = ["url", "cache_key"]
+    list_filter = ["extractor", "is_pages", "created_at", "last_accessed_at"]
+    readonly_fields = ["cache_key", "created_at"]
+    ordering = ["-last_accessed_at"]
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.3 on 2026-10-17 12:04
+
+import bots.custom_fields
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("embeddings", "0004_remove_embeddedfile_embeddings__url_750ab2_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExtractedDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "cache_key",
+                    models.CharField(
+                        help_text="A hash of the document url, its content (or etag) & the extractor settings",
+                        max_length=64,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "url",
+                    bots.custom_fields.CustomURLField(
+                        help_text="The URL of the original resource (e.g. a document)",
+                        max_length=2048,
+                    ),
+                ),
+                ("extractor", models.CharField(max_length=100)),
+                (
+                    "is_pages",
+                    models.BooleanField(
+                        help_text="Whether the result is a list of text pages (instead of a DataFrame)"
+                    ),
+                ),
+                ("total_bytes", models.PositiveBigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "last_accessed_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -99,3 +99,28 @@ class EmbeddingsReference(models.Model):
     @admin.display(description="Metadata")
     def metadata(self):
         return self.embedded_file.metadata
+
+
+class ExtractedDocument(models.Model):
+    """
+    A cached extraction result (text pages or DataFrame) of a document,
+    stored as parquet in GCS / local media. See `daras_ai_v2.extraction_cache`.
+    """
+
+    cache_key = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="A hash of the document url, its content (or etag) & the extractor settings",
+    )
+    url = CustomURLField(help_text="The URL of the original resource (e.g. a document)")
+    extractor = models.CharField(max_length=100)
+    is_pages = models.BooleanField(
+        help_text="Whether the result is a list of text pages (instead of a DataFrame)"
+    )
+    total_bytes = models.PositiveBigIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.url} ({self.extractor})"
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from daras_ai_v2 import settings
+from daras_ai_v2.extraction_cache import evict_extractions
+
+
+@shared_task
+def evict_extraction_cache():
+    evict_extractions(settings.EXTRACTION_CACHE_MAX_BYTES)
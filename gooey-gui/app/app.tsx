@@ -1,5 +1,5 @@
 import { withSentry } from "@sentry/remix";
-import { FormEvent, useEffect, useRef } from "react";
+import { FormEvent, useEffect, useMemo, useRef } from "react";
 
 import { cssBundleHref } from "@remix-run/css-bundle";
 import { json, LinksFunction, redirect } from "@remix-run/node";
@@ -23,6 +23,7 @@ import { useEventSourceNullOk } from "~/event-source";
 import { fetchServerAPI } from "~/fetchServerAPI";
 import { handleRedirectResponse } from "~/handleRedirect";
 import { applyFormDataTransforms, RenderedChildren } from "~/renderer";
+import { applyRenderPatch, RenderedPage } from "~/renderPatch";
 import "~/styles/app.css";
 import "~/styles/custom.css";
 import { GlobalContextProvider } from "./globalContext";
@@ -149,7 +150,28 @@ function App() {
   const [searchParams] = useSearchParams();
   const loaderData = useLoaderData<typeof loader>();
   const actionData = useActionData<typeof action>();
-  const { base64Body, children, state, channels } = actionData ?? loaderData;
+  const data = actionData ?? loaderData;
+  const { base64Body, channels } = data;
+  // the page that is currently shown
+  const lastPageRef = useRef<RenderedPage | null>(null);
+  // the state sent with the last submit, and the page it was sent from
+  const lastSubmitRef = useRef<{
+    state: Record<string, any>;
+    page: RenderedPage | null;
+  } | null>(null);
+  const page = useMemo(
+    () =>
+      applyRenderPatch({
+        data,
+        prev: lastSubmitRef.current?.page ?? null,
+        submittedState: lastSubmitRef.current?.state ?? null,
+      }),
+    [data]
+  );
+  const { children, state } = page;
+  useEffect(() => {
+    lastPageRef.current = page;
+  }, [page]);
   const formRef = useRef<HTMLFormElement>(null);
   const realtimeEvent = useRealtimeChannels({ channels });
   const lastRealtimeEventRef = useRef<string | null>(null);
@@ -230,6 +252,17 @@ function App() {
     encType: "application/json",
   };
 
+  const submitState = (body: {
+    state: Record<string, any>;
+    [key: string]: any;
+  }) => {
+    const page = lastPageRef.current;
+    lastSubmitRef.current = { state: body.state, page };
+    // lets the server send only what changed since the page we're showing
+    const prev_render_id = page?.renderId ?? null;
+    submit({ ...body, prev_render_id }, submitOptions);
+  };
+
   const onSubmit = (event?: FormEvent, extraData: Record<string, any> = {}) => {
     if (!formRef.current) return;
     let formData = Object.fromEntries(new FormData(formRef.current));
@@ -242,8 +275,7 @@ function App() {
       }
     }
     applyFormDataTransforms({ children, formData });
-    let body = { state: { ...state, ...formData }, ...extraData };
-    submit(body, submitOptions);
+    submitState({ state: { ...state, ...formData }, ...extraData });
   };
 
   let globalContext = {
@@ -251,13 +283,13 @@ function App() {
     session_state: state,
     update_session_state(newState: Record<string, any>) {
       Object.assign(state, newState);
-      submit({ state }, submitOptions);
+      submitState({ state });
     },
     set_session_state(newState: Record<string, any>) {
       for (let key in state) {
         state[key] = newState[key];
       }
-      submit({ state }, submitOptions);
+      submitState({ state });
     },
     rerun: onSubmit,
     fetchServerAPI,
@@ -0,0 +1,60 @@
+import type { TreeNode } from "~/renderer";
+
+// Unchanged subtrees of the previous render are sent as this node, with the path to the subtree
+export const refNodeName = "__ref__";
+
+export type RenderedPage = {
+  renderId: string | null;
+  children: Array<TreeNode>;
+  state: Record<string, any>;
+};
+
+// Build the full page from a render response, which may only contain the changes since `prev`.
+// `submittedState` is the state that was sent with the request that produced this response.
+export function applyRenderPatch({
+  data,
+  prev,
+  submittedState,
+}: {
+  data: Record<string, any>;
+  prev: RenderedPage | null;
+  submittedState: Record<string, any> | null;
+}): RenderedPage {
+  let state = data.state;
+  if (!state && data.state_patch) {
+    state = { ...(submittedState ?? prev?.state) };
+    for (const key of data.state_deleted ?? []) {
+      delete state[key];
+    }
+    Object.assign(state, data.state_patch);
+  }
+  let children = data.children;
+  if (children) {
+    children = resolveRefs(children, prev?.children ?? []);
+  }
+  return { renderId: data.render_id ?? null, children, state };
+}
+
+function resolveRefs(
+  nodes: Array<TreeNode>,
+  prevChildren: Array<TreeNode>
+): Array<TreeNode> {
+  return nodes.map((node) => {
+    if (node.name === refNodeName) {
+      return getNodeAtPath(prevChildren, node.props.path);
+    }
+    if (!node.children?.length) return node;
+    return { ...node, children: resolveRefs(node.children, prevChildren) };
+  });
+}
+
+function getNodeAtPath(children: Array<TreeNode>, path: Array<number>) {
+  let node = children[path[0]];
+  for (const i of path.slice(1)) {
+    node = node?.children[i];
+  }
+  if (!node) {
+    throw new Error(`render tree ref not found: ${path}`);
+  }
+  return node;
+}
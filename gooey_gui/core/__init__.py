@@ -9,9 +9,11 @@ from .exceptions import (
     stop,
 )
 from .pubsub import (
+    RealtimeDictPusher,
     realtime_push,
     realtime_pull,
     realtime_subscribe,
+    realtime_subscribe_async,
     get_subscriptions,
     realtime_clear_subs,
     md5_values,
@@ -0,0 +1,128 @@
+"""
+Incremental render responses.
+
+After every render, the hash of each subtree is saved in redis (keyed by a new `render_id`),
+along with its path in the tree. When the frontend sends back the `prev_render_id` of the tree it
+is showing, subtrees that are unchanged since then are sent as `__ref__` nodes that point to their
+path in the previous tree, and only the session state keys that the render changed are sent back.
+"""
+
+import hashlib
+import json
+import typing
+import uuid
+
+from loguru import logger
+
+from .pubsub import get_redis
+from .serializer import dumps
+
+if typing.TYPE_CHECKING:
+    from .renderer import RenderTreeNode
+
+REF_NODE_NAME = "__ref__"
+RENDER_TREE_EXPIRY = 15 * 60  # seconds
+
+TreePath = list[int]
+
+
+class TreeHashes(typing.NamedTuple):
+    # hash of each node, by id(node)
+    by_node: dict[int, str]
+    # path of the first node with each hash
+    paths: dict[str, TreePath]
+
+
+def hash_tree(children: list["RenderTreeNode"]) -> TreeHashes:
+    hashes = TreeHashes(by_node={}, paths={})
+    for i, node in enumerate(children):
+        _hash_node(node, [i], hashes)
+    return hashes
+
+
+def _hash_node(node: "RenderTreeNode", path: TreePath, hashes: TreeHashes) -> str:
+    h = hashlib.blake2b(digest_size=8)
+    h.update(node.name.encode())
+    h.update(dumps(node.props))
+    for i, child in enumerate(node.children):
+        h.update(_hash_node(child, path + [i], hashes).encode())
+    ret = h.hexdigest()
+    hashes.by_node[id(node)] = ret
+    hashes.paths.setdefault(ret, path)
+    return ret
+
+
+def save_tree_hashes(hashes: TreeHashes) -> str | None:
+    from redis.exceptions import RedisError
+
+    render_id = uuid.uuid4().hex
+    try:
+        get_redis().set(
+            _render_tree_key(render_id), dumps(hashes.paths), ex=RENDER_TREE_EXPIRY
+        )
+    except RedisError as e:
+        # the next render will just be sent in full
+        logger.warning(f"ignore error while saving render tree: {e!r}")
+        return None
+    return render_id
+
+
+def load_tree_paths(render_id: str) -> dict[str, TreePath] | None:
+    from redis.exceptions import RedisError
+
+    try:
+        value = get_redis().get(_render_tree_key(render_id))
+    except RedisError as e:
+        logger.warning(f"ignore error while loading render tree: {e!r}")
+        return None
+    if not value:
+        return None
+    return json.loads(value)
+
+
+def _render_tree_key(render_id: str) -> str:
+    return f"gooey-gui/render-tree/{render_id}"
+
+
+def diff_tree(
+    children: list["RenderTreeNode"],
+    hashes: TreeHashes,
+    prev_paths: dict[str, TreePath],
+) -> list["RenderTreeNode"]:
+    """
+    Replace the subtrees that exist in the previous tree with `__ref__` nodes.
+    Changed nodes are sent in full, but their unchanged children are still replaced.
+    """
+    from .renderer import RenderTreeNode
+
+    ret = []
+    for node in children:
+        path = prev_paths.get(hashes.by_node[id(node)])
+        if path is not None:
+            ret.append(RenderTreeNode(name=REF_NODE_NAME, props=dict(path=path)))
+        else:
+            ret.append(
+                RenderTreeNode(
+                    name=node.name,
+                    props=node.props,
+                    children=diff_tree(node.children, hashes, prev_paths),
+                )
+            )
+    return ret
+
+
+def hash_state(state: dict[str, typing.Any]) -> dict[str, str]:
+    return {
+        k: hashlib.blake2b(dumps(v), digest_size=8).hexdigest()
+        for k, v in state.items()
+    }
+
+
+def diff_state(
+    state: dict[str, typing.Any], prev_hashes: dict[str, str]
+) -> tuple[dict[str, typing.Any], list[str]]:
+    """Returns the keys that were added or changed since `prev_hashes`, and the deleted keys."""
+    new_hashes = hash_state(state)
+    patch = {k: state[k] for k, h in new_hashes.items() if prev_hashes.get(k) != h}
+    deleted = [k for k in prev_hashes if k not in new_hashes]
+    return patch, deleted
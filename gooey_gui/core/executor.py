@@ -0,0 +1,195 @@
+"""
+The shared worker pool behind `run_in_thread()`.
+
+Calls run on a bounded pool of threads instead of a new thread each,
+and are turned away (instead of blocking the caller) when the pool's queue is full.
+Calls submitted with `shared=True` (pure reads only) are deduplicated across sessions:
+identical calls (same function and json-serializable args) share one execution.
+Results are kept in a process-local cache in front of redis, for as long as they live in redis.
+"""
+
+import hashlib
+import inspect
+import json
+import threading
+import typing
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from time import monotonic
+
+from fastapi.encoders import jsonable_encoder
+from loguru import logger
+
+from .pubsub import realtime_push
+
+
+class RunInThreadExecutor:
+    def __init__(self, max_workers: int, max_queue: int, cache_size: int):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="run_in_thread"
+        )
+        # callers block when all workers are busy and the queue is full
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self._in_flight: set[str] = set()
+        # channel -> (expires_at, json encoded result)
+        self._results: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._queued = 0
+        self.submitted = 0
+        self.deduped = 0
+        self.rejected = 0
+        self.cache_hits = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+
+    def submit(
+        self,
+        fn: typing.Callable,
+        args: typing.Sequence,
+        kwargs: typing.Mapping,
+        ex: int,
+        shared: bool = False,
+    ) -> str | None:
+        """
+        Run `fn(*args, **kwargs)` in the pool, and return the channel its result is pushed to.
+        If `shared` is set, identical calls share one execution, and its result for `ex` seconds.
+        Returns None if all workers are busy and the queue is full.
+        """
+        dedup_key = get_dedup_key(fn, args, kwargs) if shared else None
+        if dedup_key is None:
+            channel = f"run_in_thread/{fn.__name__}/{uuid.uuid1()}"
+        else:
+            channel = f"run_in_thread/{fn.__name__}/{dedup_key}"
+        with self._lock:
+            if channel in self._in_flight or self._get_cached(channel) is not None:
+                self.deduped += 1
+                return channel
+            self._in_flight.add(channel)
+        # don't stall the caller (e.g. the web server's threadpool) when the pool is backed up
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._in_flight.discard(channel)
+                self.rejected += 1
+            logger.warning(f"run_in_thread is full: {self.stats()}")
+            return None
+        with self._lock:
+            self.submitted += 1
+            self._queued += 1
+            queued = self._queued
+        if queued > self.max_workers:
+            logger.warning(f"run_in_thread is backed up: {self.stats()}")
+        self._pool.submit(self._run, channel, fn, args, kwargs, ex, monotonic())
+        return channel
+
+    def get_result(self, channel: str) -> dict | None:
+        """The result pushed to `channel` by this process, if it's still cached."""
+        with self._lock:
+            encoded = self._get_cached(channel)
+            if encoded is None:
+                return None
+            self.cache_hits += 1
+        return json.loads(encoded)
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            started = self.completed + self.failed
+            return dict(
+                queue_depth=self._queued,
+                in_flight=len(self._in_flight),
+                submitted=self.submitted,
+                deduped=self.deduped,
+                rejected=self.rejected,
+                cache_hits=self.cache_hits,
+                completed=self.completed,
+                failed=self.failed,
+                avg_wait_time=started and self.total_wait_time / started,
+                avg_run_time=started and self.total_run_time / started,
+            )
+
+    def _run(
+        self,
+        channel: str,
+        fn: typing.Callable,
+        args: typing.Sequence,
+        kwargs: typing.Mapping,
+        ex: int,
+        submitted_at: float,
+    ):
+        started_at = monotonic()
+        with self._lock:
+            self._queued -= 1
+        ok = False
+        try:
+            # the same encoding as realtime_push(), so that cache hits look the same as redis
+            encoded = json.dumps(jsonable_encoder(dict(y=fn(*args, **kwargs))))
+            with self._lock:
+                self._results[channel] = (monotonic() + ex, encoded)
+                self._results.move_to_end(channel)
+                while len(self._results) > self.cache_size:
+                    self._results.popitem(last=False)
+            realtime_push(channel, json.loads(encoded), ex=ex)
+            ok = True
+        except Exception:
+            logger.exception(f"run_in_thread failed: {channel=}")
+        finally:
+            finished_at = monotonic()
+            with self._lock:
+                self._in_flight.discard(channel)
+                self.total_wait_time += started_at - submitted_at
+                self.total_run_time += finished_at - started_at
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            self._slots.release()
+        logger.debug(
+            f"run_in_thread {channel=} wait={started_at - submitted_at:.3f}s "
+            f"run={finished_at - started_at:.3f}s"
+        )
+
+    def _get_cached(self, channel: str) -> str | None:
+        try:
+            expires_at, encoded = self._results[channel]
+        except KeyError:
+            return None
+        if expires_at < monotonic():
+            del self._results[channel]
+            return None
+        self._results.move_to_end(channel)
+        return encoded
+
+
+def get_dedup_key(
+    fn: typing.Callable, args: typing.Sequence, kwargs: typing.Mapping
+) -> str | None:
+    """
+    Shared calls are deduplicated only if `fn` is a module level function and its arguments are
+    plain json values, so that identical calls from different sessions are sure to do the same thing.
+    Bound methods, lambdas & closures always run on their own.
+    """
+    if not inspect.isfunction(fn) or "<" in fn.__qualname__:
+        return None
+    try:
+        payload = json.dumps(
+            [fn.__module__, fn.__qualname__, list(args), dict(kwargs)], sort_keys=True
+        )
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@lru_cache
+def get_executor() -> RunInThreadExecutor:
+    from decouple import config
+
+    return RunInThreadExecutor(
+        max_workers=config("RUN_IN_THREAD_MAX_WORKERS", 32, cast=int),
+        max_queue=config("RUN_IN_THREAD_MAX_QUEUE", 1000, cast=int),
+        cache_size=config("RUN_IN_THREAD_CACHE_SIZE", 1024, cast=int),
+    )
@@ -1,7 +1,9 @@
+import asyncio
 import hashlib
 import json
 import typing
-from contextlib import contextmanager
+from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager
 from functools import lru_cache
 from time import time
 
@@ -9,6 +11,10 @@ from loguru import logger
 
 from .state import threadlocal
 
+if typing.TYPE_CHECKING:
+    import redis.asyncio
+    import redis.client
+
 T = typing.TypeVar("T")
 
 _extra_subscriptions = set()
@@ -63,6 +69,77 @@ def realtime_push(channel: str, value: typing.Any = "ping", ex=None):
         logger.info(f"publish {t} {channel=}")
 
 
+class RealtimeDictPusher:
+    """
+    Push a dict to a realtime channel, over and over again (e.g. on every step of a run),
+    while only re-encoding the keys that changed since the last push.
+
+    The channel still holds a full snapshot of the dict (for `realtime_pull()`),
+    but the pubsub message carries only the changed keys and the removed ones,
+    as `{"t": ..., "patch": {...}, "deleted": [...]}`.
+    """
+
+    def __init__(self, channel: str, ex=None):
+        self.channel = channel
+        self.ex = ex
+        # json fragments of the last pushed values
+        self._encoded: dict[str, str] = {}
+        # decoded copies of the last pushed values, used to detect changes
+        # (these never alias the caller's mutable objects)
+        self._values: dict[str, typing.Any] = {}
+
+    def push(self, value: dict[str, typing.Any]) -> dict[str, str]:
+        """Push the value, and return the json encoded keys that changed (not the removed ones)."""
+        from fastapi.encoders import jsonable_encoder
+
+        changed = {}
+        for k, v in value.items():
+            if _is_unchanged(self._values.get(k, _missing), v):
+                continue
+            encoded = json.dumps(jsonable_encoder(v))
+            self._encoded[k] = encoded
+            self._values[k] = json.loads(encoded)
+            changed[k] = encoded
+        deleted = list(self._encoded.keys() - value.keys())
+        for k in deleted:
+            del self._encoded[k]
+            del self._values[k]
+
+        channel = f"gooey-gui/state/{self.channel}"
+        t = json.dumps(time())
+        r = get_redis()
+        pipe = r.pipeline(transaction=False)
+        pipe.set(channel, _join_json_fragments(self._encoded), ex=self.ex)
+        pipe.publish(
+            channel,
+            '{"t":%s,"patch":%s,"deleted":%s}'
+            % (t, _join_json_fragments(changed), json.dumps(deleted)),
+        )
+        pipe.execute()
+        run_status = value.get("__run_status")
+        logger.info(
+            f"publish {t} {channel=} {run_status=} changed={list(changed)} {deleted=}"
+        )
+        return changed
+
+
+_missing = object()
+
+
+def _is_unchanged(prev, value) -> bool:
+    if type(prev) is not type(value):
+        return False
+    try:
+        return bool(prev == value)
+    except (TypeError, ValueError):
+        # e.g. numpy arrays
+        return False
+
+
+def _join_json_fragments(fragments: dict[str, str]) -> str:
+    return "{" + ",".join(f"{json.dumps(k)}:{v}" for k, v in fragments.items()) + "}"
+
+
 @contextmanager
 def realtime_subscribe(channel: str) -> typing.Generator:
     channel = f"gooey-gui/state/{channel}"
@@ -79,12 +156,83 @@ def realtime_subscribe(channel: str) -> typing.Generator:
 
 
 def _realtime_sub_gen(channel: str, pubsub: "redis.client.PubSub") -> typing.Generator:
+    r = get_redis()
+    # in case the value was pushed before we subscribed
+    value = r.get(channel)
+    if value:
+        value = json.loads(value)
+        yield value
     while True:
         message = pubsub.get_message(timeout=10)
         if not (message and message["type"] == "message"):
             continue
-        r = get_redis()
-        value = json.loads(r.get(channel))
+        if not _apply_patch(value, message["data"]):
+            value = json.loads(r.get(channel))
+        if isinstance(value, dict):
+            run_status = value.get("__run_status")
+            logger.info(f"realtime_subscribe: {channel=} {run_status=}")
+        else:
+            logger.info(f"realtime_subscribe: {channel=}")
+        yield value
+
+
+def _apply_patch(value: typing.Any, data: bytes) -> bool:
+    """
+    Apply the changed keys from a `RealtimeDictPusher` message to the last seen value,
+    instead of fetching the full snapshot again. Returns False if the snapshot must be fetched.
+    """
+    if not isinstance(value, dict):
+        return False
+    msg = json.loads(data)
+    if not (isinstance(msg, dict) and "patch" in msg):
+        return False
+    value.update(msg["patch"])
+    for k in msg.get("deleted", []):
+        value.pop(k, None)
+    return True
+
+
+@asynccontextmanager
+async def realtime_subscribe_async(
+    channel: str, timeout: float = 10
+) -> typing.AsyncGenerator[typing.AsyncGenerator, None]:
+    """
+    Like `realtime_subscribe()`, but waits on the event loop instead of a thread.
+
+    All subscribers in a process share a single redis connection,
+    so thousands of them can wait at once.
+
+    The generator first yields the current value (if any), so that a push that happened
+    just before subscribing is not missed. After that, it yields the value on every push,
+    or None if nothing was pushed for `timeout` seconds.
+    """
+    channel = f"gooey-gui/state/{channel}"
+    mux = _get_async_pubsub_mux(asyncio.get_running_loop())
+    q = await mux.subscribe(channel)
+    logger.info(f"subscribe {channel=}")
+    try:
+        yield _realtime_sub_gen_async(channel, q, timeout)
+    finally:
+        logger.info(f"unsubscribe {channel=}")
+        await mux.unsubscribe(channel, q)
+
+
+async def _realtime_sub_gen_async(
+    channel: str, q: asyncio.Queue, timeout: float
+) -> typing.AsyncGenerator:
+    r = _get_async_redis(asyncio.get_running_loop())
+    value = await r.get(channel)
+    if value:
+        value = json.loads(value)
+        yield value
+    while True:
+        try:
+            data = await asyncio.wait_for(q.get(), timeout)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        if not _apply_patch(value, data):
+            value = json.loads(await r.get(channel))
         if isinstance(value, dict):
             run_status = value.get("__run_status")
             logger.info(f"realtime_subscribe: {channel=} {run_status=}")
@@ -93,6 +241,64 @@ def _realtime_sub_gen(channel: str, pubsub: "redis.client.PubSub") -> typing.Gen
         yield value
 
 
+@lru_cache
+def _get_async_redis(loop: asyncio.AbstractEventLoop) -> "redis.asyncio.Redis":
+    # async connections are bound to the event loop they were created in
+    import redis.asyncio
+    from decouple import config
+
+    return redis.asyncio.Redis.from_url(config("REDIS_URL", "redis://localhost:6379"))
+
+
+@lru_cache
+def _get_async_pubsub_mux(loop: asyncio.AbstractEventLoop) -> "_AsyncPubSubMux":
+    return _AsyncPubSubMux(_get_async_redis(loop))
+
+
+class _AsyncPubSubMux:
+    """Fan out messages from one pubsub connection to per-subscriber queues."""
+
+    def __init__(self, r: "redis.asyncio.Redis"):
+        self.pubsub = r.pubsub(ignore_subscribe_messages=True)
+        self.queues: dict[str, set[asyncio.Queue]] = defaultdict(set)
+        self.lock = asyncio.Lock()
+        self.reader: asyncio.Task | None = None
+
+    async def subscribe(self, channel: str) -> asyncio.Queue:
+        q = asyncio.Queue()
+        async with self.lock:
+            if not self.queues[channel]:
+                await self.pubsub.subscribe(channel)
+            self.queues[channel].add(q)
+            if not self.reader or self.reader.done():
+                self.reader = asyncio.create_task(self._read_forever())
+        return q
+
+    async def unsubscribe(self, channel: str, q: asyncio.Queue):
+        async with self.lock:
+            self.queues[channel].discard(q)
+            if not self.queues[channel]:
+                del self.queues[channel]
+                await self.pubsub.unsubscribe(channel)
+
+    async def _read_forever(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=10
+                )
+            except Exception as e:
+                # the connection re-subscribes to all channels when it reconnects
+                logger.warning(f"realtime_subscribe_async: {e!r}")
+                await asyncio.sleep(1)
+                continue
+            if not (message and message["type"] == "message"):
+                continue
+            channel = message["channel"].decode()
+            for q in self.queues.get(channel, ()):
+                q.put_nowait(message["data"])
+
+
 def md5_values(*values) -> str:
     strval = ".".join(map(repr, values))
     return hashlib.md5(strval.encode()).hexdigest()
@@ -3,15 +3,23 @@ import typing
 from functools import partial, wraps
 
 from fastapi import Depends
-from fastapi.encoders import jsonable_encoder
 from starlette.requests import Request
-from starlette.responses import JSONResponse, RedirectResponse, Response
-
+from starlette.responses import RedirectResponse, Response
+
+from .diff import (
+    diff_state,
+    diff_tree,
+    hash_state,
+    hash_tree,
+    load_tree_paths,
+    save_tree_hashes,
+)
 from .exceptions import RedirectException, RerunException, StopException
 from .pubsub import (
     get_subscriptions,
     realtime_clear_subs,
 )
+from .serializer import RenderResponse
 
 from .state import get_session_state, set_session_state, set_query_params, threadlocal
 
@@ -28,6 +36,8 @@ def add_styles(className: str, css: str):
 
 
 class RenderTreeNode:
+    __slots__ = ("name", "props", "children")
+
     def __init__(
         self,
         name: str,
@@ -49,6 +59,10 @@ class RenderTreeNode:
             children=[child.to_dict() for child in self.children],
         )
 
+    def __json__(self) -> dict:
+        # the children are left as nodes, for the serializer to encode in the same pass
+        return dict(name=self.name, props=self.props, children=self.children)
+
 
 class NestingCtx:
     def __init__(self, node: RenderTreeNode | None = None):
@@ -88,6 +102,9 @@ def route(app, *paths, **kwargs):
                 partial(fn, **kwargs),
                 query_params=dict(request.query_params),
                 state=json_data and json_data.get("state"),
+                # sent by frontends that can apply incremental responses
+                incremental=bool(json_data) and "prev_render_id" in json_data,
+                prev_render_id=json_data and json_data.get("prev_render_id"),
             )
 
         fn_sig = inspect.signature(fn)
@@ -120,8 +137,18 @@ def renderer(
     render: typing.Callable,
     state: dict[str, typing.Any] = None,
     query_params: dict[str, str] = None,
+    incremental: bool = False,
+    prev_render_id: str | None = None,
 ) -> dict | Response:
+    """
+    Render the page, and return the tree, session state and realtime channels.
+
+    If `incremental` is set, only the session state keys changed by the render are returned,
+    and if `prev_render_id` is also given, unchanged subtrees of that render are sent as refs.
+    """
     set_session_state(state or {})
+    # the frontend already has the state that it sent us
+    state_hashes = hash_state(get_session_state()) if incremental else None
     set_query_params(query_params or {})
     realtime_clear_subs()
     threadlocal.use_state_count = 0
@@ -147,16 +174,36 @@ def renderer(
                     }
             if isinstance(ret, Response):
                 return ret
-            return JSONResponse(
-                jsonable_encoder(
-                    dict(
-                        children=root.to_dict()["children"],
-                        state=get_session_state(),
-                        channels=get_subscriptions(),
-                        **(ret or {}),
-                    )
-                ),
+            return RenderResponse(
+                _render_content(
+                    root.children,
+                    state_hashes=state_hashes,
+                    prev_render_id=prev_render_id,
+                )
+                | (ret or {}),
                 headers={"X-GOOEY-GUI-ROUTE": "1"},
             )
         except RerunException:
             continue
+
+
+def _render_content(
+    children: list[RenderTreeNode],
+    *,
+    state_hashes: dict[str, str] | None,
+    prev_render_id: str | None,
+) -> dict[str, typing.Any]:
+    tree_hashes = hash_tree(children)
+    render_id = save_tree_hashes(tree_hashes)
+    prev_paths = prev_render_id and load_tree_paths(prev_render_id)
+    if prev_paths:
+        children = diff_tree(children, tree_hashes, prev_paths)
+    ret = dict(children=children, render_id=render_id)
+    if state_hashes is None:
+        ret["state"] = get_session_state()
+    else:
+        ret["state_patch"], ret["state_deleted"] = diff_state(
+            get_session_state(), state_hashes
+        )
+    ret["channels"] = get_subscriptions()
+    return ret
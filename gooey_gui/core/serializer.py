@@ -0,0 +1,69 @@
+"""
+Serialize render responses to JSON bytes in a single pass.
+
+The render tree and the session state are handed to the stdlib's C encoder as-is,
+and only the values it can't encode natively go through `_default()`.
+This matches the output of `fastapi.encoders.jsonable_encoder` + `JSONResponse`
+(including raising on NaN), without first walking the whole tree in python to build a copy of it.
+"""
+
+import dataclasses
+import datetime
+import decimal
+import enum
+import json
+import typing
+import uuid
+from pathlib import PurePath
+from types import GeneratorType
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def dumps(obj: typing.Any) -> bytes:
+    return json.dumps(
+        obj,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+class RenderResponse(JSONResponse):
+    def render(self, content: typing.Any) -> bytes:
+        return dumps(content)
+
+
+def _default(obj: typing.Any) -> typing.Any:
+    # e.g. RenderTreeNode, whose children are encoded by the same pass
+    to_json = getattr(obj, "__json__", None)
+    if to_json is not None:
+        return to_json()
+    if isinstance(obj, BaseModel):
+        # aliases, custom encoders etc. are handled exactly like before
+        return jsonable_encoder(obj)
+    if isinstance(obj, (set, frozenset, tuple, GeneratorType)):
+        return list(obj)
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, decimal.Decimal):
+        if obj.as_tuple().exponent >= 0:
+            return int(obj)
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (uuid.UUID, PurePath)):
+        return str(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    # numpy scalars & arrays
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return jsonable_encoder(obj)
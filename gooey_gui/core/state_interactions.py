@@ -1,10 +1,10 @@
 import hashlib
-import threading
 import typing
 import uuid
 from functools import wraps
 
 import gooey_gui.components as gui
+from .executor import get_executor
 from .pubsub import realtime_pull, realtime_push
 from .state import threadlocal, get_session_state
 
@@ -46,17 +46,23 @@ def run_in_thread(
     cache: bool = False,
     key: str | None = None,
     ex=60,
+    shared: bool = False,
 ):
     """
-    Creates a new thread to run `fn(*args, **kwargs)`.
+    Runs `fn(*args, **kwargs)` on a shared pool of worker threads.
 
     Returns:
     - `None` until the function call is executing.
     - The returned value of `fn(*args, **kwargs)` on the next call.
+    - `None` if the worker pool is backed up, in which case the call is retried on the next render.
       If `cache=True`, the same value will be cached in the `session_state`.
       Further calls to `run_in_thread(fn, ...)` will return the same value
       until the `session_state` is reset (e.g. with a page refresh).
 
+    If `shared=True`, identical calls from all sessions share one execution, and its result
+    for `ex` seconds (only if `fn` is a module level function and the args are plain json values).
+    Only use this for pure reads, never for calls with side effects.
+
     Note that `fn.__name__` is used in the cache key. Because of this,
     it won't work with `lambda`s and closures that don't have a fixed
     value for `__name__`.
@@ -66,29 +72,23 @@ def run_in_thread(
         key = f"{run_in_thread.__name__}/{fn}"
 
     session_state = get_session_state()
+    executor = get_executor()
     try:
         channel = session_state[key]
     except KeyError:
-        channel = session_state[key] = (
-            f"{run_in_thread.__name__}/{fn.__name__}/{uuid.uuid1()}"
-        )
-
-        if args is None:
-            args = []
-        if kwargs is None:
-            kwargs = {}
-
-        def target():
-            realtime_push(channel, dict(y=fn(*args, **kwargs)), ex=ex)
-
-        threading.Thread(target=target).start()
+        channel = executor.submit(fn, args or [], kwargs or {}, ex=ex, shared=shared)
+        if channel is None:
+            if placeholder:
+                gui.write(placeholder)
+            return None
+        session_state[key] = channel
 
     try:
         return session_state[channel]
     except KeyError:
         pass
 
-    result = realtime_pull([channel])[0]
+    result = executor.get_result(channel) or realtime_pull([channel])[0]
     if result and "y" in result:
         ret = result["y"]
         if cache:
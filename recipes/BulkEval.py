@@ -11,8 +11,8 @@ from pydantic import BaseModel, Field
 
 from ai_models.models import AIModelSpec
 from bots.models import Workflow
-from daras_ai.image_input import upload_file_from_bytes
 from daras_ai_v2.base import BasePage
+from daras_ai_v2.bulk_results import CheckpointTimer, upload_df
 from daras_ai_v2.doc_search_settings_widgets import (
     bulk_documents_uploader,
     SUPPORTED_SPREADSHEET_TYPES,
@@ -747,10 +747,11 @@ def iterate(
     request: BulkEvalPage.RequestModel,
     response: BulkEvalPage.ResponseModel,
 ):
-    import pandas as pd
-
     yield f"Running Evals (1/{len(futs)})..."
 
+    timer = CheckpointTimer()
+    # the latest result for each document that hasn't been uploaded yet
+    pending: dict[int, TaskResult] = {}
     for i, fut in enumerate(as_completed(futs)):
         if i + 1 < len(futs):
             yield f"Running Evals ({i + 2}/{len(futs)})..."
@@ -770,13 +771,26 @@ def iterate(
                 evaluation_result=result.evaluation_result,
             )
 
+        # re-uploading the whole sheet for every row is quadratic, so only upload once in a while
+        pending[result.doc_ix] = result
+        if timer.tick():
+            upload_results(pending, request, response, filename=f"evaluator-{i + 1}")
+
+    upload_results(pending, request, response, filename="evaluator")
+
+
+def upload_results(
+    pending: dict[int, TaskResult],
+    request: BulkEvalPage.RequestModel,
+    response: BulkEvalPage.ResponseModel,
+    *,
+    filename: str,
+):
+    import pandas as pd
+
+    for doc_ix, result in pending.items():
         out_df = pd.DataFrame.from_records(result.out_df_recs)
-        f = upload_file_from_bytes(
-            filename=f"evaluator-{i + 1}.csv",
-            data=out_df.to_csv(index=False).encode(),
-            content_type="text/csv",
-        )
-        response.output_documents[result.doc_ix] = f
+        response.output_documents[doc_ix] = upload_df(out_df, filename)
 
         aggs = []
         prefix = result.ep["name"] + " - "
@@ -807,7 +821,8 @@ def iterate(
                         "eval_prompt_name": result.ep["name"],
                     }
                 )
-        response.aggregations[result.doc_ix] = aggs
+        response.aggregations[doc_ix] = aggs
+    pending.clear()
 
 
 def apply_eval_metrics(
@@ -1,23 +1,33 @@
 import typing
 import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from time import sleep
 
 import gooey_gui as gui
 from furl import furl
+from loguru import logger
 from pydantic import BaseModel, Field
 
-from bots.models import Workflow, SavedRun
+from bots.models import PublishedRun, Workflow, SavedRun
 from daras_ai.image_input import upload_file_from_bytes
-from daras_ai_v2 import icons
+from daras_ai_v2 import icons, settings
 from daras_ai_v2 import breadcrumbs
 from daras_ai_v2.base import BasePage, StateKeys
 from daras_ai_v2.breadcrumbs import get_title_breadcrumbs
+from daras_ai_v2.bulk_results import (
+    CheckpointTimer,
+    OutputFormat,
+    SpooledResults,
+    upload_df,
+)
 from daras_ai_v2.doc_search_settings_widgets import (
     bulk_documents_uploader,
     SUPPORTED_SPREADSHEET_TYPES,
 )
 from daras_ai_v2.field_render import field_desc, field_title
-from daras_ai_v2.functional import map_parallel
+from daras_ai_v2.functional import get_initializer, map_parallel
 from daras_ai_v2.pydantic_validation import HttpUrlStr
+from daras_ai_v2.ratelimits import SlidingWindow, bulk_runs_window
 from daras_ai_v2.vector_search import (
     download_content_bytes,
     doc_url_to_file_metadata,
@@ -32,6 +42,7 @@ from daras_ai_v2.workflow_url_input import (
     get_published_run_options,
     edit_done_button,
 )
+from gooeysite.bg_db_conn import db_middleware
 from recipes.DocSearch import render_documents
 from widgets.bulk_progress_display import render_bulk_runner_progress
 from widgets.bulk_progress_state import (
@@ -41,6 +52,7 @@ from widgets.bulk_progress_state import (
 )
 
 if typing.TYPE_CHECKING:
+    import celery.result
     import pandas as pd
 
 
@@ -91,6 +103,14 @@ _(optional)_ Add one or more Gooey.AI Evaluator Workflows to evaluate the result
             """,
         )
 
+        output_format: OutputFormat = Field(
+            "csv",
+            title="Output Format",
+            description="""
+Format of the output documents. Parquet is faster to load for large sheets, but can't be previewed in the browser.
+            """,
+        )
+
     class ResponseModel(BaseModel):
         output_documents: list[HttpUrlStr]
         bulk_progress: BulkProgress | None = None
@@ -312,8 +332,6 @@ To understand what each field represents, check out our [API docs](https://api.g
         request: "BulkRunnerPage.RequestModel",
         response: "BulkRunnerPage.ResponseModel",
     ) -> typing.Iterator[str | None]:
-        import pandas as pd
-
         response.output_documents = []
         array_columns = set()
         dfs = [read_df_any(doc) for doc in request.documents]
@@ -325,10 +343,42 @@ To understand what each field represents, check out our [API docs](https://api.g
             total_workflows=len(request.run_urls),
         )
 
+        max_in_flight = max(1, settings.BULK_RUNNER_CONCURRENCY)
+        workspace_cap = max(1, settings.BULK_RUNNER_MAX_CONCURRENCY_PER_WORKSPACE)
+        workspace_runs = bulk_runs_window(self.current_workspace)
+
+        # results that were already checkpointed by a previous attempt of this run
+        # (e.g. if the worker was restarted), so they don't have to run again
+        run_id = self.current_sr.run_id
+        checkpoint = gui.session_state.get(BULK_CHECKPOINT_KEY) or {}
+        if checkpoint.get("run_id") != run_id:
+            checkpoint = dict(run_id=run_id, spools={}, array_columns=[])
+        gui.session_state[BULK_CHECKPOINT_KEY] = checkpoint
+        array_columns.update(checkpoint["array_columns"])
+
         row_offset = 0
         for doc_ix, df in enumerate(dfs):
             in_recs = df.to_dict(orient="records")
-            out_recs = []
+            # output records of row groups that are still running, so that sub-runs can complete in any order
+            group_recs: dict[int, list[dict]] = {}
+            # number of workflows still running for each row group
+            group_pending: dict[int, int] = {}
+
+            spool_url = checkpoint["spools"].get(str(doc_ix))
+            if spool_url:
+                spool = SpooledResults.from_url(spool_url)
+            else:
+                spool = SpooledResults()
+            timer = CheckpointTimer()
+
+            def save_checkpoint():
+                response.output_documents[doc_ix] = upload_df(
+                    spool.to_df(), f"bulk-runner-{doc_ix}-partial"
+                )
+                checkpoint["spools"][str(doc_ix)] = spool.upload_checkpoint(
+                    f"bulk-runner-{doc_ix}-checkpoint.jsonl"
+                )
+                checkpoint["array_columns"] = sorted(array_columns)
 
             f = upload_file_from_bytes(
                 filename=f"bulk-runner-{doc_ix}-0-0.csv",
@@ -337,91 +387,143 @@ To understand what each field represents, check out our [API docs](https://api.g
             )
             response.output_documents.append(f)
 
-            for df_ix, arr_len in slice_request_df(df, request):
-                rec_ix = len(out_recs)
-                out_recs.extend(in_recs[df_ix : df_ix + arr_len])
-
-                used_workflow_labels = set()
-                for url_ix, request_body, page_cls, sr, pr in build_requests_for_df(
-                    df, request, df_ix, arr_len, array_columns
+            def iter_sub_runs():
+                for group_ix, (df_ix, arr_len) in enumerate(
+                    slice_request_df(df, request)
                 ):
-                    result, sr = sr.submit_api_call(
-                        workspace=self.current_workspace,
-                        current_user=self.request.user,
-                        request_body=request_body,
-                        parent_pr=pr,
-                        surface=SavedRun.Surface.bulk,
-                    )
-                    yield progress.workflow_started(
-                        response,
-                        current_row_number=row_offset + df_ix + 1,
-                        workflow_number=url_ix + 1,
-                        page_cls=page_cls,
-                        sr=sr,
-                        pr=pr,
-                        request_body=request_body,
-                    )
-                    sr.wait_for_celery_result(result)
+                    if group_ix in spool:
+                        progress.row_group_skipped(arr_len)
+                        continue
+                    group_recs[group_ix] = in_recs[df_ix : df_ix + arr_len]
+                    group_pending[group_ix] = len(request.run_urls)
+
+                    used_workflow_labels = set()
+                    for url_ix, request_body, page_cls, sr, pr in build_requests_for_df(
+                        df, request, df_ix, arr_len, array_columns
+                    ):
+                        workflow_label = _make_unique_workflow_label(
+                            (pr and pr.title) or str(url_ix + 1),
+                            used_workflow_labels,
+                        )
+                        yield _SubRun(
+                            group_ix=group_ix,
+                            df_ix=df_ix,
+                            arr_len=arr_len,
+                            url_ix=url_ix,
+                            request_body=request_body,
+                            page_cls=page_cls,
+                            sr=sr,
+                            pr=pr,
+                            workflow_label=workflow_label,
+                        )
+
+            def on_completed(sub: _SubRun, sr: SavedRun):
+                state = sr.to_dict()
+                state["run_url"] = sr.get_app_url()
+                state["price"] = sr.price
+                state["run_time"] = round(sr.run_time.total_seconds(), 2)
+                state["error_msg"] = sr.error_msg
+
+                _write_output_columns(
+                    group_recs[sub.group_ix],
+                    state,
+                    request.output_columns,
+                    sub.workflow_label,
+                    array_columns,
+                )
+                group_pending[sub.group_ix] -= 1
+                row_group_completed = not group_pending[sub.group_ix]
+                if row_group_completed:
+                    recs = group_recs.pop(sub.group_ix)
+                    del group_pending[sub.group_ix]
+                    spool.append(sub.group_ix, recs)
+                    if timer.tick(len(recs)):
+                        save_checkpoint()
+
+                return progress.workflow_completed(
+                    response,
+                    page_cls=sub.page_cls,
+                    sr=sr,
+                    pr=sub.pr,
+                    request_body=sub.request_body,
+                    arr_len=sub.arr_len,
+                    row_group_completed=row_group_completed,
+                    workflow_run_time_seconds=state["run_time"],
+                    workflow_credits=sr.price,
+                    error_msg=sr.error_msg,
+                )
 
-                    state = sr.to_dict()
-                    state["run_url"] = sr.get_app_url()
-                    state["price"] = sr.price
-                    state["run_time"] = round(sr.run_time.total_seconds(), 2)
-                    state["error_msg"] = sr.error_msg
+            in_flight: dict[Future, tuple[_SubRun, SavedRun]] = {}
 
-                    workflow_label = _make_unique_workflow_label(
-                        (pr and pr.title) or str(url_ix + 1),
-                        used_workflow_labels,
-                    )
+            def collect_completed():
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    sub, _ = in_flight.pop(fut)
+                    yield on_completed(sub, fut.result())
 
-                    for field, col in request.output_columns.items():
-                        col = f"({workflow_label}) {col}"
-                        out_val = state.get(field)
-                        if isinstance(out_val, list):
-                            for arr_ix, item in enumerate(out_val):
-                                if len(out_recs) <= rec_ix + arr_ix:
-                                    out_recs.append({})
-                                if isinstance(item, dict):
-                                    for key, val in item.items():
-                                        out_recs[rec_ix + arr_ix][f"{col}.{key}"] = str(
-                                            val
-                                        )
-                                        array_columns.add(f"{col}.{key}")
-                                else:
-                                    out_recs[rec_ix + arr_ix][col] = str(item)
-                                    array_columns.add(col)
-                        elif isinstance(out_val, dict):
-                            for key, val in out_val.items():
-                                if isinstance(val, list):
-                                    for arr_ix, item in enumerate(val):
-                                        if len(out_recs) <= rec_ix + arr_ix:
-                                            out_recs.append({})
-                                        out_recs[rec_ix + arr_ix][f"{col}.{key}"] = str(
-                                            item
-                                        )
-                                else:
-                                    out_recs[rec_ix][f"{col}.{key}"] = str(val)
+            pool = ThreadPoolExecutor(
+                max_workers=max_in_flight, initializer=get_initializer()
+            )
+            try:
+                for sub in iter_sub_runs():
+                    # keep at most `max_in_flight` sub-runs going,
+                    # and don't let one workspace hog all the workers.
+                    # the slot is reserved with a token, and then handed over to the
+                    # sub-run's run_id, which is what the window is seeded with from the db
+                    token = uuid.uuid4().hex
+                    while True:
+                        if len(in_flight) < max_in_flight:
+                            count, _ = workspace_runs.hit(workspace_cap, member=token)
+                            if count < workspace_cap:
+                                break
+                        if in_flight:
+                            yield from collect_completed()
                         else:
-                            out_recs[rec_ix][col] = str(out_val)
+                            yield "Waiting for other bulk runs in this workspace..."
+                            sleep(BULK_WORKSPACE_POLL_INTERVAL_SEC)
 
-                    out_df = pd.DataFrame.from_records(out_recs)
-                    f = upload_file_from_bytes(
-                        filename=f"bulk-runner-{doc_ix}-{url_ix}-{df_ix}.csv",
-                        data=out_df.to_csv(index=False).encode(),
-                        content_type="text/csv",
-                    )
-                    response.output_documents[doc_ix] = f
-                    yield progress.workflow_completed(
+                    try:
+                        result, sr = sub.sr.submit_api_call(
+                            workspace=self.current_workspace,
+                            current_user=self.request.user,
+                            request_body=sub.request_body,
+                            parent_pr=sub.pr,
+                            surface=SavedRun.Surface.bulk,
+                        )
+                    except BaseException:
+                        workspace_runs.remove(token)
+                        raise
+                    workspace_runs.add(sr.run_id, sr.created_at)
+                    workspace_runs.remove(token)
+                    yield progress.workflow_started(
                         response,
-                        page_cls=page_cls,
+                        current_row_number=row_offset + sub.df_ix + 1,
+                        workflow_number=sub.url_ix + 1,
+                        page_cls=sub.page_cls,
                         sr=sr,
-                        pr=pr,
-                        request_body=request_body,
-                        arr_len=arr_len,
-                        workflow_run_time_seconds=state["run_time"],
-                        workflow_credits=sr.price,
-                        error_msg=sr.error_msg,
+                        pr=sub.pr,
+                        request_body=sub.request_body,
                     )
+                    fut = pool.submit(_wait_for_sub_run, result, sr, workspace_runs)
+                    in_flight[fut] = (sub, sr)
+
+                while in_flight:
+                    yield from collect_completed()
+            finally:
+                # don't hold up a cancelled / failed run on the sub-runs in flight,
+                # and don't leave them running (and holding workspace slots) either
+                for fut, (_, sr) in in_flight.items():
+                    if not fut.done():
+                        _cancel_sub_run(sr, workspace_runs)
+                pool.shutdown(wait=False, cancel_futures=True)
+
+            # materialize the output document once, in input order
+            yield "Uploading Results..."
+            save_checkpoint()
+            response.output_documents[doc_ix] = upload_df(
+                spool.to_df(), f"bulk-runner-{doc_ix}", request.output_format
+            )
+            spool.close()
 
             row_offset += len(df)
 
@@ -456,6 +558,9 @@ To understand what each field represents, check out our [API docs](https://api.g
 
         progress.evals_completed(response)
 
+    def fields_to_save(self) -> [str]:
+        return super().fields_to_save() + [BULK_CHECKPOINT_KEY]
+
     def render_run_url_inputs(self, key: str, del_key: str, d: dict):
         from daras_ai_v2.all_pages import all_home_pages
 
@@ -534,6 +639,79 @@ To understand what each field represents, check out our [API docs](https://api.g
         )
 
 
+BULK_WORKSPACE_POLL_INTERVAL_SEC = 5
+BULK_CHECKPOINT_KEY = "__bulk_checkpoint"
+
+
+class _SubRun(typing.NamedTuple):
+    group_ix: int
+    df_ix: int
+    arr_len: int
+    url_ix: int
+    request_body: dict
+    page_cls: typing.Type[BasePage]
+    sr: SavedRun
+    pr: PublishedRun | None
+    workflow_label: str
+
+
+@db_middleware
+def _wait_for_sub_run(
+    result: "celery.result.AsyncResult",
+    sr: SavedRun,
+    workspace_runs: SlidingWindow,
+) -> SavedRun:
+    try:
+        sr.wait_for_celery_result(result)
+    finally:
+        workspace_runs.remove(sr.run_id)
+    return sr
+
+
+def _cancel_sub_run(sr: SavedRun, workspace_runs: SlidingWindow):
+    # same as the stop button, the celery task is revoked by signals.py
+    try:
+        sr.is_cancelled = True
+        sr.save(update_fields=["is_cancelled", "updated_at"])
+    except Exception as e:
+        logger.warning(f"failed to cancel bulk sub-run {sr.run_id}: {e!r}")
+    workspace_runs.remove(sr.run_id)
+
+
+def _write_output_columns(
+    recs: list[dict],
+    state: dict,
+    output_columns: dict[str, str],
+    workflow_label: str,
+    array_columns: set[str],
+):
+    for field, col in output_columns.items():
+        col = f"({workflow_label}) {col}"
+        out_val = state.get(field)
+        if isinstance(out_val, list):
+            for arr_ix, item in enumerate(out_val):
+                if len(recs) <= arr_ix:
+                    recs.append({})
+                if isinstance(item, dict):
+                    for key, val in item.items():
+                        recs[arr_ix][f"{col}.{key}"] = str(val)
+                        array_columns.add(f"{col}.{key}")
+                else:
+                    recs[arr_ix][col] = str(item)
+                    array_columns.add(col)
+        elif isinstance(out_val, dict):
+            for key, val in out_val.items():
+                if isinstance(val, list):
+                    for arr_ix, item in enumerate(val):
+                        if len(recs) <= arr_ix:
+                            recs.append({})
+                        recs[arr_ix][f"{col}.{key}"] = str(item)
+                else:
+                    recs[0][f"{col}.{key}"] = str(val)
+        else:
+            recs[0][col] = str(out_val)
+
+
 def _make_unique_workflow_label(title: str, used_labels: set[str]) -> str:
     label = title
     suffix = 2
@@ -1,4 +1,3 @@
-import base64
 import json
 import typing
 import datetime
@@ -11,7 +10,6 @@ from django.db.models import Q
 from django.utils import timezone
 from django.utils.text import slugify
 from fastapi import HTTPException
-from fastapi.encoders import jsonable_encoder
 from furl import furl
 from loguru import logger
 from pydantic import BaseModel, ValidationError
@@ -37,6 +35,7 @@ from daras_ai_v2.analysis_results import (
     render_analysis_section,
 )
 from daras_ai_v2.base import BasePage, RecipeTabs
+from daras_ai_v2.export_files import upload_csv_rows, upload_json_rows
 from daras_ai_v2.language_model import CHATML_ROLE_ASSISTANT, CHATML_ROLE_USER
 from daras_ai_v2.workflow_url_input import workflow_url_input
 from functions.models import VariableSchema
@@ -272,7 +271,7 @@ class VideoBotsStatsPage(BasePage):
             gui.tooltip("Includes full data (UI only shows first 500 rows)"),
         ):
             if gui.button("Download CSV file"):
-                df = get_tabular_data(
+                csv_url = upload_tabular_data_csv(
                     bi=bi,
                     tz=tz,
                     conversations=conversations,
@@ -282,15 +281,13 @@ class VideoBotsStatsPage(BasePage):
                     start_date=start_date,
                     end_date=end_date,
                 )
-                csv = df.to_csv()
-                b64 = base64.b64encode(csv.encode()).decode()
                 gui.js(
                     dedent(
                         # language=javscript
                         f"""
                         (function() {{
                             let el = document.createElement("a");
-                            el.setAttribute("href", "data:file/csv;base64,{b64}");
+                            el.setAttribute("href", {json.dumps(csv_url)});
                             el.setAttribute("download", "{slugify(bi.name)}.csv");
                             document.body.appendChild(el);
                             el.click();
@@ -625,12 +622,6 @@ def get_tabular_data(
             )
             conversations = conversations.filter(messages__in=messages).distinct()
         df = conversations.to_df(tz=tz, row_limit=rows)
-    elif details == "Messages":
-        if start_date and end_date:
-            messages = messages.filter(
-                created_at__date__gte=start_date, created_at__date__lte=end_date
-            )
-        df = messages.to_df(tz=tz, row_limit=rows)
     elif details == "Feedback Positive":
         pos_feedbacks = Feedback.objects.filter(
             message__conversation__bot_integration=bi,
@@ -651,35 +642,89 @@ def get_tabular_data(
                 created_at__date__gte=start_date, created_at__date__lte=end_date
             )
         df = neg_feedbacks.to_df(tz=tz, row_limit=rows)
+    else:
+        qs = get_messages_qs(
+            bi=bi,
+            messages=messages,
+            details=details,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        if qs is not None:
+            df = qs.to_df(tz=tz, row_limit=rows)
+
+    if sort_by and sort_by in df.columns:
+        df.sort_values(by=[sort_by], ascending=False, inplace=True)
+
+    return df
+
+
+def get_messages_qs(
+    *,
+    bi: BotIntegration,
+    messages: MessageQuerySet,
+    details: str,
+    start_date: datetime.datetime | None = None,
+    end_date: datetime.datetime | None = None,
+) -> MessageQuerySet | None:
+    if details == "Messages":
+        qs = messages
     elif details == "Answered Successfully":
         qs = Message.objects.filter(
             Q(analysis_result__contains={"Answered": True})
             | Q(analysis_result__contains={"assistant": {"answer": "Found"}}),
             conversation__bot_integration=bi,
         )
-        if start_date and end_date:
-            qs = qs.filter(
-                created_at__date__gte=start_date, created_at__date__lte=end_date
-            )
-        qs |= qs.previous_by_created_at()
-        df = qs.to_df(tz=tz, row_limit=rows)
     elif details == "Answered Unsuccessfully":
         qs = Message.objects.filter(
             Q(analysis_result__contains={"Answered": False})
             | Q(analysis_result__contains={"assistant": {"answer": "Missing"}}),
             conversation__bot_integration=bi,
         )  # type: ignore
-        if start_date and end_date:
-            qs = qs.filter(
-                created_at__date__gte=start_date, created_at__date__lte=end_date
-            )
+    else:
+        return None
+    if start_date and end_date:
+        qs = qs.filter(created_at__date__gte=start_date, created_at__date__lte=end_date)
+    if details != "Messages":
         qs |= qs.previous_by_created_at()
-        df = qs.to_df(tz=tz, row_limit=rows)
+    return qs
 
-    if sort_by and sort_by in df.columns:
-        df.sort_values(by=[sort_by], ascending=False, inplace=True)
 
-    return df
+def upload_tabular_data_csv(
+    *,
+    bi: BotIntegration,
+    tz: pytz.timezone,
+    conversations: ConversationQuerySet,
+    messages: MessageQuerySet,
+    details: str,
+    sort_by: str,
+    rows: int = 10000,
+    start_date: datetime.datetime | None = None,
+    end_date: datetime.datetime | None = None,
+) -> str:
+    filename = f"{slugify(bi.name)}.csv"
+    qs = get_messages_qs(
+        bi=bi,
+        messages=messages,
+        details=details,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    # unsorted message rows can be streamed to the file in the order they are read
+    if qs is not None and not sort_by:
+        return upload_csv_rows(filename, qs.iter_export_rows(tz=tz, row_limit=rows))
+    df = get_tabular_data(
+        bi=bi,
+        tz=tz,
+        conversations=conversations,
+        messages=messages,
+        details=details,
+        sort_by=sort_by,
+        rows=rows,
+        start_date=start_date,
+        end_date=end_date,
+    )
+    return upload_file_from_bytes(filename, df.to_csv(index=False).encode(), "text/csv")
 
 
 def jsonable_exec_export_fn(bi_id: id, sr_id: id, pr_id: id) -> str:
@@ -698,12 +743,8 @@ def exec_export_fn(bi: BotIntegration, fn_sr: SavedRun, fn_pr: PublishedRun | No
         created_at__date__gte=now - timezone.timedelta(days=2),
         created_at__date__lte=now,
     )
-    messages = qs.to_json()
-    data = json.dumps(jsonable_encoder(messages)).encode()
-    json_url = upload_file_from_bytes(
-        filename=f"messages-{now.strftime('%Y-%m-%d')}.json",
-        data=data,
-        content_type="application/json",
+    json_url = upload_json_rows(
+        f"messages-{now.strftime('%Y-%m-%d')}.json", qs.iter_json()
     )
     logger.info(f"exported stats for {bi} -> {json_url}")
     variables, variables_schema = get_export_fn_vars(
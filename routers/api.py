@@ -1,9 +1,11 @@
+import asyncio
 import json
 import typing
 
 import gooey_gui as gui
 from fastapi import Depends
 from fastapi import Form
+from fastapi import Header
 from fastapi import HTTPException
 from fastapi import Response
 from fastapi.encoders import jsonable_encoder
@@ -14,13 +16,15 @@ from pydantic import ValidationError
 from pydantic import create_model
 from starlette.datastructures import FormData
 from starlette.datastructures import UploadFile
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 from starlette.status import (
     HTTP_402_PAYMENT_REQUIRED,
     HTTP_429_TOO_MANY_REQUESTS,
     HTTP_500_INTERNAL_SERVER_ERROR,
     HTTP_400_BAD_REQUEST,
+    HTTP_504_GATEWAY_TIMEOUT,
 )
 
 from api_keys.models import ApiKey
@@ -33,9 +37,11 @@ from daras_ai_v2.all_pages import all_api_pages
 from daras_ai_v2.base import (
     BasePage,
     RecipeRunState,
+    StateKeys,
 )
 from daras_ai_v2.fastapi_tricks import fastapi_request_form
 from functions.models import CalledFunctionResponse
+from gooeysite.bg_db_conn import db_middleware
 from recipes.BulkRunner import is_arr
 from routers.custom_api_router import CustomAPIRouter
 from workspaces.models import Workspace
@@ -162,23 +168,27 @@ def script_to_api(page_cls: typing.Type[BasePage]):
             name=page_cls.title + " (v2 sync)",
             include_in_schema=is_latest,
         )
-        def run_api_json(
+        async def run_api_json(
             request: Request,
             page_request: request_model,
             api_key: ApiKey = Depends(api_auth_header),
         ):
-            result, sr = submit_api_call(
-                page_cls=page_cls,
-                query_params=dict(request.query_params),
-                retention_policy=RetentionPolicy[
-                    page_request.settings.retention_policy
-                ],
-                current_user=api_key.created_by,
-                workspace=api_key.workspace,
-                request_body=page_request.model_dump(exclude_unset=True),
-                enable_rate_limits=True,
-            )
-            return build_sync_api_response(result, sr)
+            @db_middleware
+            def submit():
+                return submit_api_call(
+                    page_cls=page_cls,
+                    query_params=dict(request.query_params),
+                    retention_policy=RetentionPolicy[
+                        page_request.settings.retention_policy
+                    ],
+                    current_user=api_key.created_by,
+                    workspace=api_key.workspace,
+                    request_body=page_request.model_dump(exclude_unset=True),
+                    enable_rate_limits=True,
+                )
+
+            result, sr = await run_in_threadpool(submit)
+            return await build_sync_api_response(result, sr)
 
         @app.post(
             f"/v2/{slug}/form",
@@ -190,22 +200,28 @@ def script_to_api(page_cls: typing.Type[BasePage]):
             },
             include_in_schema=False,
         )
-        def run_api_form(
+        async def run_api_form(
             request: Request,
             api_key: ApiKey = Depends(api_auth_header),
             form_data=fastapi_request_form,
             page_request_json: str = Form(alias="json"),
         ):
             # parse form data
-            page_request = _parse_form_data(
-                request_model,
-                form_data,
-                page_request_json,
-                workspace=api_key.workspace,
-                user=api_key.created_by,
-            )
+            @db_middleware
+            def parse():
+                return _parse_form_data(
+                    request_model,
+                    form_data,
+                    page_request_json,
+                    workspace=api_key.workspace,
+                    user=api_key.created_by,
+                )
+
+            page_request = await run_in_threadpool(parse)
             # call regular json api
-            return run_api_json(request, page_request=page_request, api_key=api_key)
+            return await run_api_json(
+                request, page_request=page_request, api_key=api_key
+            )
 
         @app.post(
             f"/v3/{slug}/async",
@@ -307,7 +323,168 @@ def script_to_api(page_cls: typing.Type[BasePage]):
                     if sr.retention_policy == RetentionPolicy.delete:
                         sr.state = {}
                         sr.save(update_fields=["state", "updated_at"])
-                return ret
+            return ret
+
+        @app.get(
+            f"/v3/{slug}/stream",
+            responses={
+                200: {"content": {"text/event-stream": {}}},
+                **common_errs,
+            },
+            operation_id="stream__" + slug,
+            tags=[page_cls.title],
+            name=page_cls.title + " (v3 stream)",
+            include_in_schema=is_latest,
+        )
+        async def stream_run(
+            run_id: str,
+            api_key: ApiKey = Depends(api_auth_header),
+            last_event_id: str | None = Header(None),
+        ):
+            @db_middleware
+            def get_sr():
+                user = api_key.created_by
+                return page_cls.get_sr_from_ids(run_id, user.uid)
+
+            try:
+                sr = await run_in_threadpool(get_sr)
+            except SavedRun.DoesNotExist:
+                raise HTTPException(status_code=404)
+            return StreamingResponse(
+                stream_run_events(
+                    sr,
+                    get_final_response=db_middleware(
+                        lambda: get_run_status(run_id, api_key)
+                    ),
+                    last_event_id=last_event_id,
+                ),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+
+SSE_HEARTBEAT_INTERVAL_SEC = 15
+
+
+async def stream_run_events(
+    sr: SavedRun,
+    *,
+    get_final_response: typing.Callable[[], dict | JSONResponse],
+    last_event_id: str | None = None,
+) -> typing.AsyncGenerator[bytes, None]:
+    """
+    Server-sent events for a run, driven by the realtime updates pushed by the runner task.
+
+    Events:
+        status: whenever the status or detail of the run changes
+        output_text: the text appended to (or rewritten in) `output_text` since the last event
+        final_response: the same payload as the `/status` endpoint, once the run is done
+        error: the run failed with an error code
+
+    The event id encodes how much of `output_text` has been sent, so a client that
+    reconnects with `Last-Event-ID` only receives the text it hasn't seen yet.
+    """
+    page_cls = Workflow(sr.workflow).page_cls
+    channel = page_cls.realtime_channel_name(sr.run_id, sr.uid)
+    try:
+        sent_lengths = json.loads(last_event_id) if last_event_id else None
+    except json.JSONDecodeError:
+        sent_lengths = None
+    last_status = None
+
+    def is_running() -> bool:
+        return SavedRun.objects.filter(id=sr.id).exclude(run_status="").exists()
+
+    if sr.run_status:
+        async with gui.realtime_subscribe_async(
+            channel, timeout=SSE_HEARTBEAT_INTERVAL_SEC
+        ) as realtime_gen:
+            async for state in realtime_gen:
+                if state is None:
+                    # in case the runner died without a final push
+                    if not await run_in_threadpool(db_middleware(is_running)):
+                        break
+                    yield b": heartbeat\n\n"
+                    continue
+
+                status = (
+                    page_cls.get_run_state(state),
+                    state.get(StateKeys.run_status) or "",
+                )
+                if status != last_status:
+                    last_status = status
+                    yield _sse_event(
+                        dict(type="status", status=status[0].value, detail=status[1])
+                    )
+
+                output_text = state.get("output_text")
+                deltas = [
+                    dict(path=path, delta=text)
+                    if is_delta
+                    else dict(path=path, text=text)
+                    for path, text, is_delta in _diff_text(output_text, sent_lengths)
+                ]
+                if deltas:
+                    sent_lengths = _text_lengths(output_text)
+                    yield _sse_event(
+                        dict(type="output_text", deltas=deltas),
+                        id=json.dumps(sent_lengths),
+                    )
+
+                if not state.get(StateKeys.run_status):
+                    break
+
+    ret = await run_in_threadpool(get_final_response)
+    if isinstance(ret, JSONResponse):
+        detail = json.loads(ret.body)["detail"]
+        yield _sse_event(dict(type="error", detail=detail.get("error") or ""))
+    else:
+        yield _sse_event(jsonable_encoder(dict(type="final_response") | ret))
+
+
+def _sse_event(data: dict, id: str | None = None) -> bytes:
+    ret = b""
+    if id is not None:
+        ret += b"id: " + id.encode() + b"\n"
+    ret += b"event: " + data["type"].encode() + b"\n"
+    ret += b"data: " + json.dumps(data).encode() + b"\n\n"
+    return ret
+
+
+def _diff_text(
+    value: typing.Any, sent: typing.Any, path: tuple = ()
+) -> typing.Iterator[tuple[list, str, bool]]:
+    """
+    Compare the strings nested in `value` against `sent` (the same structure, with the lengths already sent).
+    Yields `(path, text, is_delta)`: the appended text, or the full text if it was rewritten.
+    """
+    match value:
+        case str():
+            sent_len = sent if isinstance(sent, int) else 0
+            if len(value) > sent_len:
+                yield list(path), value[sent_len:], True
+            elif len(value) < sent_len:
+                yield list(path), value, False
+        case list():
+            for i, v in enumerate(value):
+                prev = sent[i] if isinstance(sent, list) and i < len(sent) else None
+                yield from _diff_text(v, prev, path + (i,))
+        case dict():
+            for k, v in value.items():
+                prev = sent.get(k) if isinstance(sent, dict) else None
+                yield from _diff_text(v, prev, path + (k,))
+
+
+def _text_lengths(value: typing.Any) -> typing.Any:
+    match value:
+        case str():
+            return len(value)
+        case list():
+            return [_text_lengths(v) for v in value]
+        case dict():
+            return {k: _text_lengths(v) for k, v in value.items()}
+        case _:
+            return None
 
 
 def _parse_form_data(
@@ -457,12 +634,65 @@ def build_async_api_response(sr: "SavedRun") -> dict:
     )
 
 
-def build_sync_api_response(
+async def build_sync_api_response(
+    result: "celery.result.AsyncResult", sr: "SavedRun"
+) -> JSONResponse:
+    # wait for the result, without holding on to a worker thread
+    try:
+        ready = await asyncio.wait_for(
+            wait_for_run_async(result, sr), settings.SYNC_API_TIMEOUT_SEC
+        )
+    except asyncio.TimeoutError:
+        return await run_in_threadpool(_build_sync_api_timeout_response, sr)
+    return await run_in_threadpool(_build_sync_api_response, result, sr, ready)
+
+
+async def wait_for_run_async(
     result: "celery.result.AsyncResult", sr: "SavedRun"
+) -> bool:
+    """
+    Wait for the run to finish, using the realtime updates pushed by the runner task.
+    Returns True if the celery task finished before a completion message was received.
+    """
+    channel = Workflow(sr.workflow).page_cls.realtime_channel_name(sr.run_id, sr.uid)
+    async with gui.realtime_subscribe_async(channel) as realtime_gen:
+        async for state in realtime_gen:
+            if state is None:
+                # no updates for a while, make sure the task didn't die without a final push
+                if await run_in_threadpool(result.ready):
+                    return True
+            elif not state.get(StateKeys.run_status):
+                return False
+
+
+@db_middleware
+def _build_sync_api_timeout_response(sr: "SavedRun") -> JSONResponse:
+    return JSONResponse(
+        dict(
+            detail=dict(
+                id=sr.run_id,
+                url=sr.get_app_url(),
+                created_at=sr.created_at.isoformat(),
+                error=(
+                    f"The run did not finish within {settings.SYNC_API_TIMEOUT_SEC} seconds. "
+                    "It is still running, use the async API to check its status."
+                ),
+            )
+        ),
+        status_code=HTTP_504_GATEWAY_TIMEOUT,
+    )
+
+
+@db_middleware
+def _build_sync_api_response(
+    result: "celery.result.AsyncResult", sr: "SavedRun", ready: bool
 ) -> JSONResponse:
     web_url = sr.get_app_url()
-    # wait for the result
-    sr.wait_for_celery_result(result)
+    if ready:
+        # raise any errors from the task
+        sr.wait_for_celery_result(result)
+    else:
+        sr.refresh_from_db()
     if sr.retention_policy == RetentionPolicy.delete:
         sr.state = {}
         sr.save(update_fields=["state", "updated_at"])
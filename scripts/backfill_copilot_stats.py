@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from bots.models.copilot_stats import update_copilot_stats_rollups, utc_day_start
+
+
+def run(days: str = "365"):
+    """
+    Build the copilot stats rollups for historical messages, one day at a time.
+
+    Usage: ./manage.py runscript backfill_copilot_stats --script-args 365
+    """
+    until = utc_day_start(timezone.now()) + timedelta(days=1)
+    for _ in range(int(days)):
+        since = until - timedelta(days=1)
+        update_copilot_stats_rollups(since, until)
+        print(f"rolled up copilot stats for {since:%Y-%m-%d}")
+        until = since
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from time import perf_counter
+
+import numpy as np
+from django.utils import timezone
+
+from bots.models import SavedRun, Workflow
+from daras_ai_v2.ratelimits import SlidingWindow
+
+
+def run(workflow: str = "VIDEO_BOTS", uid: str = "", n: str = "200"):
+    """
+    Compare the per-request cost of the db count vs the redis sliding window.
+
+    Usage: ./manage.py runscript benchmark_ratelimits --script-args VIDEO_BOTS <uid> 200
+    """
+    workflow = Workflow[workflow]
+    n = int(n)
+    qs = SavedRun.objects.filter(workflow=workflow, uid=uid)
+
+    def db_count():
+        qs.filter(created_at__gte=timezone.now() - timedelta(minutes=1)).count()
+        qs.filter(created_at__gte=timezone.now() - timedelta(minutes=30)).exclude(
+            run_status=""
+        ).count()
+
+    window = SlidingWindow(
+        f"benchmark/{workflow.value}/{uid}",
+        window_sec=60,
+        seed_fn=lambda since: (
+            qs.filter(created_at__gte=since).values_list("run_id", "created_at")
+        ),
+    )
+
+    def redis_hit():
+        window.hit(limit=n + 1)
+        window.count()
+
+    for name, fn in [("db", db_count), ("redis", redis_hit)]:
+        fn()  # warm up connections
+        timings = []
+        for _ in range(n):
+            start = perf_counter()
+            fn()
+            timings.append((perf_counter() - start) * 1000)
+        print(
+            f"{name:>6}: p50={np.percentile(timings, 50):.2f}ms "
+            f"p99={np.percentile(timings, 99):.2f}ms"
+        )
@@ -0,0 +1,81 @@
+import json
+from time import perf_counter
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from gooey_gui.core import serializer
+
+DEFAULT_PATHS = (
+    "/explore/",
+    "/copilot/",
+    "/copilot/examples/",
+    "/copilot/api/",
+    "/compare-llm/",
+    "/doc-search/",
+)
+
+
+def run(*paths: str, repeat: str = "20"):
+    """
+    Compare serializing render responses in one pass (gooey_gui.core.serializer)
+    against the previous jsonable_encoder + JSONResponse path.
+
+    Renders each page once through the app, captures the render tree & session state,
+    and then times only the serialization of the captured response.
+
+    Usage: ./manage.py runscript benchmark_render_json --script-args /copilot/ /copilot/history/
+    """
+    from starlette.testclient import TestClient
+
+    from server import app
+
+    captured = {}
+    orig_render = serializer.RenderResponse.render
+
+    def capture_render(self, content):
+        captured["content"] = content
+        return orig_render(self, content)
+
+    serializer.RenderResponse.render = capture_render
+    client = TestClient(app)
+    try:
+        for path in paths or DEFAULT_PATHS:
+            captured.clear()
+            r = client.post(path, json={"state": {}}, follow_redirects=False)
+            if "content" not in captured:
+                print(f"{path}: skipped ({r.status_code})")
+                continue
+            _benchmark_page(path, captured["content"], int(repeat))
+    finally:
+        serializer.RenderResponse.render = orig_render
+
+
+def _benchmark_page(path: str, content: dict, repeat: int):
+    def legacy():
+        return JSONResponse(
+            jsonable_encoder(
+                content
+                | dict(children=[node.to_dict() for node in content["children"]])
+            )
+        ).body
+
+    def one_pass():
+        return serializer.dumps(content)
+
+    if json.loads(legacy()) != json.loads(one_pass()):
+        print(f"{path}: WARNING outputs differ")
+
+    timings = {}
+    for name, fn in {"jsonable_encoder": legacy, "one pass": one_pass}.items():
+        best = float("inf")
+        for _ in range(repeat):
+            start = perf_counter()
+            body = fn()
+            best = min(best, perf_counter() - start)
+        timings[name] = best
+    print(
+        f"{path}: {len(body) / 1e3:.0f}kB "
+        + " ".join(f"{name}={t * 1e3:.2f}ms" for name, t in timings.items())
+        + f" speedup={timings['jsonable_encoder'] / timings['one pass']:.1f}x"
+    )
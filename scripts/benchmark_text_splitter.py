@@ -0,0 +1,70 @@
+import random
+from time import perf_counter
+
+from daras_ai_v2.text_splitter import default_length_function, text_splitter
+
+
+def run(
+    *pdf_paths: str,
+    num_pages: str = "500",
+    chunk_size: str = "1024",
+    chunk_overlap: str = "128",
+    repeat: str = "3",
+):
+    """
+    Compare the text splitter's token counting fast path against tokenizing every fragment.
+
+    Splits the pages of the given pdfs, or `num_pages` pages of generated text if none are given.
+
+    Usage: ./manage.py runscript benchmark_text_splitter --script-args corpus1.pdf corpus2.pdf
+    """
+    from daras_ai_v2.vector_search import pdf_to_text_pages
+
+    pages = []
+    for path in pdf_paths:
+        with open(path, "rb") as f:
+            pages += pdf_to_text_pages(f)
+    if not pages:
+        pages = [_generate_page() for _ in range(int(num_pages))]
+    print(
+        f"{len(pages)} pages, {sum(map(len, pages)) / 1e6:.1f}M chars, "
+        f"chunk_size={chunk_size} chunk_overlap={chunk_overlap}"
+    )
+
+    variants = {
+        "fast path": default_length_function,
+        # any other length function skips the fast path
+        "per fragment": lambda text: default_length_function(text),
+    }
+    for name, length_function in variants.items():
+        timings = []
+        for _ in range(int(repeat)):
+            start = perf_counter()
+            docs = text_splitter(
+                pages,
+                chunk_size=int(chunk_size),
+                chunk_overlap=int(chunk_overlap),
+                length_function=length_function,
+            )
+            timings.append(perf_counter() - start)
+        lengths = [default_length_function(doc.text) for doc in docs]
+        print(
+            f"{name:>12}: best={min(timings):.2f}s chunks={len(docs)} "
+            f"max_tokens={max(lengths)}"
+        )
+
+
+def _generate_page() -> str:
+    words = (
+        "the of and to in is that for it as was with be by on not he this are or "
+        "his from at which but have an they you were her she there been one all we "
+        "their has would when if so no will can more other its who may into some"
+    ).split()
+    paras = []
+    for _ in range(random.randint(4, 10)):
+        sentences = [
+            " ".join(random.choices(words, k=random.randint(6, 24))).capitalize() + "."
+            for _ in range(random.randint(2, 8))
+        ]
+        paras.append(" ".join(sentences))
+    return "\n\n".join(paras)
@@ -1,8 +1,10 @@
+import asyncio
 import typing
 
 from starlette.testclient import TestClient
 
-from bots.models import Workflow, PublishedRun
+from bots.models import Workflow, PublishedRun, SavedRun
+from daras_ai_v2 import settings
 from daras_ai_v2.all_pages import all_test_pages
 from daras_ai_v2.base import BasePage
 from server import app
@@ -32,6 +34,29 @@ def _test_api_sync(page_cls: typing.Type[BasePage], endpoint: str):
     assert r.status_code == 200, r.text
 
 
+def test_apis_sync_timeout(
+    mock_celery_tasks, db_fixtures, force_authentication, monkeypatch
+):
+    async def wait_forever(result, sr):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr("routers.api.wait_for_run_async", wait_forever)
+    monkeypatch.setattr(settings, "SYNC_API_TIMEOUT_SEC", 0.1)
+
+    page_cls = all_test_pages[0]
+    state = page_cls.get_root_pr().saved_run.state
+    r = client.post(
+        f"/v2/{page_cls.slug_versions[0]}/",
+        json=page_cls.get_example_request(state)[1],
+        headers={"Authorization": "Token None"},
+        follow_redirects=False,
+    )
+    assert r.status_code == 504, r.text
+    detail = r.json()["detail"]
+    assert detail["id"], detail
+    assert "did not finish" in detail["error"], detail
+
+
 def test_apis_async(
     mock_celery_tasks, db_fixtures, force_authentication, threadpool_subtest
 ):
@@ -67,6 +92,58 @@ def _test_api_async(page_cls: typing.Type[BasePage], endpoint: str):
         assert "output" in data, data
 
 
+def test_apis_stream(mock_celery_tasks, db_fixtures, force_authentication):
+    page_cls = all_test_pages[0]
+    state = page_cls.get_root_pr().saved_run.state
+    r = client.post(
+        f"/v3/{page_cls.slug_versions[0]}/async/",
+        json=page_cls.get_example_request(state)[1],
+        headers={"Authorization": "Token None"},
+        follow_redirects=False,
+    )
+    assert r.status_code == 202, r.text
+
+    r = client.get(
+        f"/v3/{page_cls.slug_versions[0]}/stream/",
+        params=dict(run_id=r.json()["run_id"]),
+        headers={"Authorization": "Token None"},
+        follow_redirects=False,
+    )
+    assert r.status_code == 200, r.text
+    assert r.headers["Content-Type"].startswith("text/event-stream")
+    events = [line for line in r.text.splitlines() if line.startswith("event: ")]
+    assert events[-1] in ("event: final_response", "event: error"), r.text
+
+
+def test_apis_stream_failed_run(mock_celery_tasks, db_fixtures, force_authentication):
+    page_cls = all_test_pages[0]
+    state = page_cls.get_root_pr().saved_run.state
+    r = client.post(
+        f"/v3/{page_cls.slug_versions[0]}/async/",
+        json=page_cls.get_example_request(state)[1],
+        headers={"Authorization": "Token None"},
+        follow_redirects=False,
+    )
+    assert r.status_code == 202, r.text
+    run_id = r.json()["run_id"]
+    # most failed runs have an error message, but no error code
+    SavedRun.objects.filter(run_id=run_id).update(
+        error_msg="Something went wrong", error_code=None, run_status=""
+    )
+
+    r = client.get(
+        f"/v3/{page_cls.slug_versions[0]}/stream/",
+        params=dict(run_id=run_id),
+        headers={"Authorization": "Token None"},
+        follow_redirects=False,
+    )
+    assert r.status_code == 200, r.text
+    lines = r.text.splitlines()
+    assert "event: final_response" in lines, r.text
+    data = lines[lines.index("event: final_response") + 1]
+    assert '"status": "failed"' in data, r.text
+
+
 def test_apis_examples(
     mock_celery_tasks, db_fixtures, force_authentication, threadpool_subtest
 ):
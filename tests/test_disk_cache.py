@@ -0,0 +1,17 @@
+import os
+
+from daras_ai_v2.disk_cache import DiskCache
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    src = tmp_path / "src"
+    cache = DiskCache(tmp_path / "cache", max_bytes=25, suffix=".bin")
+    for i, key in enumerate(["a", "b", "c"]):
+        src.write_bytes(key.encode() * 10)
+        cache.put_file(key, src)
+        # make sure the mtimes are ordered, regardless of the filesystem's resolution
+        os.utime(cache._path(key), (i, i))
+    assert cache.get("a") is None
+    assert cache.get("b")[:] == b"b" * 10
+    assert cache.get("c")[:] == b"c" * 10
+    assert cache.stats() == dict(hits=2, misses=1, evictions=1)
@@ -0,0 +1,24 @@
+from time import sleep
+
+from daras_ai_v2.local_cache import LocalCache
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == dict(hits=3, misses=1, size=2)
+
+
+def test_local_cache_ttl():
+    cache = LocalCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
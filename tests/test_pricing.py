@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from starlette.testclient import TestClient
 
 from bots.models import AppUser
@@ -8,8 +10,14 @@ from payments.plans import PricingPlan
 from recipes.CompareLLM import CompareLLMPage
 from recipes.Lipsync import LipsyncPage
 from recipes.VideoBots import VideoBotsPage
+from celeryapp.tasks import threadlocal
 from server import app
-from usage_costs.models import UsageCost, ModelPricing
+from usage_costs.cost_utils import (
+    flush_usage_costs,
+    get_model_pricing,
+    record_cost_auto,
+)
+from usage_costs.models import ModelPricing, ModelSku, UsageCost
 
 client = TestClient(app)
 
@@ -194,3 +202,41 @@ def test_lipsync_pricing(transactional_db):
         )
         == 132
     )
+
+
+def test_record_cost_auto_is_buffered_until_flush(transactional_db):
+    user = AppUser.objects.create(uid="test_user", is_anonymous=False)
+    sr = SavedRun.objects.create(
+        workflow=Workflow.VIDEO_BOTS, run_id="test_run", uid=user.uid
+    )
+    pricing = ModelPricing.objects.create(
+        model_id="test-model",
+        sku=ModelSku.llm_prompt,
+        unit_cost=3,
+        unit_quantity=1000,
+        category=1,
+        provider=1,
+        model_name="test_model",
+    )
+
+    threadlocal.saved_run = sr
+    try:
+        record_cost_auto(model="test-model", sku=ModelSku.llm_prompt, quantity=500)
+        record_cost_auto(model="test-model", sku=ModelSku.llm_prompt, quantity=1500)
+    finally:
+        threadlocal.saved_run = None
+    assert not sr.usage_costs.exists()
+
+    flush_usage_costs(sr)
+    assert sorted(sr.usage_costs.values_list("dollar_amount", flat=True)) == [
+        Decimal("1.5"),
+        Decimal("4.5"),
+    ]
+    # nothing left to flush
+    assert flush_usage_costs(sr) == []
+
+    # the cached pricing is invalidated on save
+    assert get_model_pricing("test-model", ModelSku.llm_prompt) == pricing
+    pricing.unit_cost = 5
+    pricing.save()
+    assert get_model_pricing("test-model", ModelSku.llm_prompt).unit_cost == 5
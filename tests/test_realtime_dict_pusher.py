@@ -0,0 +1,41 @@
+import json
+
+from gooey_gui.core import pubsub
+from gooey_gui.core.pubsub import RealtimeDictPusher, _apply_patch
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.published = []
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def publish(self, channel, message):
+        self.published.append(message)
+
+    def execute(self):
+        pass
+
+
+def test_realtime_dict_pusher_patches(monkeypatch):
+    r = FakeRedis()
+    monkeypatch.setattr(pubsub, "get_redis", lambda: r)
+    pusher = RealtimeDictPusher("test")
+    value = {}
+
+    for state in [
+        dict(a=1, b="x", c=None),
+        dict(a=1, b="y", c=None),
+        # a value that's set to None is not removed
+        dict(a=None, b="y"),
+        dict(b="y", d=[1, 2]),
+        {},
+    ]:
+        pusher.push(state)
+        assert _apply_patch(value, r.published[-1])
+        assert value == json.loads(r.values["gooey-gui/state/test"]) == state
@@ -0,0 +1,66 @@
+from gooey_gui.core.diff import (
+    REF_NODE_NAME,
+    diff_state,
+    diff_tree,
+    hash_state,
+    hash_tree,
+)
+from gooey_gui.core.renderer import RenderTreeNode
+
+
+def _page(text: str) -> list[RenderTreeNode]:
+    return [
+        RenderTreeNode("nav", children=[RenderTreeNode("a", dict(href="/"))]),
+        RenderTreeNode(
+            "div",
+            dict(className="container"),
+            [
+                RenderTreeNode("textarea", dict(name="input_prompt", value=text)),
+                RenderTreeNode("markdown", dict(body="some long output " * 100)),
+            ],
+        ),
+    ]
+
+
+def _resolve(nodes: list[dict], prev: list[dict]) -> list[dict]:
+    ret = []
+    for node in nodes:
+        if node["name"] == REF_NODE_NAME:
+            path = node["props"]["path"]
+            ref = prev[path[0]]
+            for i in path[1:]:
+                ref = ref["children"][i]
+            ret.append(ref)
+        else:
+            ret.append(node | dict(children=_resolve(node["children"], prev)))
+    return ret
+
+
+def test_diff_tree():
+    prev = _page("hello")
+    prev_paths = hash_tree(prev).paths
+    children = _page("hello world")
+    diff = diff_tree(children, hash_tree(children), prev_paths)
+
+    nav, div = diff
+    assert nav.name == REF_NODE_NAME
+    assert div.name == "div"
+    assert div.children[0].props["value"] == "hello world"
+    assert div.children[1].name == REF_NODE_NAME
+
+    prev_dicts = [node.to_dict() for node in prev]
+    assert _resolve([node.to_dict() for node in diff], prev_dicts) == [
+        node.to_dict() for node in children
+    ]
+
+
+def test_diff_state():
+    state = dict(a=1, b=dict(x=[1, 2]), c="unchanged", __cache__={"k": "v" * 1000})
+    state_hashes = hash_state(state)
+    state["a"] = 2
+    state["b"]["x"].append(3)
+    del state["c"]
+    state["d"] = None
+    patch, deleted = diff_state(state, state_hashes)
+    assert patch == dict(a=2, b=dict(x=[1, 2, 3]), d=None)
+    assert deleted == ["c"]
@@ -0,0 +1,63 @@
+import threading
+
+from gooey_gui.core import executor
+from gooey_gui.core.executor import RunInThreadExecutor, get_dedup_key
+
+calls = []
+release = threading.Event()
+
+
+def slow_fn(x):
+    calls.append(x)
+    release.wait(5)
+    return dict(x=x, t=(1, 2))
+
+
+def test_run_in_thread_executor_dedup(monkeypatch):
+    pushed = {}
+    done = threading.Event()
+
+    def realtime_push(channel, value, ex=None):
+        pushed[channel] = value
+        done.set()
+
+    monkeypatch.setattr(executor, "realtime_push", realtime_push)
+    ex = RunInThreadExecutor(max_workers=2, max_queue=10, cache_size=10)
+
+    channels = {ex.submit(slow_fn, [1], {}, ex=60, shared=True) for _ in range(5)}
+    assert len(channels) == 1
+    release.set()
+    assert done.wait(5)
+
+    channel = channels.pop()
+    assert calls == [1]
+    assert pushed[channel] == ex.get_result(channel) == {"y": {"x": 1, "t": [1, 2]}}
+    # finished calls are served from the result cache
+    assert ex.submit(slow_fn, [1], {}, ex=60, shared=True) == channel
+    assert calls == [1]
+    assert ex.stats()["deduped"] == 5
+    # calls are only shared when asked to
+    assert ex.submit(slow_fn, [1], {}, ex=60) != channel
+
+
+def test_get_dedup_key():
+    assert get_dedup_key(slow_fn, [1], {}) == get_dedup_key(slow_fn, (1,), {})
+    assert get_dedup_key(slow_fn, [1], {}) != get_dedup_key(slow_fn, [2], {})
+    assert get_dedup_key(slow_fn, [object()], {}) is None
+    assert get_dedup_key(lambda x: x, [1], {}) is None
+    assert get_dedup_key(calls.append, [1], {}) is None
+
+
+def test_run_in_thread_executor_full(monkeypatch):
+    monkeypatch.setattr(executor, "realtime_push", lambda *args, **kwargs: None)
+    ex = RunInThreadExecutor(max_workers=1, max_queue=0, cache_size=10)
+    blocked = threading.Event()
+
+    def blocking_fn():
+        blocked.wait(5)
+
+    assert ex.submit(blocking_fn, [], {}, ex=60)
+    # the caller isn't blocked when the pool is full
+    assert ex.submit(blocking_fn, [], {}, ex=60) is None
+    assert ex.stats()["rejected"] == 1
+    blocked.set()
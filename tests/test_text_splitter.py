@@ -0,0 +1,18 @@
+from daras_ai_v2.text_splitter import default_length_function, text_splitter
+
+TEXT = "\n\n".join(
+    " ".join(
+        f"Sentence number {i} of paragraph {j}, with ünïcödé 日本語." for i in range(20)
+    )
+    for j in range(50)
+)
+
+
+def test_text_splitter_fast_path():
+    chunk_size = 100
+    docs = text_splitter(TEXT, chunk_size=chunk_size)
+    assert len(docs) > 1
+    for doc in docs:
+        # carried token counts may be off by a token at each boundary
+        assert abs(len(doc) - default_length_function(doc.text)) <= 2
+        assert len(doc) <= chunk_size
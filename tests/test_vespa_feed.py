@@ -0,0 +1,79 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+
+import pytest
+from vespa.application import Vespa
+
+from daras_ai_v2.vespa_feed import feed_vespa_docs
+
+
+class _VespaStandIn(BaseHTTPRequestHandler):
+    fed: dict[str, dict] = {}
+    attempts: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def do_POST(self):
+        doc_id = self.path.rsplit("/", 1)[-1]
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            self.attempts[doc_id] = self.attempts.get(doc_id, 0) + 1
+            # fail every 3rd document on the first attempt
+            should_fail = int(doc_id) % 3 == 0 and self.attempts[doc_id] == 1
+            if not should_fail:
+                self.fed[doc_id] = body["fields"]
+        status = 500 if should_fail else 200
+        payload = json.dumps(dict(id=doc_id, pathId=self.path)).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def vespa_stand_in():
+    _VespaStandIn.fed = {}
+    _VespaStandIn.attempts = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _VespaStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield Vespa(url=f"http://127.0.0.1:{server.server_port}")
+    server.shutdown()
+
+
+def test_feed_vespa_docs(vespa_stand_in):
+    docs = (dict(id=str(i), fields=dict(snippet=f"chunk {i}")) for i in range(50))
+    gen = feed_vespa_docs(vespa_stand_in, docs, schema="gooey", status_interval_sec=0)
+    statuses = []
+    while True:
+        try:
+            statuses.append(next(gen))
+        except StopIteration as e:
+            num_fed = e.value
+            break
+
+    assert num_fed == 50
+    assert statuses
+    assert _VespaStandIn.fed == {str(i): dict(snippet=f"chunk {i}") for i in range(50)}
+    # failed documents were retried individually
+    assert _VespaStandIn.attempts["3"] == 2
+
+
+def test_feed_vespa_docs_producer_error(vespa_stand_in):
+    def docs():
+        for i in range(10):
+            yield dict(id=str(i), fields=dict(snippet=f"chunk {i}"))
+        # let pyvespa's consumer thread drain its queue and wait for more docs
+        sleep(1)
+        raise ValueError("embedding failed")
+
+    num_threads = threading.active_count()
+    with pytest.raises(ValueError, match="embedding failed"):
+        for _ in feed_vespa_docs(vespa_stand_in, docs(), schema="gooey"):
+            pass
+    # pyvespa's consumer thread was stopped
+    assert threading.active_count() <= num_threads
@@ -5,3 +5,8 @@ class CostsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "usage_costs"
     verbose_name = "Usage Costs"
+
+    def ready(self):
+        from . import signals
+
+        assert signals
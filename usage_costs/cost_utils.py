@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import threading
 import typing
 from decimal import Decimal
 
+from django.conf import settings
 from loguru import logger
 
+from daras_ai_v2.local_cache import LocalCache
 
 if typing.TYPE_CHECKING:
     from usage_costs.models import ModelSku, ModelPricing, UsageCost
@@ -17,6 +20,12 @@ def record_cost_auto(
     quantity: int | float | Decimal,
     unit_cost_multiplier: float = 1,
 ) -> UsageCost | None:
+    """
+    Record the usage cost for the currently running saved run.
+
+    The cost is buffered in memory, and written to the db in bulk by
+    `flush_usage_costs()` when the run step ends (see `celeryapp.tasks.runner_task`).
+    """
     from celeryapp.tasks import get_running_saved_run
 
     sr = get_running_saved_run()
@@ -26,22 +35,60 @@ def record_cost_auto(
     if not pricing:
         return None
     unit_cost = pricing.unit_cost * Decimal(str(unit_cost_multiplier))
-    return create_usage_cost(
+    usage_cost = build_usage_cost(
         sr=sr,
         pricing=pricing,
         quantity=quantity,
         unit_cost=unit_cost,
         unit_quantity=pricing.unit_quantity,
     )
+    with _pending_usage_costs_lock:
+        _pending_usage_costs.setdefault(sr.id, []).append(usage_cost)
+    return usage_cost
+
+
+_pending_usage_costs: dict[int, list[UsageCost]] = {}
+_pending_usage_costs_lock = threading.Lock()
+
+
+def flush_usage_costs(sr: SavedRun) -> list[UsageCost]:
+    """Write the buffered usage costs for the given saved run to the db."""
+    from usage_costs.models import UsageCost
+
+    with _pending_usage_costs_lock:
+        pending = _pending_usage_costs.pop(sr.id, None)
+    if not pending:
+        return []
+    return UsageCost.objects.bulk_create(pending)
+
+
+_model_pricing_cache: LocalCache[tuple[str, int], ModelPricing | None] = LocalCache(
+    maxsize=1024, ttl=settings.MODEL_PRICING_CACHE_TTL_SEC
+)
+_not_found = object()
 
 
 def get_model_pricing(model_id: str, sku: ModelSku) -> ModelPricing | None:
+    key = (model_id, int(sku))
+    pricing = _model_pricing_cache.get(key, _not_found)
+    if pricing is _not_found:
+        pricing = _get_model_pricing_from_db(model_id, sku)
+        _model_pricing_cache.set(key, pricing)
+    if not pricing:
+        logger.warning(f"Model pricing not found for model_id: {model_id}, sku: {sku}")
+    return pricing
+
+
+def clear_model_pricing_cache():
+    _model_pricing_cache.clear()
+
+
+def _get_model_pricing_from_db(model_id: str, sku: ModelSku) -> ModelPricing | None:
     from usage_costs.models import ModelPricing
 
     try:
         return ModelPricing.objects.get(model_id=model_id, sku=sku)
     except ModelPricing.DoesNotExist:
-        logger.warning(f"Model pricing not found for model_id: {model_id}, sku: {sku}")
         return None
 
 
@@ -51,11 +98,29 @@ def create_usage_cost(
     quantity: int | float | Decimal,
     unit_cost: Decimal,
     unit_quantity: int,
+) -> UsageCost:
+    usage_cost = build_usage_cost(
+        sr=sr,
+        pricing=pricing,
+        quantity=quantity,
+        unit_cost=unit_cost,
+        unit_quantity=unit_quantity,
+    )
+    usage_cost.save()
+    return usage_cost
+
+
+def build_usage_cost(
+    sr: SavedRun,
+    pricing: ModelPricing,
+    quantity: int | float | Decimal,
+    unit_cost: Decimal,
+    unit_quantity: int,
 ) -> UsageCost:
     from usage_costs.models import UsageCost
 
     quantity_dec = Decimal(str(quantity))
-    return UsageCost.objects.create(
+    return UsageCost(
         saved_run=sr,
         pricing=pricing,
         quantity=quantity_dec,
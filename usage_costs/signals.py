@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from usage_costs.cost_utils import clear_model_pricing_cache
+from usage_costs.models import ModelPricing
+
+
+@receiver(post_save, sender=ModelPricing)
+@receiver(post_delete, sender=ModelPricing)
+def invalidate_model_pricing_cache(**kwargs):
+    # other processes pick up the change once their cache TTL expires
+    clear_model_pricing_cache()
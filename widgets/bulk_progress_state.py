@@ -68,12 +68,14 @@ class BulkProgressTracker:
         pr,
         request_body: dict,
         arr_len: int,
+        row_group_completed: bool,
         workflow_run_time_seconds: float | None,
         workflow_credits: int | None,
         error_msg: str | None,
     ) -> str:
         self.counts.completed_unit_runs += 1
-        if self.counts.current_workflow_number == self.counts.total_workflows:
+        # sub-runs can complete out of order, so the caller keeps track of the row groups
+        if row_group_completed:
             self.counts.completed_row_groups += 1
             self.counts.completed_rows += arr_len
         self.credits_used += workflow_credits or 0
@@ -91,6 +93,12 @@ class BulkProgressTracker:
             error_msg=error_msg,
         )
 
+    def row_group_skipped(self, arr_len: int):
+        """The row group was already completed by a previous attempt of the run."""
+        self.counts.completed_unit_runs += self.counts.total_workflows
+        self.counts.completed_row_groups += 1
+        self.counts.completed_rows += arr_len
+
     def eval_started(
         self,
         response,
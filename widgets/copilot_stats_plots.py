@@ -5,15 +5,7 @@ from functools import partial
 import gooey_gui as gui
 import pandas as pd
 import plotly.graph_objects as go
-from django.db.models import (
-    Avg,
-    CharField,
-    Count,
-    Q,
-    Sum,
-)
 from django.db.models.functions import (
-    Concat,
     TruncDay,
     TruncMonth,
     TruncWeek,
@@ -21,8 +13,8 @@ from django.db.models.functions import (
 from django.db.models.functions.datetime import TruncBase
 import pytz
 
-from bots.models import BotIntegration, Message
-from bots.models.convo_msg import CHATML_ROLE_ASSISTANT, Feedback
+from bots.models import BotIntegration
+from bots.models.copilot_stats import COUNTER_FIELDS, sum_buckets
 from daras_ai.image_input import truncate_text_words
 from widgets.plotly_theme import (
     COLOR_PALETTE,
@@ -75,11 +67,11 @@ def render_copilot_stats_plots(
         ),
     )
 
-    try:
-        dt_index = plot_active_users(fig, bi, start_date, end_date, trunc_fn, pd_freq)
-    except Message.DoesNotExist:
+    df = get_copilot_stats_df(bi, tz, start_date, end_date, pd_freq)
+    if df.empty:
         gui.write("No data to show yet. Please select a different date range.")
         return
+    dt_index = plot_active_users(fig, df)
 
     fig.update_xaxes(
         type="date",
@@ -88,55 +80,93 @@ def render_copilot_stats_plots(
         showgrid=False,
     )
 
-    plot_messages_sent(fig, bi, start_date, end_date, trunc_fn, pd_freq)
-    plot_average_runtime(fig, bi, start_date, end_date, trunc_fn, pd_freq)
-    plot_total_price(fig, bi, start_date, end_date, trunc_fn, pd_freq)
-    plot_retention(fig, bi, start_date, end_date, trunc_fn, pd_freq, dt_index)
+    plot_messages_sent(fig, df)
+    plot_average_runtime(fig, df)
+    plot_total_price(fig, df)
+    plot_retention(fig, df)
 
     annotate_bot_versions(fig, bi, trunc_fn, pd_freq, dt_index, tz)
 
     gui.plotly_chart(fig, config=defaultPlotlyConfig)
 
 
-def plot_active_users(
-    fig: go.Figure,
+def get_copilot_stats_df(
     bi: BotIntegration,
+    tz: pytz.timezone,
     start_date: datetime.datetime,
     end_date: datetime.datetime,
-    trunc_fn: TruncBase,
     pd_freq: str,
-):
-    qs = (
-        Message.objects.filter(
-            conversation__bot_integration=bi,
-            created_at__range=(start_date, end_date),
-            role=CHATML_ROLE_ASSISTANT,
-        )
-        .annotate(dt=trunc_fn("created_at"))
-        .values("dt")
-    )
+) -> pd.DataFrame:
+    """
+    Read the daily rollups (see `CopilotStatsRollup`) for the date range,
+    put them together into days in the given timezone, and then into `pd_freq` buckets.
 
-    qs_list = [
-        qs.annotate(
-            msg_count=Count("id"),
-        ).values("dt", "msg_count"),
-        qs.annotate(
-            user_count=Count(
-                Concat(*Message.convo_user_id_fields, output_field=CharField()),
-                distinct=True,
+    Day boundaries are exact for every timezone whose offset is a multiple of 15 minutes.
+    """
+    start_day = start_date.date()
+    # the end date is exclusive
+    end_day = max(end_date.date(), start_day + datetime.timedelta(days=1))
+    rollups = {
+        row["date"]: row
+        for row in bi.stats_rollups.filter(
+            date__gte=_local_midnight(tz, start_day).astimezone(pytz.utc).date(),
+            date__lte=_local_midnight(tz, end_day).astimezone(pytz.utc).date(),
+        ).values(
+            "date",
+            *COUNTER_FIELDS,
+            "user_hashes",
+            "user_first_buckets",
+            "user_last_buckets",
+        )
+    }
+    records = []
+    day = start_day
+    while rollups and day < end_day:
+        next_day = day + datetime.timedelta(days=1)
+        start = _local_midnight(tz, day)
+        stats = sum_buckets(rollups, start, _local_midnight(tz, next_day))
+        if stats["messages"]:
+            records.append(
+                stats | dict(dt=pd.Timestamp(start), users=frozenset(stats["users"]))
             )
-        ).values("dt", "user_count"),
-    ]
-    if not any(qs_list):
-        raise Message.DoesNotExist("No data found")
-
-    df = pd.concat(
-        [pd.DataFrame.from_dict(v).set_index("dt") for v in qs_list if v],
-        axis=1,
+        day = next_day
+    if not records:
+        return pd.DataFrame()
+
+    agg = dict(
+        messages="sum",
+        users=lambda s: frozenset().union(*s),
+        positive_feedbacks="sum",
+        negative_feedbacks="sum",
+        successful_answers="sum",
+        runs="sum",
+        run_time="sum",
+        price="sum",
+    )
+    daily = pd.DataFrame.from_records(records).set_index("dt")
+    # the retention cohort is the users on the first day
+    cohort = daily["users"].iloc[0]
+    df = daily.resample(pd_freq).agg(agg).reset_index()
+
+    df["user_count"] = df["users"].map(len)
+    df["cohort_count"] = df["users"].map(lambda users: len(users & cohort))
+    df["avg_run_time"] = (df["run_time"] / df["runs"]).fillna(0)
+    return df.rename(
+        columns=dict(
+            messages="count",
+            positive_feedbacks="pos_count",
+            negative_feedbacks="neg_count",
+            successful_answers="success_count",
+            price="total_price",
+        )
     )
 
-    # resample to the correct frequency
-    df = df.resample(pd_freq).sum().reset_index()
+
+def _local_midnight(tz: pytz.timezone, day: datetime.date) -> datetime.datetime:
+    return tz.localize(datetime.datetime.combine(day, datetime.time()))
+
+
+def plot_active_users(fig: go.Figure, df: pd.DataFrame) -> pd.Series:
     # render the plot
     fig.add_trace(
         go.Scatter(
@@ -154,7 +184,7 @@ def plot_active_users(
     fig.add_trace(
         go.Scatter(
             x=df["dt"].tolist(),
-            y=(df["msg_count"] / df["user_count"]).fillna(0).tolist(),
+            y=(df["count"] / df["user_count"]).fillna(0).tolist(),
             hovertemplate="Avg Messages per User: %{y:.0f}<extra></extra>",
             line_shape="spline",
             **get_line_marker(color_idx=2),
@@ -173,62 +203,7 @@ def plot_active_users(
     return pd.to_datetime(df.dt)
 
 
-def plot_messages_sent(
-    fig: go.Figure,
-    bi: BotIntegration,
-    start_date: datetime.datetime,
-    end_date: datetime.datetime,
-    trunc_fn: TruncBase,
-    pd_freq: str,
-):
-    qs = (
-        Message.objects.select_related("feedbacks")
-        .filter(
-            conversation__bot_integration=bi,
-            created_at__range=(start_date, end_date),
-            role=CHATML_ROLE_ASSISTANT,
-        )
-        .annotate(dt=trunc_fn("created_at"))
-        .values("dt")
-    )
-
-    qs_list = [
-        qs.annotate(
-            count=Count("id"),
-        ).values("dt", "count"),
-        qs.annotate(
-            pos_count=Count(
-                "feedbacks__message",
-                filter=Q(feedbacks__rating=Feedback.Rating.POSITIVE),
-                distinct=True,
-            ),
-        ).values("dt", "pos_count"),
-        qs.annotate(
-            neg_count=Count(
-                "feedbacks__message",
-                filter=Q(feedbacks__rating=Feedback.Rating.NEGATIVE),
-                distinct=True,
-            ),
-        ).values("dt", "neg_count"),
-        qs.annotate(
-            success_count=Count(
-                "id",
-                filter=Q(analysis_result__contains={"Answered": True})
-                | Q(analysis_result__contains={"assistant": {"answer": "Found"}}),
-            ),
-        ).values("dt", "success_count"),
-    ]
-    if not any(qs_list):
-        return
-
-    df = pd.concat(
-        [pd.DataFrame.from_dict(v).set_index("dt") for v in qs_list if v],
-        axis=1,
-    )
-
-    # resample to the correct frequency
-    df = df.resample(pd_freq).sum().reset_index()
-
+def plot_messages_sent(fig: go.Figure, df: pd.DataFrame):
     # render the plot
     fig.add_trace(
         go.Scatter(
@@ -288,39 +263,9 @@ def plot_messages_sent(
         )
 
 
-def plot_average_runtime(
-    fig: go.Figure,
-    bi: BotIntegration,
-    start_date: datetime.datetime,
-    end_date: datetime.datetime,
-    trunc_fn: TruncBase,
-    pd_freq: str,
-):
-    qs = (
-        # get messages for the given bot integration and date range
-        Message.objects.filter(
-            conversation__bot_integration=bi,
-            created_at__range=(start_date, end_date),
-            saved_run__isnull=False,  # Only include messages with saved runs
-        )
-        # truncate the date to the correct frequency
-        .annotate(dt=trunc_fn("created_at"))
-        # get the average run time for each date
-        .values("dt")
-        .annotate(avg_run_time=Avg("saved_run__run_time"))
-        # order by date
-        .order_by("dt")
-        .values("dt", "avg_run_time")
-    )
-    if not qs:
+def plot_average_runtime(fig: go.Figure, df: pd.DataFrame):
+    if not df["runs"].any():
         return
-    df = pd.DataFrame.from_dict(qs)
-    # resample to the correct frequency and calculate mean
-    df = df.set_index("dt").resample(pd_freq).mean().reset_index()
-
-    # convert timedelta64[ns] to seconds, set nan to 0
-    df["avg_run_time"] = df["avg_run_time"].dt.total_seconds().fillna(0)
-
     # render the plot
     fig.add_trace(
         go.Scatter(
@@ -337,37 +282,9 @@ def plot_average_runtime(
     add_legend(fig, "Avg Run Time", color_idx=4, row=3)
 
 
-def plot_total_price(
-    fig: go.Figure,
-    bi: BotIntegration,
-    start_date: datetime.datetime,
-    end_date: datetime.datetime,
-    trunc_fn: TruncBase,
-    pd_freq: str,
-):
-    qs = (
-        # get messages for the given bot integration and date range
-        Message.objects.filter(
-            conversation__bot_integration=bi,
-            created_at__range=(start_date, end_date),
-            saved_run__isnull=False,  # Only include messages with saved runs
-        )
-        # truncate the date to the correct frequency
-        .annotate(dt=trunc_fn("created_at"))
-        # get the average run time for each date
-        .values("dt")
-        .annotate(total_price=Sum("saved_run__price"))
-        # order by date
-        .order_by("dt")
-        .values("dt", "total_price")
-    )
-    if not qs:
+def plot_total_price(fig: go.Figure, df: pd.DataFrame):
+    if not df["runs"].any():
         return
-    df = pd.DataFrame.from_dict(qs)
-    # resample to the correct frequency and calculate mean
-    df = df.set_index("dt").resample(pd_freq).mean().reset_index()
-    df["total_price"] = df["total_price"].fillna(0)
-
     # render the plot
     fig.add_trace(
         go.Scatter(
@@ -384,46 +301,14 @@ def plot_total_price(
     add_legend(fig, "Credits Used", color_idx=5, row=4)
 
 
-def plot_retention(
-    fig: go.Figure,
-    bi: BotIntegration,
-    start_date: datetime.datetime,
-    end_date: datetime.datetime,
-    trunc_fn: TruncBase,
-    pd_freq: str,
-    dt_index: pd.Index,
-):
-    if dt_index.empty:
-        return
-    cohort = (start_date, dt_index.iloc[0] + datetime.timedelta(days=1))
-    qs = (
-        Message.objects.filter(
-            conversation__bot_integration=bi,
-            created_at__range=(start_date, end_date),
-        )
-        .annotate(dt=trunc_fn("created_at"))
-        .values("dt")
-        .annotate(
-            counts=Count(
-                Concat(*Message.convo_user_id_fields, output_field=CharField()),
-                filter=Q(
-                    conversation__bot_integration=bi,
-                    conversation__messages__created_at__range=cohort,
-                ),
-                distinct=True,
-            ),
-        )
-        .values("dt", "counts")
-    )
-
-    df = pd.DataFrame.from_dict(qs)
-    df = df.set_index("dt").resample(pd_freq).sum().reset_index()
-
+def plot_retention(fig: go.Figure, df: pd.DataFrame):
     fig.add_trace(
         go.Scatter(
             x=df["dt"].tolist(),
-            y=(df["counts"] / df["counts"].iloc[0] * 100).fillna(0).tolist(),
-            customdata=df["counts"].tolist(),
+            y=(df["cohort_count"] / df["cohort_count"].iloc[0] * 100)
+            .fillna(0)
+            .tolist(),
+            customdata=df["cohort_count"].tolist(),
             hovertemplate="Retention: %{y:.0f}% (%{customdata:.0f} Users)<extra></extra>",
             line_shape="spline",
             **get_line_marker(color_idx=9, gradient=True),
@@ -622,12 +622,11 @@ def render_team_member_cycle_summary(
     *,
     session: dict,
 ):
+    from daras_ai_v2.billing import get_next_invoice_timestamp
     from routers.account import account_route
 
     usage = get_member_cycle_usage_html(membership)
-    next_invoice_ts = gui.run_in_thread(
-        membership.workspace.subscription.get_next_invoice_timestamp, cache=True
-    )
+    next_invoice_ts = get_next_invoice_timestamp(membership.workspace.subscription)
     cycle_renews = (
         datetime.fromtimestamp(next_invoice_ts).strftime("%d %b %Y")
         if next_invoice_ts